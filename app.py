@@ -1,22 +1,51 @@
 import streamlit as st
 import os
-import smtplib
 import re
 import json
 import time
-from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from crewai import Agent, Task, Crew, Process, LLM
-from crewai_tools import ScrapeWebsiteTool
+import queue
+import threading
+import uuid
 from dotenv import load_dotenv
+from preload import preloader
+from llm_cache import response_cache
+from stage_cache import stage_cache
+from run_checkpoints import run_checkpoints
+from rate_governor import rate_governor
+from resources import shared_scrape_tool
+from email_crew import agency_services, run_email_pipeline, research, visible_answer, warm_up, STAGES, STRATEGY_MODES, FINALIZER_MODES
+from email_schema import streamed_body
+from campaign import read_targets, run_campaign, results_to_csv
+from pipeline import CampaignPipeline, PIPELINE_STAGES, DEFAULT_STAGE_LIMITS
+from variants import run_variants, variant_combinations, VARIANT_COLUMNS, VARIANT_WORKERS
+from scrape_cache import scrape_cache, normalize_url
+from content_extractor import content_extractor, EXTRACT_TOKEN_BUDGET
+from site_crawler import site_crawler
+from smtp_pool import build_email_message
+from outbox import outbox
+from email_history import email_history, HISTORY_PAGE_SIZE
+from domain_index import domain_index, REPITCH_AFTER_DAYS
+from metrics import stage_metrics
+from routing import DEFAULT_ROUTES, resolve_routes, routed_llms, routing_savings
 
 load_dotenv()
 
+MODEL_OPTIONS = ["groq/llama-3.3-70b-versatile", "groq/llama-3.1-8b-instant", "groq/mixtral-8x7b-32768"]
+MAIN_MODEL_LABEL = "Main model"
+TONES = ["Professional", "Friendly", "Aggressive", "Short & Sweet"]
+LENGTHS = ["Short", "Medium", "Long"]
+LANGUAGES = ["English", "Spanish", "French", "German", "Portuguese"]
+STAGE_LABELS = {"analyze": "🔍 Researcher", "strategize": "🎯 Strategist", "write": "✍️ Writer", "finalize": "📤 Finalizer"}
+# Stages whose text shows up on the page as it is written: the writer always, the finalizer when it is an LLM
+STREAM_STAGES = ("write", "finalize")
+
 st.set_page_config(page_title="Cold Email Generator", page_icon="📧", layout="wide")
 
-if 'email_history' not in st.session_state:
-    st.session_state.email_history = []
+# crewai and crewai_tools load in the background while the page draws
+preloader.start()
+
+if 'history_page' not in st.session_state:
+    st.session_state.history_page = 1
 if 'templates' not in st.session_state:
     st.session_state.templates = {
         "Professional": "Formal business tone",
@@ -118,9 +147,32 @@ with st.sidebar:
     
     model_option = st.selectbox(
         "🤖 Select Model:",
-        ["groq/llama-3.3-70b-versatile", "groq/llama-3.1-8b-instant", "groq/mixtral-8x7b-32768"],
+        MODEL_OPTIONS,
         index=0
     )
+
+    with st.expander("🧭 Model Routing"):
+        st.caption("The main model does the research and copywriting. Picking a service and formatting the final email run on the small, fast model.")
+        route_overrides = {}
+        for stage in STAGES:
+            default = DEFAULT_ROUTES[stage]
+            choices = [MAIN_MODEL_LABEL] + MODEL_OPTIONS
+            if default["model"] and default["model"] not in choices:
+                choices.append(default["model"])
+            route_col1, route_col2 = st.columns([3, 2])
+            stage_model = route_col1.selectbox(
+                STAGE_LABELS[stage],
+                choices,
+                index=choices.index(default["model"]) if default["model"] else 0,
+                key=f"route_model_{stage}"
+            )
+            stage_max_tokens = route_col2.number_input(
+                "Max tokens", min_value=64, max_value=8192, value=default["max_tokens"], step=64, key=f"route_tokens_{stage}"
+            )
+            route_overrides[stage] = {
+                "model": None if stage_model == MAIN_MODEL_LABEL else stage_model,
+                "max_tokens": int(stage_max_tokens)
+            }
     
     temperature = st.slider(
         "🌡️ Temperature (Creativity):",
@@ -130,24 +182,70 @@ with st.sidebar:
         step=0.1,
         help="Higher = more creative, Lower = more focused"
     )
+
+    reuse_stages = st.toggle(
+        "🧩 Reuse Unchanged Stages",
+        value=stage_cache is not None,
+        disabled=stage_cache is None,
+        help="Research and strategy only depend on the URL and model, so changing the tone or length only reruns the writer and finalizer."
+    )
+
+    cache_sampled = st.toggle(
+        "♻️ Reuse Cached LLM Answers",
+        value=False,
+        help="Identical prompts are always answered from the cache at temperature 0. Turn this on to reuse answers at higher temperatures too."
+    )
     
     email_tone = st.selectbox(
         "🎭 Email Tone:",
-        ["Professional", "Friendly", "Aggressive", "Short & Sweet"],
+        TONES,
         index=0
     )
     
     email_length = st.select_slider(
         "📏 Email Length:",
-        options=["Short", "Medium", "Long"],
+        options=LENGTHS,
         value="Medium"
     )
     
     language = st.selectbox(
         "🌍 Language:",
-        ["English", "Spanish", "French", "German", "Portuguese"],
+        LANGUAGES,
         index=0
     )
+
+    strategy_mode = st.selectbox(
+        "🎯 Strategy Mode:",
+        list(STRATEGY_MODES.keys()),
+        format_func=STRATEGY_MODES.get,
+        index=0,
+        help="The local matcher picks our service in milliseconds and only asks the LLM strategist when it is unsure."
+    )
+
+    finalizer_mode = st.selectbox(
+        "📤 Finalizer Mode:",
+        list(FINALIZER_MODES.keys()),
+        format_func=FINALIZER_MODES.get,
+        index=0,
+        help="Local templates add the greeting, call-to-action and signature instantly and have the writer title the email, saving one LLM round trip."
+    )
+
+    token_budget = st.slider(
+        "✂️ Page Token Budget:",
+        min_value=200,
+        max_value=4000,
+        value=EXTRACT_TOKEN_BUDGET,
+        step=100,
+        help="Navigation, footers and cookie banners are stripped from scraped pages, then the most useful sections (hero, product, pricing) are kept up to this many tokens."
+    )
+
+    crawl_pages = st.slider(
+        "🕸️ Extra Pages to Read:",
+        min_value=0,
+        max_value=6,
+        value=0,
+        help="Also read the site's about, pricing, services and careers pages, found in its links and sitemap. Pages are fetched in parallel, robots.txt is respected, and text they share with the homepage is dropped."
+    )
     
     st.markdown("---")
     st.header("📋 Templates")
@@ -170,31 +268,506 @@ if not api_key.startswith("gsk_"):
     st.error("⚠️ The API key is wrong! Please type the correct API key. It should start with 'gsk_'")
     st.stop()
 
-try:
-    llm = LLM(
-        model=model_option,
-        api_key=api_key,
-        temperature=temperature,
-        max_tokens=4096
-    )
-    st.sidebar.success("✅ API key validated!")
-except Exception as e:
-    st.sidebar.error("❌ Invalid API key!")
-    st.error("⚠️ The API key is wrong! Please type the correct API key.")
-    st.stop()
+llm_options = {
+    "api_key": api_key,
+    "temperature": temperature,
+    "cache_sampled": cache_sampled
+}
+# Model and max_tokens come from the routing policy, stage by stage
+routes = resolve_routes(model_option, route_overrides)
+
+
+def warm_llm():
+    stage_llms = routed_llms("app", routes, stream_stages=STREAM_STAGES, **llm_options)
+    routed_llms("app", routes, **llm_options)
+    warm_up(stage_llms["analyze"], shared_scrape_tool(token_budget, crawl_pages), email_tone, language, stage_llms=stage_llms)
+
+
+def load_llms(stream_stages=()):
+    # Normally already built by the preloader; only the very first click may have to wait
+    if not preloader.ready():
+        with st.spinner("⏳ Loading the AI engine..."):
+            preloader.wait()
+    try:
+        return routed_llms("app", routes, stream_stages=stream_stages, **llm_options)
+    except Exception:
+        st.sidebar.error("❌ Invalid API key!")
+        st.error("⚠️ The API key is wrong! Please type the correct API key.")
+        st.stop()
 
-agency_services = """
-1. SEO Optimization Service: Best for companies with good products but low traffic. We increase organic reach.
-2. Custom Web Development: Best for companies with outdated, ugly, or slow websites. We build modern React/Python sites.
-3. AI Automation: Best for companies with manual, repetitive tasks. We build agents to save time.
-"""
+
+preloader.warm(warm_llm)
+st.sidebar.success("✅ API key validated!")
+if not preloader.ready():
+    st.sidebar.caption("⏳ AI engine is loading in the background...")
 
 with st.sidebar:
     st.header("⚙️ Our Services")
     st.markdown(agency_services)
     st.markdown("---")
+    st.header("🗄️ Scrape Cache")
+    cache_col1, cache_col2, cache_col3 = st.columns(3)
+    cache_col1.metric("Hits", scrape_cache.stats["hits"] + scrape_cache.stats["revalidated"])
+    cache_col2.metric("Misses", scrape_cache.stats["misses"])
+    cache_col3.metric("Evicted", scrape_cache.stats["evictions"])
+    if st.button("🧹 Clear Scrape Cache"):
+        scrape_cache.clear()
+        st.toast("✅ Scrape cache cleared!")
+    if content_extractor.stats["pages"]:
+        st.caption(
+            f"✂️ {content_extractor.tokens_saved():,} prompt tokens trimmed from "
+            f"{content_extractor.stats['pages']} pages"
+        )
+    if response_cache is not None:
+        st.header("♻️ LLM Cache")
+        llm_stats = response_cache.stats.get("app", {"hits": 0, "misses": 0, "bypassed": 0})
+        llm_col1, llm_col2, llm_col3 = st.columns(3)
+        llm_col1.metric("Hits", llm_stats["hits"])
+        llm_col2.metric("Misses", llm_stats["misses"])
+        llm_col3.metric("Bypassed", llm_stats["bypassed"])
+        if st.button("🧹 Clear LLM Cache"):
+            response_cache.clear("app")
+            st.toast("✅ LLM cache cleared!")
+    if stage_cache is not None:
+        st.header("🧩 Stage Cache")
+        stage_hits = sum(counters["hits"] for counters in stage_cache.stats.values())
+        stage_misses = sum(counters["misses"] for counters in stage_cache.stats.values())
+        stage_saved = sum(counters["seconds_saved"] for counters in stage_cache.stats.values())
+        stage_col1, stage_col2, stage_col3 = st.columns(3)
+        stage_col1.metric("Hits", stage_hits)
+        stage_col2.metric("Misses", stage_misses)
+        stage_col3.metric("Saved", f"{stage_saved:.0f}s")
+        if st.button("🧹 Clear Stage Cache"):
+            stage_cache.clear()
+            st.toast("✅ Stage cache cleared!")
+    governed = rate_governor.snapshot()
+    if governed:
+        st.header("🚦 Rate Limits")
+        st.dataframe(
+            [
+                {"Model": g["model"], "Concurrency": g["concurrency"], "Calls": g["calls"], "429s": g["throttled"],
+                 "Retries": g["retries"], "Waited (s)": g["waited"]}
+                for g in governed
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption("Shared by every session: calls wait for their model's request and token budget and back off on 429s")
+    recent = stage_metrics.percentiles()
+    if recent:
+        st.header("⏱️ Stage Latency")
+        st.dataframe(
+            [
+                {"Stage": stage.title(), "p50 (s)": recent[stage]["p50"], "p95 (s)": recent[stage]["p95"], "Runs": recent[stage]["runs"]}
+                for stage in STAGES if stage in recent
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption(f"Over the last {stage_metrics.window} runs of each stage")
+    st.markdown("---")
     st.caption("Powered by CrewAI + Groq")
 
+STAGE_STATUS = {
+    "analyze": "🔍 Researcher: Analyzing website...",
+    "strategize": "🎯 Strategist: Picking the best service...",
+    "write": "✍️ Writer: Creating email content...",
+    "finalize": "📤 Finalizer: Polishing email..."
+}
+
+
+def describe_stage_metrics(record):
+    parts = [f"{record['seconds']:.1f}s"]
+    if record["source"] == "cache":
+        parts.append(f"from cache, {record['seconds_saved']:.1f}s saved")
+    elif record["source"] == "checkpoint":
+        parts.append(f"resumed from the last attempt, {record['seconds_saved']:.1f}s saved")
+    elif record["source"] == "local":
+        parts.append("local, no LLM call")
+    else:
+        parts.append(f"{record['prompt_tokens']:,} prompt + {record['completion_tokens']:,} completion tokens")
+        if record["tool_calls"]:
+            parts.append(f"{record['tool_calls']} tool calls")
+        if record["retries"]:
+            parts.append(f"{record['retries']} retries")
+    return " · ".join(parts)
+
+
+def stage_metrics_table(records):
+    return [
+        {
+            "Stage": STAGE_LABELS.get(stage, stage),
+            "Model": record["model"] or record["source"],
+            "Seconds": record["seconds"],
+            "Prompt Tokens": record["prompt_tokens"],
+            "Completion Tokens": record["completion_tokens"],
+            "LLM Calls": record["llm_calls"],
+            "Tool Calls": record["tool_calls"],
+            "Retries": record["retries"],
+        }
+        for stage, record in records.items()
+    ]
+
+
+def render_outbox_status(key):
+    st.markdown("#### 📬 Outbox")
+    counts = outbox.counts()
+    box_col1, box_col2, box_col3, box_col4 = st.columns(4)
+    box_col1.metric("Queued", counts["queued"] + counts["sending"])
+    box_col2.metric("Sent", counts["sent"])
+    box_col3.metric("Dead Letters", counts["dead"])
+    box_col4.metric("Sent / min", counts["sent_last_minute"])
+
+    refresh_col, retry_col, _ = st.columns([1, 1, 2])
+    with refresh_col:
+        if st.button("🔄 Refresh", key=f"outbox_refresh_{key}"):
+            st.rerun()
+    with retry_col:
+        if counts["dead"] and st.button("♻️ Retry Dead Letters", key=f"outbox_retry_{key}"):
+            outbox.retry_dead()
+            st.rerun()
+
+    recent = outbox.recent()
+    if recent:
+        st.dataframe(recent, use_container_width=True, hide_index=True)
+
+
+def render_history():
+    st.markdown("### 📜 Email History")
+    filter_col1, filter_col2, filter_col3 = st.columns([2, 1, 1])
+    with filter_col1:
+        history_query = st.text_input("🔎 Search emails", key="history_query", placeholder="Words from the email or URL")
+    with filter_col2:
+        history_tone = st.selectbox("Tone", ["All"] + email_history.distinct("tone"), key="history_tone")
+    with filter_col3:
+        history_language = st.selectbox("Language", ["All"] + email_history.distinct("language"), key="history_language")
+
+    filters = {
+        "query": history_query,
+        "tone": None if history_tone == "All" else history_tone,
+        "language": None if history_language == "All" else history_language,
+    }
+    # A new search starts again from the first page
+    if st.session_state.get("history_filters") != filters:
+        st.session_state.history_filters = filters
+        st.session_state.history_page = 1
+
+    total = email_history.count(**filters)
+    if not total:
+        if any(filters.values()):
+            st.info("No emails match these filters.")
+        else:
+            st.info("No emails generated yet. Create your first cold email!")
+        return
+
+    pages = (total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+    page = min(st.session_state.history_page, pages)
+    for item in email_history.page(page, HISTORY_PAGE_SIZE, **filters):
+        with st.expander(f"📧 {item['timestamp']} - {item['url'][:40]}..."):
+            st.markdown(f"**Tone:** {item['tone']} | **Language:** {item['language']}")
+            st.text_area("Email Content", item['email'], height=200, key=f"history_{item['id']}")
+            if st.button(f"Load This Email", key=f"load_{item['id']}"):
+                st.info("Feature: Click to reload this email into the editor")
+
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("⬅️ Newer", disabled=page <= 1, key="history_prev"):
+            st.session_state.history_page = page - 1
+            st.rerun()
+    with page_col:
+        st.caption(f"Page {page} of {pages} · {total:,} emails")
+    with next_col:
+        if st.button("Older ➡️", disabled=page >= pages, key="history_next"):
+            st.session_state.history_page = page + 1
+            st.rerun()
+
+    if st.button("🗑️ Clear History"):
+        email_history.clear()
+        st.session_state.history_page = 1
+        st.rerun()
+
+
+mode = st.radio("🗂️ Mode", ["Single Email", "Variants (A/B)", "Campaign (CSV)"], horizontal=True)
+
+if mode == "Campaign (CSV)":
+    st.markdown("### 📦 Campaign Mode")
+    st.markdown("Upload a CSV with a `url` column and optional `recipient_name` and `recipient_email` columns. Emails are generated in parallel and appear below as each one finishes.")
+
+    uploaded_csv = st.file_uploader("📄 Targets CSV", type=["csv"])
+    pipelined = st.toggle(
+        "🔀 Pipelined Execution",
+        value=True,
+        help="Fetch upcoming websites while earlier companies are still in the LLM stages. Each stage gets its own queue and worker limit."
+    )
+    if pipelined:
+        with st.expander("⚙️ Stage Concurrency"):
+            stage_cols = st.columns(len(PIPELINE_STAGES))
+            stage_limits = {
+                stage: col.number_input(stage.title(), min_value=1, max_value=16, value=DEFAULT_STAGE_LIMITS[stage], key=f"limit_{stage}")
+                for stage, col in zip(PIPELINE_STAGES, stage_cols)
+            }
+    else:
+        max_workers = st.slider(
+            "⚡ Parallel Workers:",
+            min_value=1,
+            max_value=16,
+            value=4,
+            help="How many companies are processed at the same time. Lower this if you hit API rate limits."
+        )
+
+    skip_pitched = st.toggle(
+        "🧭 Skip Companies Already Pitched",
+        value=True,
+        help="Each company is worked on once: www/bare domain, http/https, paths and tracking parameters all count as the same domain."
+    )
+    if skip_pitched:
+        repitch_after_days = st.number_input(
+            "🔁 Re-pitch after (days)", min_value=0, max_value=3650, value=int(REPITCH_AFTER_DAYS),
+            help=f"Companies pitched more recently than this are skipped. {domain_index.count()} domains pitched so far."
+        )
+
+    if st.button("🚀 Run Campaign", type="primary", use_container_width=True):
+        targets = read_targets(uploaded_csv.getvalue()) if uploaded_csv else []
+        skipped = []
+        if skip_pitched:
+            targets = list(domain_index.dedupe(targets, repitch_after_days, skipped))
+        if skipped:
+            duplicates = sum(1 for t in skipped if t["skip_reason"] == "duplicate in list")
+            st.info(f"🧭 Skipped {len(skipped)} targets: {duplicates} repeat a company earlier in the list, "
+                    f"{len(skipped) - duplicates} were pitched in the last {repitch_after_days} days.")
+            with st.expander("Skipped targets"):
+                st.dataframe([{k: t[k] for k in ("url", "domain", "skip_reason")} for t in skipped],
+                             use_container_width=True, hide_index=True)
+        if not targets:
+            st.error("Please upload a CSV with at least one URL!" if not skipped else "Every target was skipped.")
+        else:
+            campaign_progress = st.progress(0)
+            campaign_status = st.empty()
+            occupancy_table = st.empty()
+            results_table = st.empty()
+            results = []
+            started = time.perf_counter()
+
+            campaign_options = {
+                "strategy_mode": strategy_mode,
+                "finalizer_mode": finalizer_mode,
+                "email_tone": email_tone,
+                "language": language,
+                "email_length": email_length,
+                "selected_template": selected_template
+            }
+            stage_llms = load_llms()
+            if pipelined:
+                pipeline = CampaignPipeline(
+                    stage_llms["analyze"], limits=stage_limits, stage_llms=stage_llms, token_budget=token_budget,
+                    crawl_pages=crawl_pages, cache=stage_cache if reuse_stages else None,
+                    **campaign_options
+                )
+                rows = pipeline.run(targets, poll_interval=0.5)
+            else:
+                pipeline = None
+                rows = run_campaign(
+                    stage_llms["analyze"], targets, max_workers=max_workers,
+                    scrape_tool=shared_scrape_tool(token_budget, crawl_pages), stage_llms=stage_llms,
+                    cache=stage_cache if reuse_stages else None, **campaign_options
+                )
+
+            for row in rows:
+                # The pipeline yields None while nothing has finished so occupancy keeps updating
+                if row is not None:
+                    results.append(row)
+                    if row["status"] == "ok":
+                        email_history.add(
+                            row["url"],
+                            email_tone,
+                            language,
+                            row["cold_email"],
+                            recipient_name=row["recipient_name"],
+                            recipient_email=row["recipient_email"],
+                            length=email_length,
+                            template=selected_template,
+                            source="campaign"
+                        )
+                        domain_index.record(row["url"])
+                    campaign_progress.progress(len(results) / len(targets))
+                    results_table.dataframe(
+                        [{k: r[k] for k in ("url", "recipient_name", "recipient_email", "status", "seconds", "subject", "service", "email", "error")} for r in results],
+                        use_container_width=True
+                    )
+                elapsed = time.perf_counter() - started
+                status_text = f"✉️ {len(results)}/{len(targets)} done · {len(results) / elapsed * 60:.1f} emails/min"
+                if pipeline:
+                    bottleneck = pipeline.bottleneck()
+                    if bottleneck:
+                        status_text += f" · bottleneck: {bottleneck}"
+                    occupancy_table.dataframe(pipeline.occupancy(), use_container_width=True, hide_index=True)
+                campaign_status.text(status_text)
+
+            st.session_state.campaign_results = results
+            failed = sum(1 for r in results if r["status"] != "ok")
+            if failed:
+                st.warning(f"⚠️ {failed} of {len(results)} targets failed. See the error column for details. "
+                           "Running the campaign again resumes them from the stage that failed.")
+            else:
+                st.success(f"🎉 Generated {len(results)} emails!")
+
+    if st.session_state.get("campaign_results"):
+        st.download_button(
+            "📥 Download Campaign Results (CSV)",
+            data=results_to_csv(st.session_state.campaign_results),
+            file_name="cold_email_campaign.csv",
+            mime="text/csv"
+        )
+
+        sendable = [
+            r for r in st.session_state.campaign_results
+            if r["status"] == "ok" and re.match(r'^[^@]+@[^@]+\.[^@]+$', r["recipient_email"])
+        ]
+        st.markdown("### 📤 Send All Generated Emails")
+        st.caption(f"{len(sendable)} emails have a valid recipient address. They go through the background outbox over a reused SMTP session.")
+
+        with st.form("bulk_send_form"):
+            bulk_sender_email = st.text_input("Your Email (Gmail)", placeholder="your.email@gmail.com")
+            bulk_sender_password = st.text_input("Your App Password", type="password",
+                help="Use Gmail App Password, not your regular password. Get it from Google Account > Security > 2-Step Verification > App passwords")
+
+            bulk_send_button = st.form_submit_button("🚀 Queue All", type="primary")
+
+            if bulk_send_button:
+                if not bulk_sender_email or not bulk_sender_password:
+                    st.error("Please fill in your email credentials!")
+                elif not sendable:
+                    st.error("No generated emails have a recipient address. Add a `recipient_email` column to your CSV.")
+                else:
+                    messages = [
+                        (build_email_message(bulk_sender_email, r["recipient_email"], r["cold_email"]), r["cold_email"])
+                        for r in sendable
+                    ]
+
+                    outbox.register_sender(bulk_sender_email, bulk_sender_password)
+                    for msg, email in messages:
+                        outbox.enqueue(msg, email)
+                    st.success(f"📬 Queued {len(messages)} emails. They are sent in the background at up to {outbox.per_minute} per minute.")
+
+        render_outbox_status("campaign")
+
+    st.markdown("---")
+    st.caption("🚀 Powered by CrewAI + Groq | Made with ❤️ using Streamlit")
+    st.stop()
+
+if mode == "Variants (A/B)":
+    st.markdown("### 🧪 Variants Mode")
+    st.markdown("Pick several tones, languages and lengths. The website is researched and the service picked once, then one email per combination is written in parallel.")
+
+    variant_col1, variant_col2 = st.columns([2, 1])
+    with variant_col1:
+        variant_url = st.text_input("🌐 Target Company URL", placeholder="https://example.com", key="variant_url")
+    with variant_col2:
+        variant_recipient = st.text_input("👤 Recipient Name (Optional)", placeholder="CEO or specific person", key="variant_recipient")
+
+    pick_col1, pick_col2, pick_col3 = st.columns(3)
+    with pick_col1:
+        variant_tones = st.multiselect("🎭 Tones", TONES, default=[email_tone])
+    with pick_col2:
+        variant_languages = st.multiselect("🌍 Languages", LANGUAGES, default=[language])
+    with pick_col3:
+        variant_lengths = st.multiselect("📏 Lengths", LENGTHS, default=[email_length])
+    variants = variant_combinations(variant_tones, variant_languages, variant_lengths)
+    variant_workers = st.slider("⚡ Parallel Variants:", min_value=1, max_value=16, value=VARIANT_WORKERS,
+                                help="How many variants are written at the same time. Lower this if you hit API rate limits.")
+    st.caption(f"{len(variants)} variants from one research and strategy pass")
+
+    if st.button("🧪 Generate Variants", type="primary", use_container_width=True):
+        if not variant_url.strip():
+            st.error("Please enter a valid URL!")
+        elif not variants:
+            st.error("Please pick at least one tone, language and length!")
+        else:
+            stage_llms = load_llms()
+            variant_progress = st.progress(0)
+            variant_status = st.empty()
+            results = []
+            started = time.perf_counter()
+            with st.status("🔍 Researching the company...", expanded=False) as status:
+                with stage_metrics.collect() as upstream_records:
+                    upstream = research(
+                        stage_llms["analyze"], variant_url,
+                        scrape_tool=shared_scrape_tool(token_budget, crawl_pages),
+                        strategy_mode=strategy_mode,
+                        stage_llms=stage_llms,
+                        cache=stage_cache if reuse_stages else None
+                    )
+                upstream_seconds = time.perf_counter() - started
+                status.update(label=f"✅ Research and strategy done in {upstream_seconds:.1f}s", state="complete")
+
+            for result in run_variants(
+                stage_llms["analyze"], upstream, variants, max_workers=variant_workers,
+                recipient_name=variant_recipient, selected_template=selected_template,
+                finalizer_mode=finalizer_mode, stage_llms=stage_llms, cache=stage_cache if reuse_stages else None
+            ):
+                results.append(result)
+                if result["status"] == "ok":
+                    email_history.add(
+                        variant_url,
+                        result["email_tone"],
+                        result["language"],
+                        result["cold_email"],
+                        recipient_name=variant_recipient,
+                        length=result["email_length"],
+                        template=selected_template,
+                        source="variant"
+                    )
+                variant_progress.progress(len(results) / len(variants))
+                variant_status.text(f"✉️ {len(results)}/{len(variants)} variants written")
+
+            st.session_state.variant_run = {
+                "url": variant_url,
+                "upstream": upstream,
+                "upstream_records": upstream_records,
+                "upstream_seconds": upstream_seconds,
+                "results": sorted(results, key=lambda r: r["index"]),
+                "seconds": time.perf_counter() - started,
+            }
+
+    variant_run = st.session_state.get("variant_run")
+    if variant_run:
+        results = variant_run["results"]
+        upstream_tokens = sum(r["prompt_tokens"] + r["completion_tokens"] for r in variant_run["upstream_records"].values())
+        st.caption(
+            f"🔍 Research and strategy ran once for {len(results)} variants: {variant_run['upstream_seconds']:.1f}s and "
+            f"{upstream_tokens:,} tokens, instead of {variant_run['upstream_seconds'] * len(results):.1f}s and "
+            f"{upstream_tokens * len(results):,} tokens with one Generate per variant. "
+            f"All variants done in {variant_run['seconds']:.1f}s."
+        )
+        with st.expander("🎯 Shared research and service"):
+            st.write(variant_run["upstream"]["analyze"])
+            st.write(variant_run["upstream"]["strategize"])
+
+        failed = [r for r in results if r["status"] != "ok"]
+        if failed:
+            st.warning(f"⚠️ {len(failed)} of {len(results)} variants failed. See below for details.")
+        per_row = min(3, len(results))
+        for start in range(0, len(results), per_row):
+            for column, result in zip(st.columns(per_row), results[start:start + per_row]):
+                with column:
+                    st.markdown(f"**{result['email_tone']} · {result['language']} · {result['email_length']}**")
+                    if result["status"] != "ok":
+                        st.error(result["error"])
+                        continue
+                    st.caption(f"{result['seconds']:.1f}s · pitches {result['service']}")
+                    st.text_area("Email", result["email"], height=320, key=f"variant_{result['index']}", label_visibility="collapsed")
+
+        st.download_button(
+            "📥 Download Variants (CSV)",
+            data=results_to_csv([{"url": variant_run["url"], **r} for r in results], VARIANT_COLUMNS),
+            file_name="cold_email_variants.csv",
+            mime="text/csv"
+        )
+
+    st.markdown("---")
+    st.caption("🚀 Powered by CrewAI + Groq | Made with ❤️ using Streamlit")
+    st.stop()
+
 col1, col2 = st.columns([2, 1])
 
 with col1:
@@ -227,236 +800,307 @@ if st.button("🚀 Generate Cold Email", type="primary", use_container_width=Tru
     if not target_url.strip():
         st.error("Please enter a valid URL!")
     else:
-        scrape_tool = ScrapeWebsiteTool()
-        
+        stage_llms = load_llms(stream_stages=STREAM_STAGES)
         progress_bar = st.progress(0)
         status_text = st.empty()
-        
-        length_words = {"Short": "100", "Medium": "200", "Long": "350"}
-        
-        researcher = Agent(
-            role='Business Intelligence Analyst',
-            goal='Analyze the target company website and identify their core business and potential weaknesses.',
-            backstory="You are an expert at analyzing businesses just by looking at their landing page. You look for what they do and where they might be struggling.",
-            tools=[scrape_tool],
-            llm=llm,
-            verbose=False,
-            allow_delegation=True,
-            memory=False
+        events = queue.Queue()
+        # A failed run keeps its id, so clicking Generate again resumes from the first stage that did not finish
+        checkpoint = run_checkpoints.run(
+            st.session_state.setdefault("run_id", uuid.uuid4().hex),
+            stage_cache if reuse_stages else None
         )
 
-        strategist = Agent(
-            role='Agency Strategist',
-            goal='Match the target company needs with ONE of our agency services.',
-            backstory=f"""You work for a top-tier digital agency.
-Your goal is to read the analysis of a prospect and decide which of OUR services to pitch.
-
-OUR SERVICES KNOWLEDGE BASE:
-{agency_services}
+        def run_in_background():
+            # No Streamlit calls in here: the worker only reports through the queue
+            try:
+                result = run_email_pipeline(
+                    stage_llms["analyze"],
+                    target_url,
+                    recipient_name=recipient_name,
+                    email_tone=email_tone,
+                    language=language,
+                    email_length=email_length,
+                    selected_template=selected_template,
+                    strategy_mode=strategy_mode,
+                    finalizer_mode=finalizer_mode,
+                    cache=checkpoint,
+                    scrape_tool=shared_scrape_tool(token_budget, crawl_pages),
+                    stage_llms=stage_llms,
+                    on_stage=lambda stage, output: events.put(("stage", stage, output)),
+                    on_token=lambda chunk: events.put(("token", None, chunk)),
+                    on_metrics=lambda record: events.put(("metrics", record["stage"], record))
+                )
+                events.put(("done", None, result))
+            except Exception as e:
+                events.put(("error", None, e))
 
-You must pick the SINGLE best service for this specific client and explain why.""",
-            llm=llm,
-            verbose=False,
-            memory=False,
-        )
+        with st.status("🎯 Processing your request...", expanded=True) as status:
+            status_text.text(STAGE_STATUS["analyze"])
+            started = time.perf_counter()
+            stage_started = started
+            current_stage = "analyze"
+            stage_records = {}
+            first_output_at = None
+            # Per streaming stage: its header, the placeholder its text grows in, and the reply so far
+            streams = {}
+            threading.Thread(target=run_in_background, daemon=True).start()
 
-        writer = Agent(
-            role='Senior Sales Copywriter',
-            goal=f'Write a {email_tone.lower()} cold email that sounds human and professional in {language}.',
-            backstory=f"""You write emails that get replies. You never sound robotic.
-            You mention specific details found by the Researcher to prove we actually looked at their site.
-            Use a {email_tone} tone and write in {language}.""",
-            llm=llm,
-            verbose=False
-        )
+            while True:
+                try:
+                    kind, stage, payload = events.get(timeout=0.25)
+                except queue.Empty:
+                    # Nothing new yet; keep the running stage's clock ticking
+                    if current_stage:
+                        status_text.text(f"{STAGE_STATUS[current_stage]} ({time.perf_counter() - stage_started:.1f}s)")
+                    continue
+                if kind == "error":
+                    saved = [stage for stage in STAGES if stage in checkpoint.completed()]
+                    status.update(label="❌ Generation failed", state="error", expanded=True)
+                    if saved:
+                        resume_at = next((stage for stage in STAGES if stage not in saved), "finalize")
+                        st.error(
+                            f"❌ {payload}\n\n💾 {', '.join(STAGE_LABELS[stage] for stage in saved)} saved. "
+                            f"Click Generate again to resume from the {STAGE_LABELS[resume_at]}."
+                        )
+                    else:
+                        st.error(f"❌ {payload}")
+                    st.stop()
+                if kind == "done":
+                    outputs = payload
+                    checkpoint.discard()
+                    st.session_state.pop("run_id", None)
+                    break
 
-        email_finalizer = Agent(
-            role='Email Campaign Manager',
-            goal='Finalize and prepare the email for delivery with proper formatting and send-off.',
-            backstory="""You are an expert email campaign manager. Your job is to take drafted emails and:
-            1. Add a professional subject line
-            2. Format the email properly with greeting and signature
-            3. Add a compelling call-to-action
-            4. Prepare the final version ready to be sent
-            You ensure every email is polished and ready for delivery.""",
-            llm=llm,
-            verbose=False
-        )
+                now = time.perf_counter()
+                if kind == "metrics":
+                    # Arrives as each stage's crew finishes, just before its output
+                    stage_records[stage] = payload
+                    progress_bar.progress(len(stage_records) / len(STAGES))
+                    continue
+                if kind == "token":
+                    # Stages run one after another, so a chunk belongs to the one running now
+                    stream = streams.get(current_stage)
+                    if stream is None:
+                        header = st.empty()
+                        header.markdown(f"**{STAGE_LABELS[current_stage]}** is writing...")
+                        stream = streams[current_stage] = {"header": header, "text": st.empty(), "reply": ""}
+                    stream["reply"] += payload
+                    # A JSON reply shows only its body, as far as it has arrived; the stage's validated output replaces it
+                    visible = streamed_body(visible_answer(stream["reply"]))
+                    if visible.strip():
+                        stream["text"].markdown(visible)
+                        if first_output_at is None:
+                            first_output_at = now - started
+                    continue
 
-        with st.status("🎯 Processing your request...", expanded=True) as status:
-            task_analyze = Task(
-                description=f"Scrape the website {target_url}. Summarize what the company does and identify 1 key area where they could improve (e.g., design, traffic, automation).",
-                expected_output="A brief summary of the company and their potential pain points.",
-                agent=researcher
-            )
+                if first_output_at is None:
+                    first_output_at = now - started
+                record = stage_records.get(stage)
+                # The writer and finalizer may hand over an EmailDraft or ColdEmail instead of text
+                text = payload.text() if hasattr(payload, "text") else payload
+                timing = describe_stage_metrics(record) if record else f"{now - stage_started:.1f}s"
+                stream = streams.get(stage)
+                if stream:
+                    stream["header"].markdown(f"**{STAGE_LABELS[stage]}** finished · {timing}")
+                    stream["text"].markdown(text)
+                else:
+                    st.markdown(f"**{STAGE_LABELS[stage]}** finished · {timing}")
+                    st.write(text)
+                stage_started = now
+                current_stage = STAGES[STAGES.index(stage) + 1] if stage != "finalize" else None
+                status_text.text(STAGE_STATUS[current_stage] if current_stage else "✅ Complete!")
 
-            task_strategize = Task(
-                description="Based on the analysis, pick ONE service from our Agency Knowledge Base that solves their problem. Explain the match.",
-                expected_output="The selected service and the reasoning for the match.",
-                agent=strategist,
-                context=[task_analyze]
+            status.update(
+                label=f"✅ Email generated in {time.perf_counter() - started:.1f}s (first output after {first_output_at:.1f}s)",
+                state="complete",
+                expanded=False
             )
-
-            recipient = recipient_name if recipient_name.strip() else "the CEO"
-            progress_bar.progress(25)
-            status_text.text("🔍 Researcher: Analyzing website...")
             
-            task_write = Task(
-                description=f"Draft a {email_tone.lower()} cold email to {recipient} of the target company in {language}. Use the {selected_template} template style. Pitch the selected service. Keep it around {length_words[email_length]} words.",
-                expected_output=f"A {email_tone.lower()} cold email body in {language}.",
-                agent=writer,
-                context=[task_analyze, task_strategize]
+            email_history.add(
+                target_url,
+                email_tone,
+                language,
+                outputs["finalize"],
+                recipient_name=recipient_name,
+                length=email_length,
+                template=selected_template
             )
 
-            progress_bar.progress(50)
-            status_text.text("✍️ Writer: Creating email content...")
-
-            task_finalize = Task(
-                description=f"""Take the drafted email and finalize it for sending in {language}:
-                1. Create a compelling subject line (max 50 characters)
-                2. Add a professional greeting
-                3. Include the email body ({email_tone} tone)
-                4. Add a clear call-to-action
-                5. Add a professional signature with contact info placeholder
-                Format the complete email ready to be sent.""",
-                expected_output="A complete, formatted email with subject line, greeting, body, CTA, and signature ready to send.",
-                agent=email_finalizer,
-                context=[task_write]
-            )
+        st.session_state.last_email = {
+            "outputs": outputs,
+            "url": target_url,
+            "tone": email_tone,
+            "language": language,
+            "length": email_length,
+            "template": selected_template,
+            "extraction": content_extractor.report(normalize_url(target_url)),
+            "crawl": site_crawler.report(normalize_url(target_url)) if crawl_pages else None,
+            "main_model": model_option,
+            "routes": routes
+        }
+        st.success("🎉 Cold email generated successfully!")
+
+if st.session_state.get("last_email"):
+    last_email = st.session_state.last_email
+    outputs = last_email["outputs"]
+    email = outputs["finalize"]
+    email_text = email.text()
+    st.markdown("---")
 
-            progress_bar.progress(75)
-            status_text.text("📤 Finalizer: Polishing email...")
+    tab1, tab2, tab3, tab4 = st.tabs(["📧 Final Email", "📊 Full Analysis", "📤 Send Email", "📜 History"])
 
-            sales_crew = Crew(
-                agents=[researcher, strategist, writer, email_finalizer],
-                tasks=[task_analyze, task_strategize, task_write, task_finalize],
-                process=Process.sequential,
-                verbose=False,
-                memory=False
+    with tab1:
+        st.markdown("### Your Personalized Cold Email")
+        
+        col_copy1, col_copy2, col_space = st.columns([1, 1, 2])
+        with col_copy1:
+            st.download_button(
+                "📋 Download",
+                data=email_text,
+                file_name="cold_email.txt",
+                mime="text/plain"
             )
+        with col_copy2:
+            if st.button("📄 Copy to Clipboard"):
+                st.write("<script>navigator.clipboard.writeText(`" + email_text.replace('`', '\\`') + "`)</script>", unsafe_allow_html=True)
+                st.toast("✅ Copied to clipboard!")
+        
+        with st.container():
+            st.markdown("#### Gmail Preview:")
+            st.markdown(f"""
+            <div style="background: #f6f8fa; border: 1px solid #e1e4e8; border-radius: 10px; padding: 20px; font-family: Arial, sans-serif;">
+                <pre style="white-space: pre-wrap; word-wrap: break-word; margin: 0;">{email_text}</pre>
+            </div>
+            """, unsafe_allow_html=True)
 
-            result = sales_crew.kickoff()
-            progress_bar.progress(100)
-            status_text.text("✅ Complete!")
-            status.update(label="✅ Email generated successfully!", state="complete")
-            
-            st.session_state.email_history.append({
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                "url": target_url,
-                "tone": email_tone,
-                "language": language,
-                "email": result.raw
-            })
+    with tab2:
+        st.markdown("### Complete Crew Output")
+        st.markdown("#### 🔍 Company Analysis")
+        extraction = last_email.get("extraction")
+        if extraction:
+            st.caption(
+                f"✂️ Page trimmed from {extraction['tokens_before']:,} to {extraction['tokens_after']:,} tokens "
+                f"({extraction['tokens_saved']:,} saved, {extraction['blocks_kept']}/{extraction['blocks_total']} sections kept, "
+                f"{extraction['tokenizer']})"
+            )
+        crawl = last_email.get("crawl")
+        if crawl:
+            read = [f"{page['kind']} ({page['tokens']} tokens)" for page in crawl["pages"] if page["status"] == "ok"]
+            blocked = sum(page["status"] == "robots" for page in crawl["pages"])
+            st.caption(
+                f"🕸️ Also read: {', '.join(read) or 'no other pages'} · "
+                f"{crawl['lines_deduped']} lines shared with other pages dropped · {crawl['tokens_total']:,} tokens in total"
+                + (f" · {blocked} pages disallowed by robots.txt" if blocked else "")
+            )
+        st.write(outputs["analyze"])
+        st.markdown("#### 🎯 Selected Service")
+        if outputs["strategy_source"] == "local":
+            st.caption(f"⚡ Picked by the local matcher (confidence {outputs['match']['confidence']:.0%})")
+        elif outputs["match"]:
+            st.caption(f"🧠 Local matcher was unsure (confidence {outputs['match']['confidence']:.0%}), so the LLM strategist decided")
+        st.write(outputs["strategize"])
+        st.markdown("#### 📧 Final Email")
+        st.caption(f"📦 Pitches: {email.service}")
+        st.write(email_text)
+        
+        st.markdown("### 📊 Generation Details")
+        detail_col1, detail_col2, detail_col3, detail_col4 = st.columns(4)
+        with detail_col1:
+            st.metric("Tone", last_email["tone"])
+        with detail_col2:
+            st.metric("Language", last_email["language"])
+        with detail_col3:
+            st.metric("Length", last_email["length"])
+        with detail_col4:
+            st.metric("Template", last_email["template"])
 
-        st.success("🎉 Cold email generated successfully!")
-        st.markdown("---")
+        stage_records = outputs.get("metrics") or {}
+        if stage_records:
+            st.markdown("#### ⏱️ Stage Timings")
+            total_col1, total_col2, total_col3 = st.columns(3)
+            total_col1.metric("Total Time", f"{sum(r['seconds'] for r in stage_records.values()):.1f}s")
+            total_col2.metric("Prompt Tokens", f"{sum(r['prompt_tokens'] for r in stage_records.values()):,}")
+            total_col3.metric("Completion Tokens", f"{sum(r['completion_tokens'] for r in stage_records.values()):,}")
+            st.dataframe(stage_metrics_table(stage_records), hide_index=True, use_container_width=True)
+            cached = [stage for stage, record in stage_records.items() if record["source"] == "cache"]
+            if cached:
+                st.caption(
+                    f"🧩 {', '.join(STAGE_LABELS[stage] for stage in cached)} reused from the stage cache, "
+                    f"{sum(stage_records[stage]['seconds_saved'] for stage in cached):.1f}s saved"
+                )
+            resumed = [stage for stage, record in stage_records.items() if record["source"] == "checkpoint"]
+            if resumed:
+                st.caption(
+                    f"💾 Resumed after a failed attempt: {', '.join(STAGE_LABELS[stage] for stage in resumed)} kept, "
+                    f"{sum(stage_records[stage]['seconds_saved'] for stage in resumed):.1f}s saved"
+                )
 
-        tab1, tab2, tab3, tab4 = st.tabs(["📧 Final Email", "📊 Full Analysis", "📤 Send Email", "📜 History"])
+        finalize_record = stage_records.get("finalize")
+        if finalize_record:
+            finalizers = stage_metrics.by_model().get("finalize", {})
+            local = finalizers.get("local")
+            llm_models = {model: stats for model, stats in finalizers.items() if model != "local"}
+            if finalize_record["source"] == "local":
+                if llm_models:
+                    model, stats = max(llm_models.items(), key=lambda item: item[1]["runs"])
+                    st.caption(
+                        f"⚡ Finalized from templates in {finalize_record['seconds'] * 1000:.2f} ms; "
+                        f"the LLM finalizer takes {stats['p50']:.1f}s (p50 on {model})"
+                    )
+                else:
+                    st.caption(f"⚡ Finalized from templates in {finalize_record['seconds'] * 1000:.2f} ms, one LLM round trip saved")
+            elif local and finalize_record["source"] == "llm":
+                st.caption(
+                    f"🧠 The LLM finalizer took {finalize_record['seconds']:.1f}s; "
+                    f"local templates take {local['p50'] * 1000:.2f} ms (p50)"
+                )
 
-        with tab1:
-            st.markdown("### Your Personalized Cold Email")
-            
-            col_copy1, col_copy2, col_space = st.columns([1, 1, 2])
-            with col_copy1:
-                st.download_button(
-                    "📋 Download",
-                    data=result.raw,
-                    file_name="cold_email.txt",
-                    mime="text/plain"
+        if last_email.get("routes"):
+            # Stages that ran locally or were restored this time never reached their routed model
+            rerouted = [
+                stage for stage, route in last_email["routes"].items()
+                if route["model"] != last_email["main_model"] and stage_records.get(stage, {}).get("source") not in ("local", "cache", "checkpoint")
+            ]
+            savings = routing_savings(last_email["routes"], last_email["main_model"])
+            savings = {stage: saved for stage, saved in savings.items() if stage in rerouted}
+            for stage, saved in savings.items():
+                st.caption(
+                    f"🧭 {STAGE_LABELS[stage]} on {saved['model']}: p50 {saved['p50']:.1f}s vs {saved['baseline_p50']:.1f}s "
+                    f"on {saved['baseline_model']} ({saved['seconds_saved']:.1f}s faster), "
+                    f"{saved['tokens']:,} vs {saved['baseline_tokens']:,} tokens per run"
                 )
-            with col_copy2:
-                if st.button("📄 Copy to Clipboard"):
-                    st.write("<script>navigator.clipboard.writeText(`" + result.raw.replace('`', '\\`') + "`)</script>", unsafe_allow_html=True)
-                    st.toast("✅ Copied to clipboard!")
-            
-            with st.container():
-                st.markdown("#### Gmail Preview:")
-                st.markdown(f"""
-                <div style="background: #f6f8fa; border: 1px solid #e1e4e8; border-radius: 10px; padding: 20px; font-family: Arial, sans-serif;">
-                    <pre style="white-space: pre-wrap; word-wrap: break-word; margin: 0;">{result.raw}</pre>
-                </div>
-                """, unsafe_allow_html=True)
-
-        with tab2:
-            st.markdown("### Complete Crew Output")
-            st.write(result.raw)
+            if rerouted and len(savings) < len(rerouted):
+                st.caption("🧭 Savings for a rerouted stage show up once it has also run on the main model.")
+
+    with tab3:
+        st.markdown("### 📤 Send Email")
+        st.info("Enter your email credentials to queue the email. It is delivered in the background, with retries if the mail server is unavailable.")
+        
+        with st.form("email_send_form"):
+            sender_email = st.text_input("Your Email (Gmail)", placeholder="your.email@gmail.com")
+            sender_password = st.text_input("Your App Password", type="password", 
+                help="Use Gmail App Password, not your regular password. Get it from Google Account > Security > 2-Step Verification > App passwords")
+            recipient_email = st.text_input("Recipient Email", placeholder="ceo@company.com")
             
-            st.markdown("### 📊 Generation Details")
-            detail_col1, detail_col2, detail_col3, detail_col4 = st.columns(4)
-            with detail_col1:
-                st.metric("Tone", email_tone)
-            with detail_col2:
-                st.metric("Language", language)
-            with detail_col3:
-                st.metric("Length", email_length)
-            with detail_col4:
-                st.metric("Template", selected_template)
-
-        with tab3:
-            st.markdown("### 📤 Send Email")
-            st.info("Enter your email credentials to send the email directly.")
+            send_button = st.form_submit_button("🚀 Queue Email", type="primary")
             
-            with st.form("email_send_form"):
-                sender_email = st.text_input("Your Email (Gmail)", placeholder="your.email@gmail.com")
-                sender_password = st.text_input("Your App Password", type="password", 
-                    help="Use Gmail App Password, not your regular password. Get it from Google Account > Security > 2-Step Verification > App passwords")
-                recipient_email = st.text_input("Recipient Email", placeholder="ceo@company.com")
-                
-                send_button = st.form_submit_button("🚀 Send Email Now", type="primary")
-                
-                if send_button:
-                    if not sender_email or not sender_password or not recipient_email:
-                        st.error("Please fill in all email fields!")
-                    elif not re.match(r'^[^@]+@[^@]+\.[^@]+$', recipient_email):
-                        st.error("Please enter a valid recipient email address!")
-                    else:
-                        with st.spinner("Sending email..."):
-                            try:
-                                msg = MIMEMultipart()
-                                msg['From'] = sender_email
-                                msg['To'] = recipient_email
-                                
-                                email_content = result.raw
-                                lines = email_content.split('\n')
-                                subject = "Cold Email Pitch"
-                                body = email_content
-                                
-                                for line in lines:
-                                    if line.lower().startswith('subject:'):
-                                        subject = line.replace('Subject:', '').replace('subject:', '').strip()
-                                        body = '\n'.join(lines[lines.index(line)+1:]).strip()
-                                        break
-                                
-                                msg['Subject'] = subject
-                                msg.attach(MIMEText(body, 'plain'))
-                                
-                                server = smtplib.SMTP('smtp.gmail.com', 587)
-                                server.starttls()
-                                server.login(sender_email, sender_password)
-                                server.send_message(msg)
-                                server.quit()
-                                
-                                st.success(f"✅ Email sent successfully to {recipient_email}!")
-                                st.balloons()
-                            except Exception as e:
-                                st.error(f"❌ Failed to send email: {str(e)}")
-                                st.info("💡 Tip: Make sure you're using a Gmail App Password, not your regular Gmail password.")
-
-        with tab4:
-            st.markdown("### 📜 Email History")
-            if st.session_state.email_history:
-                for idx, item in enumerate(reversed(st.session_state.email_history)):
-                    with st.expander(f"📧 {item['timestamp']} - {item['url'][:40]}..."):
-                        st.markdown(f"**Tone:** {item['tone']} | **Language:** {item['language']}")
-                        st.text_area("Email Content", item['email'], height=200, key=f"history_{idx}")
-                        if st.button(f"Load This Email", key=f"load_{idx}"):
-                            st.info("Feature: Click to reload this email into the editor")
-                
-                if st.button("🗑️ Clear History"):
-                    st.session_state.email_history = []
-                    st.rerun()
-            else:
-                st.info("No emails generated yet. Create your first cold email!")
+            if send_button:
+                if not sender_email or not sender_password or not recipient_email:
+                    st.error("Please fill in all email fields!")
+                elif not re.match(r'^[^@]+@[^@]+\.[^@]+$', recipient_email):
+                    st.error("Please enter a valid recipient email address!")
+                else:
+                    outbox.register_sender(sender_email, sender_password)
+                    message_id = outbox.enqueue(build_email_message(sender_email, recipient_email, email), email)
+                    st.success(f"📬 Email #{message_id} to {recipient_email} queued for delivery!")
+
+        render_outbox_status("single")
+
+    with tab4:
+        render_history()
+else:
+    with st.expander("📜 Email History"):
+        render_history()
 
 st.markdown("---")
 st.caption("🚀 Powered by CrewAI + Groq | Made with ❤️ using Streamlit")
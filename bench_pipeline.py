@@ -0,0 +1,346 @@
+"""Offline benchmark for the cold email pipeline.
+
+Runs the same agents, tasks and stage LLMs as app.py, with two stand-ins so the
+numbers are repeatable and nothing leaves the machine:
+
+  * the LLM is fake_llm's provider, with a fixed time to first token and token rate
+  * websites are recorded homepages served from localhost by fixture_server
+
+Stages are routed to models as in the app; the fake small model gets its own
+speed, and --no-routing runs everything on the main model for comparison.
+
+and reports, for single emails and for an N-URL campaign:
+
+  * throughput (emails per minute) and end-to-end latency
+  * per-stage latency distributions (p50 / p95 / max) and tokens
+  * memory: peak RSS, plus peak Python allocations with --tracemalloc
+
+Caches start empty in a temporary directory on every invocation, so runs measure
+the cold path unless --warm-cache reuses the scrape, LLM and stage caches in
+.cache/. Metrics, run checkpoints and the other databases a run writes always go
+to the temporary directory.
+
+    python bench_pipeline.py
+    python bench_pipeline.py --mode campaign --urls 50 --executor threaded --workers 8
+    python bench_pipeline.py --latency 0.5 --tokens-per-second 80 --json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+STAGE_ORDER = ["analyze", "strategize", "write", "finalize"]
+
+
+# Files a benchmark run writes; they never land in the real .cache/
+STATE_PATHS = {
+    "METRICS_PATH": "metrics.jsonl",
+    "METRICS_PROM_PATH": "metrics.prom",
+    "RUN_CHECKPOINTS_PATH": "run_checkpoints.sqlite3",
+    "DOMAIN_INDEX_PATH": "domain_index.sqlite3",
+    "EMAIL_HISTORY_PATH": "email_history.sqlite3",
+    "OUTBOX_PATH": "outbox.sqlite3",
+}
+# Caches that start empty too, unless --warm-cache asks to reuse the real ones
+CACHE_PATHS = {
+    "SCRAPE_CACHE_PATH": "scrape_cache.sqlite3",
+    "LLM_CACHE_PATH": "llm_cache.sqlite3",
+    "STAGE_CACHE_PATH": "stage_cache.sqlite3",
+}
+
+
+def isolate(warm_cache, llm_cache):
+    # Module settings are read from the environment on import, so this runs before any of them load
+    workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    for name, file_name in {**STATE_PATHS, **({} if warm_cache else CACHE_PATHS)}.items():
+        os.environ[name] = os.path.join(workdir, file_name)
+    if not llm_cache:
+        os.environ["LLM_CACHE"] = "0"
+    # Keeps litellm, the tokenizer and crewai's telemetry off the network
+    os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def distribution(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "n": len(ordered),
+        "mean": round(statistics.fmean(ordered), 4),
+        "p50": round(ordered[round(0.5 * (len(ordered) - 1))], 4),
+        "p95": round(ordered[round(0.95 * (len(ordered) - 1))], 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+class Phase:
+    """Collects every stage record and the memory high-water mark while one phase runs."""
+
+    def __init__(self, name, trace_memory):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.records = []
+        self._lock = threading.Lock()
+
+    def _listen(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def __enter__(self):
+        from metrics import stage_metrics
+        stage_metrics.add_listener(self._listen)
+        if self.trace_memory:
+            tracemalloc.start()
+        self.rss_before = rss_mb()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        from metrics import stage_metrics
+        self.seconds = time.perf_counter() - self.started
+        stage_metrics.remove_listener(self._listen)
+        self.rss_after = rss_mb()
+        self.traced_peak = None
+        if self.trace_memory:
+            self.traced_peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+
+    def report(self, latencies, failures=0):
+        stages = {}
+        for stage in STAGE_ORDER:
+            records = [record for record in self.records if record["stage"] == stage and not record["error"]]
+            if records:
+                stages[stage] = {
+                    "seconds": distribution([record["seconds"] for record in records]),
+                    "prompt_tokens": sum(record["prompt_tokens"] for record in records),
+                    "completion_tokens": sum(record["completion_tokens"] for record in records),
+                    "tool_calls": sum(record["tool_calls"] for record in records),
+                    "local": sum(record["source"] == "local" for record in records),
+                }
+        done = len(latencies)
+        return {
+            "emails": done,
+            "failures": failures,
+            "wall_seconds": round(self.seconds, 3),
+            "emails_per_minute": round(done / self.seconds * 60, 2) if self.seconds else None,
+            "latency": distribution(latencies),
+            "stages": stages,
+            "memory": {
+                "rss_before_mb": round(self.rss_before, 1) if self.rss_before else None,
+                "rss_after_mb": round(self.rss_after, 1) if self.rss_after else None,
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+                "traced_peak_mb": round(self.traced_peak, 2) if self.traced_peak is not None else None,
+            },
+        }
+
+
+def bench_single(stage_llms, urls, runs, options, scrape_tool, trace_memory):
+    from email_crew import run_email_pipeline
+    latencies, failures = [], 0
+    with Phase("single", trace_memory) as phase:
+        for i in range(runs):
+            started = time.perf_counter()
+            try:
+                # Exactly what the Generate button runs
+                run_email_pipeline(
+                    stage_llms["analyze"], urls[i % len(urls)],
+                    scrape_tool=scrape_tool,
+                    stage_llms=stage_llms,
+                    on_token=lambda chunk: None,
+                    **options
+                )
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                failures += 1
+                print(f"single run {i} failed: {e}", file=sys.stderr)
+    return phase.report(latencies, failures)
+
+
+def bench_campaign(stage_llms, urls, options, scrape_tool, executor, workers, limits, token_budget, trace_memory,
+                   crawl_pages=0):
+    from campaign import run_campaign
+    from pipeline import CampaignPipeline
+    targets = [{"url": url, "recipient_name": "", "recipient_email": ""} for url in urls]
+    latencies, failures = [], 0
+    with Phase("campaign", trace_memory) as phase:
+        if executor == "pipelined":
+            rows = CampaignPipeline(stage_llms["analyze"], limits=limits, stage_llms=stage_llms,
+                                    token_budget=token_budget, crawl_pages=crawl_pages, **options).run(targets)
+        else:
+            rows = run_campaign(stage_llms["analyze"], targets, max_workers=workers, scrape_tool=scrape_tool,
+                                stage_llms=stage_llms, **options)
+        for row in rows:
+            if row["status"] == "ok":
+                latencies.append(row["seconds"])
+            else:
+                failures += 1
+                print(f"{row['url']} failed: {row['error']}", file=sys.stderr)
+    report = phase.report(latencies, failures)
+    report["executor"] = executor
+    return report
+
+
+def run(args):
+    isolate(args.warm_cache, args.llm_cache)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    imports_started = time.perf_counter()
+    from fake_llm import register_fake_llm
+    from fixture_server import FixtureServer
+    from resources import shared_scrape_tool
+    from routing import DEFAULT_ROUTES, ROUTING_SMALL_MODEL, resolve_routes, routed_llms
+    from email_crew import warm_up
+    from pipeline import DEFAULT_STAGE_LIMITS
+    import crewai  # noqa: F401  (imported here so its cost is not charged to the first run)
+    import_seconds = time.perf_counter() - imports_started
+
+    model, fake = register_fake_llm(args.latency, args.tokens_per_second, args.completion_tokens,
+                                    profiles={"bench-small": (args.small_latency, args.small_tokens_per_second)})
+    small_model = model + "-small"
+    # The app's routing policy, with the fake small model standing in for the real one
+    overrides = {
+        stage: {"model": small_model if route["model"] == ROUTING_SMALL_MODEL and not args.no_routing else None}
+        for stage, route in DEFAULT_ROUTES.items()
+    }
+    routes = resolve_routes(model, overrides)
+    llm_options = {"api_key": "fake", "temperature": 0.7, "cache_sampled": False}
+    options = {
+        "strategy_mode": args.strategy_mode,
+        "finalizer_mode": args.finalizer_mode,
+        "email_tone": "Professional",
+        "language": "English",
+        "email_length": "Medium",
+        "selected_template": "Professional",
+    }
+    limits = {**DEFAULT_STAGE_LIMITS, **{stage: limit for stage, limit in zip(
+        ["fetch", "analyze", "strategize", "write", "finalize"], args.limits or [])}}
+
+    report = {
+        "config": {
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "completion_tokens": args.completion_tokens,
+            "page_latency": args.page_latency,
+            "strategy_mode": args.strategy_mode,
+            "finalizer_mode": args.finalizer_mode,
+            "routes": routes,
+            "token_budget": args.token_budget,
+            "crawl_pages": args.crawl_pages,
+            "warm_cache": args.warm_cache,
+            "llm_cache": args.llm_cache,
+        },
+        "import_seconds": round(import_seconds, 3),
+    }
+    with FixtureServer(args.fixtures, latency=args.page_latency) as server:
+        single_llms = routed_llms("bench", routes, stream_stages=("finalize",), **llm_options)
+        campaign_llms = routed_llms("bench", routes, **llm_options)
+        scrape_tool = shared_scrape_tool(args.token_budget, args.crawl_pages)
+        # Same warm-up the app's preloader does, so the first run is not charged for agent construction
+        warm_up(single_llms["analyze"], scrape_tool, options["email_tone"], options["language"], stage_llms=single_llms)
+
+        if args.mode in ("single", "both"):
+            report["single"] = bench_single(single_llms, server.urls(), args.runs, options,
+                                            scrape_tool, args.tracemalloc)
+        if args.mode in ("campaign", "both"):
+            report["campaign"] = bench_campaign(campaign_llms, server.urls(args.urls), options, scrape_tool,
+                                                args.executor, args.workers, limits, args.token_budget,
+                                                args.tracemalloc, args.crawl_pages)
+        report["pages_served"] = server.requests
+    report["fake_llm"] = dict(fake.stats)
+    return report
+
+
+def print_phase(title, phase):
+    print(f"{title}: {phase['emails']} emails in {phase['wall_seconds']:.2f}s "
+          f"({phase['emails_per_minute']} emails/min, {phase['failures']} failed)")
+    if phase["latency"]:
+        latency = phase["latency"]
+        print(f"  end to end:  p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  max {latency['max']:.3f}s")
+    for stage, stats in phase["stages"].items():
+        seconds = stats["seconds"]
+        extra = f"  ({stats['local']} local)" if stats["local"] else ""
+        print(f"  {stage:<11}  p50 {seconds['p50']:.3f}s  p95 {seconds['p95']:.3f}s  max {seconds['max']:.3f}s  "
+              f"{stats['prompt_tokens']:,} prompt / {stats['completion_tokens']:,} completion tokens, "
+              f"{stats['tool_calls']} tool calls{extra}")
+    memory = phase["memory"]
+    line = f"  memory:      RSS {memory['rss_before_mb']} -> {memory['rss_after_mb']} MB, peak {memory['peak_rss_mb']} MB"
+    if memory["traced_peak_mb"] is not None:
+        line += f", Python allocations peak {memory['traced_peak_mb']} MB"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["single", "campaign", "both"], default="both")
+    parser.add_argument("--runs", type=int, default=5, help="Single emails to generate one after another")
+    parser.add_argument("--urls", type=int, default=20, help="Targets in the campaign")
+    parser.add_argument("--executor", choices=["pipelined", "threaded"], default="pipelined",
+                        help="Campaign runner: the staged pipeline or one crew per worker thread")
+    parser.add_argument("--workers", type=int, default=4, help="Worker threads for the threaded executor")
+    parser.add_argument("--limits", type=int, nargs=5, metavar=("FETCH", "ANALYZE", "STRATEGIZE", "WRITE", "FINALIZE"),
+                        help="Per-stage worker limits for the pipelined executor")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake LLM generation speed")
+    parser.add_argument("--small-latency", type=float, default=0.1, help="Time to first token of the small routed model")
+    parser.add_argument("--small-tokens-per-second", type=float, default=600.0, help="Generation speed of the small routed model")
+    parser.add_argument("--no-routing", action="store_true", help="Run every stage on the main model, for comparison")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Words in each fake answer")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="Seconds the fixture server takes per page")
+    parser.add_argument("--fixtures", help="Directory of recorded <name>.html homepages (built-in pages by default)")
+    parser.add_argument("--strategy-mode", choices=["local", "llm"], default="local")
+    parser.add_argument("--finalizer-mode", choices=["local", "llm"], default="local")
+    parser.add_argument("--token-budget", type=int, default=None, help="Page token budget (default EXTRACT_TOKEN_BUDGET)")
+    parser.add_argument("--crawl-pages", type=int, default=0, help="Extra internal pages read per site")
+    parser.add_argument("--warm-cache", action="store_true", help="Use the scrape, LLM and stage caches in .cache/ instead of empty ones")
+    parser.add_argument("--llm-cache", action="store_true", help="Leave the LLM response cache on")
+    parser.add_argument("--tracemalloc", action="store_true", help="Trace Python allocations (slows the run down)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    if args.token_budget is None:
+        from content_extractor import EXTRACT_TOKEN_BUDGET
+        args.token_budget = EXTRACT_TOKEN_BUDGET
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    config = report["config"]
+    small = sorted(stage for stage, route in config["routes"].items() if route["model"].endswith("-small"))
+    print(f"routed to the small model: {', '.join(small) or 'nothing'}")
+    print(f"fake LLM: {config['latency']}s to first token, {config['tokens_per_second']} tokens/s; "
+          f"pages served in {config['page_latency']}s; libraries loaded in {report['import_seconds']:.2f}s")
+    if "single" in report:
+        print_phase("single", report["single"])
+    if "campaign" in report:
+        print_phase(f"campaign ({report['campaign']['executor']})", report["campaign"])
+    stats = report["fake_llm"]
+    print(f"fake LLM served {stats['calls']} calls ({stats['tool_calls']} tool requests), "
+          f"{stats['prompt_tokens']:,} prompt / {stats['completion_tokens']:,} completion tokens; "
+          f"{report['pages_served']} pages served")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Startup benchmark for the Streamlit apps.
+
+Runs an app in a fresh interpreter under `python -X importtime`, drives it with
+Streamlit's AppTest and reports:
+
+  * time to first paint: the first script run, i.e. what the user sees before typing anything
+  * time to first generation: from the first script run until the first email is generated
+  * the slowest imports (from -X importtime) and how long the preloader took
+    to load the heavy AI libraries in the background
+
+Generation uses a canned LLM response by default so the numbers measure our own
+overhead rather than the provider's latency; pass --live to call the real API.
+
+    python bench_startup.py
+    python bench_startup.py --think-time 3 --runs 3 --json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Valid as both an EmailDraft and a ColdEmail, so the writer and finalizer guardrails accept it
+MOCK_RESPONSE = "Thought: I now can give a great answer\nFinal Answer: " + json.dumps({
+    "subject": "Quick idea",
+    "greeting": "Hi there,",
+    "body": "Your site could load faster.",
+    "cta": "Open to a 15-minute call next week?",
+    "signature": "Best,\n[Your Name]",
+    "service": "Custom Web Development",
+})
+# What the apps show once an email is generated; an earlier st.success (the API key check) does not count
+GENERATED_MESSAGE = "Cold email generated successfully"
+
+DRIVER = r"""
+import json, os, sys, time
+started = time.perf_counter()
+app, api_key, think_time, live, mock_response, generated_message = (
+    sys.argv[1], sys.argv[2], float(sys.argv[3]), sys.argv[4] == "1", sys.argv[5], sys.argv[6]
+)
+sys.path.insert(0, os.path.dirname(os.path.abspath(app)))
+
+if not live:
+    import llm_cache
+    make_llm = llm_cache.make_llm
+    llm_cache.make_llm = lambda app_name, model, **kwargs: make_llm(app_name, model, mock_response=mock_response, **kwargs)
+
+from streamlit.testing.v1 import AppTest
+# The test harness is not part of the app's startup, so timings start after it
+harness = time.perf_counter() - started
+started = time.perf_counter()
+
+at = AppTest.from_file(app, default_timeout=600).run()
+first_paint = time.perf_counter() - started
+at.sidebar.text_input[0].input(api_key).run()
+key_entered = time.perf_counter() - started
+
+time.sleep(think_time)
+at.text_input[0].input("https://example.com").run()
+[button for button in at.button if "Generate" in button.label][0].click().run()
+first_generation = time.perf_counter() - started
+
+try:
+    from preload import preloader
+    preloaded = preloader.timings
+except ImportError:
+    # Lets the benchmark run against older checkouts for comparison
+    preloaded = {}
+print(json.dumps({
+    "harness": harness,
+    "first_paint": first_paint,
+    "key_entered": key_entered,
+    "first_generation": first_generation,
+    "generated": not at.exception and not at.error and any(generated_message in s.value for s in at.success),
+    "errors": [e.value for e in at.error],
+    "preloader": preloaded,
+}))
+"""
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr):
+    # Nesting is unreliable once the preloader imports on another thread, so
+    # every module is listed with its own cumulative time
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            _, cumulative, _, name = match.groups()
+            modules[name] = max(modules.get(name, 0), int(cumulative) / 1e6)
+    return modules
+
+
+def run_once(app, api_key, think_time, live):
+    env = dict(os.environ, LITELLM_LOCAL_MODEL_COST_MAP="True")
+    if not live:
+        # Keeps token counting from trying to download tokenizers
+        env.setdefault("HF_HUB_OFFLINE", "1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", DRIVER, app, api_key, str(think_time), "1" if live else "0", MOCK_RESPONSE,
+         GENERATED_MESSAGE],
+        capture_output=True, text=True, env=env
+    )
+    result_line = next((line for line in reversed(proc.stdout.splitlines()) if line.startswith("{")), None)
+    if proc.returncode or result_line is None:
+        raise RuntimeError(f"benchmark run failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(result_line)
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def summarize(runs, top):
+    def median(key):
+        return round(statistics.median(run[key] for run in runs), 3)
+
+    imports = {}
+    for run in runs:
+        for name, seconds in run["imports"].items():
+            imports.setdefault(name, []).append(seconds)
+    slowest = sorted(((name, statistics.median(times)) for name, times in imports.items()), key=lambda item: -item[1])
+    return {
+        "runs": len(runs),
+        "harness": median("harness"),
+        "first_paint": median("first_paint"),
+        "key_entered": median("key_entered"),
+        "first_generation": median("first_generation"),
+        "generated": all(run["generated"] for run in runs),
+        "errors": sorted({error for run in runs for error in run.get("errors", [])}),
+        "preloader": runs[-1]["preloader"],
+        "slowest_imports": [(name, round(seconds, 3)) for name, seconds in slowest[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+    parser.add_argument("--api-key", default=os.getenv("GROQ_API_KEY") or "gsk_benchmark")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Seconds between entering the key and clicking Generate, as a user would take to type a URL")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to list")
+    parser.add_argument("--live", action="store_true", help="Call the real LLM instead of a canned response")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    runs = [run_once(args.app, args.api_key, args.think_time, args.live) for _ in range(args.runs)]
+    report = summarize(runs, args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{os.path.basename(args.app)} — median of {report['runs']} run(s)")
+    print(f"  time to first paint:      {report['first_paint']:.2f}s (after {report['harness']:.2f}s loading the test harness)")
+    print(f"  API key entered:          {report['key_entered']:.2f}s")
+    print(f"  time to first generation: {report['first_generation']:.2f}s (think time {args.think_time:.1f}s)"
+          + ("" if report["generated"] else "  ⚠️ generation failed"))
+    for error in report["errors"]:
+        print(f"    {error}")
+    if report["preloader"]:
+        print("  preloader:                " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report["preloader"].items()))
+    print("  slowest imports:")
+    for name, seconds in report["slowest_imports"]:
+        print(f"    {seconds:7.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    main()
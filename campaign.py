@@ -0,0 +1,92 @@
+import csv
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from email_crew import generate_cold_email
+from email_schema import EMAIL_PARTS, email_columns
+from run_checkpoints import run_checkpoints, target_run_id
+
+URL_COLUMNS = ("url", "target_url", "website", "domain")
+NAME_COLUMNS = ("recipient_name", "name", "recipient", "contact")
+EMAIL_COLUMNS = ("recipient_email", "email", "email_address")
+# The email's parts get their own columns next to the full text, so exports never re-parse it
+RESULT_COLUMNS = ["timestamp", "url", "recipient_name", "recipient_email", "status", "seconds", *EMAIL_PARTS, "email", "error"]
+
+
+def read_targets(data):
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    rows = list(csv.reader(io.StringIO(data)))
+    if not rows:
+        return []
+
+    header = [col.strip().lower() for col in rows[0]]
+    url_col = next((header.index(c) for c in URL_COLUMNS if c in header), None)
+    name_col = next((header.index(c) for c in NAME_COLUMNS if c in header), None)
+    email_col = next((header.index(c) for c in EMAIL_COLUMNS if c in header), None)
+    if url_col is None:
+        # No header row: URL, then optional name and recipient email
+        url_col, name_col, email_col = 0, 1, 2
+    else:
+        rows = rows[1:]
+
+    targets = []
+    for row in rows:
+        if len(row) <= url_col or not row[url_col].strip():
+            continue
+        name = row[name_col].strip() if name_col is not None and len(row) > name_col else ""
+        email = row[email_col].strip() if email_col is not None and len(row) > email_col else ""
+        targets.append({"url": row[url_col].strip(), "recipient_name": name, "recipient_email": email})
+    return targets
+
+
+def _run_one(llm, target, options):
+    started = time.perf_counter()
+    row = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "url": target["url"],
+        "recipient_name": target.get("recipient_name", ""),
+        "recipient_email": target.get("recipient_email", ""),
+    }
+    try:
+        # Stages that finished in an earlier, failed run of the same target are not run again
+        checkpoint = run_checkpoints.run(target_run_id(target), options.get("cache"))
+        row["cold_email"] = generate_cold_email(
+            llm, target["url"], recipient_name=row["recipient_name"], **{**options, "cache": checkpoint}
+        )
+        checkpoint.discard()
+        row.update(email_columns(row["cold_email"]))
+        row["status"] = "ok"
+        row["error"] = ""
+    except Exception as e:
+        row["cold_email"] = None
+        row.update(email_columns())
+        row["status"] = "error"
+        row["error"] = str(e)
+    row["seconds"] = round(time.perf_counter() - started, 1)
+    return row
+
+
+def run_campaign(llm, targets, max_workers=4, **options):
+    # Yields one result row per target as soon as its crew finishes
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [pool.submit(_run_one, llm, target, options) for target in targets]
+        for future in as_completed(futures):
+            yield future.result()
+    except BaseException:
+        # Abandoned (GeneratorExit when a Streamlit rerun drops the generator): cancel the targets
+        # not started yet instead of blocking until the whole campaign has run
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+
+def results_to_csv(results, columns=RESULT_COLUMNS):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(results)
+    return out.getvalue()
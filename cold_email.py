@@ -1,17 +1,19 @@
 import streamlit as st
 import os
-import smtplib
 import re
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from crewai import Agent, Task, Crew, Process, LLM
-from crewai_tools import ScrapeWebsiteTool
+from outbox import outbox
+from smtp_pool import parse_email, build_message
 from dotenv import load_dotenv
+from preload import preloader
+from resources import shared_llm
 
 load_dotenv()
 
 st.set_page_config(page_title="Cold Email Generator", page_icon="📧", layout="wide")
 
+# crewai and crewai_tools load in the background while the page draws
+preloader.start()
+
 # Dark theme CSS with Comic Sans font
 st.markdown("""
 <style>
@@ -110,12 +112,13 @@ st.markdown("Enter a company URL and we'll analyze their business, identify pain
 
 api_key = os.getenv("GROQ_API_KEY")
 
-llm = LLM(
-    model="groq/llama-3.3-70b-versatile",
-    api_key=api_key,
-    temperature=0.7,
-    max_tokens=4096
-)
+llm_options = {
+    "model": "groq/llama-3.3-70b-versatile",
+    "api_key": api_key,
+    "temperature": 0.7,
+    "max_tokens": 4096
+}
+preloader.warm(shared_llm, "cold_email", **llm_options)
 
 agency_services = """
 1. SEO Optimization Service: Best for companies with good products but low traffic. We increase organic reach.
@@ -150,7 +153,11 @@ if st.button("🚀 Generate Cold Email", type="primary", use_container_width=Tru
     if not target_url.strip():
         st.error("Please enter a valid URL!")
     else:
-        scrape_tool = ScrapeWebsiteTool()
+        from crewai import Agent, Task, Crew, Process
+        from scrape_cache import CachedScrapeWebsiteTool
+
+        llm = shared_llm("cold_email", **llm_options)
+        scrape_tool = CachedScrapeWebsiteTool()
 
         researcher = Agent(
             role='Business Intelligence Analyst',
@@ -246,74 +253,73 @@ You must pick the SINGLE best service for this specific client and explain why."
             result = sales_crew.kickoff()
             status.update(label="✅ Analysis complete!", state="complete")
 
+        st.session_state.last_email = result.raw
         st.success("🎉 Cold email generated successfully!")
-        st.markdown("---")
-
-        tab1, tab2, tab3 = st.tabs(["📧 Final Email", "📊 Full Analysis", "📤 Send Email"])
-
-        with tab1:
-            st.markdown("### Your Personalized Cold Email")
-            st.info(result.raw)
-
-            col_copy, col_space = st.columns([1, 3])
-            with col_copy:
-                st.download_button(
-                    "📋 Download Email",
-                    data=result.raw,
-                    file_name="cold_email.txt",
-                    mime="text/plain"
-                )
-
-        with tab2:
-            st.markdown("### Complete Crew Output")
-            st.write(result.raw)
-
-        with tab3:
-            st.markdown("### 📤 Send Email")
-            st.info("Enter your email credentials to send the email directly.")
+
+# Rendered outside the button branch, so submitting the send form (which reruns the script) keeps the email
+if st.session_state.get("last_email"):
+    email_text = st.session_state.last_email
+    st.markdown("---")
+
+    tab1, tab2, tab3 = st.tabs(["📧 Final Email", "📊 Full Analysis", "📤 Send Email"])
+
+    with tab1:
+        st.markdown("### Your Personalized Cold Email")
+        st.info(email_text)
+
+        col_copy, col_space = st.columns([1, 3])
+        with col_copy:
+            st.download_button(
+                "📋 Download Email",
+                data=email_text,
+                file_name="cold_email.txt",
+                mime="text/plain"
+            )
+
+    with tab2:
+        st.markdown("### Complete Crew Output")
+        st.write(email_text)
+
+    with tab3:
+        st.markdown("### 📤 Send Email")
+        st.info("Enter your email credentials to queue the email. It is delivered in the background, with retries if the mail server is unavailable.")
+        
+        with st.form("email_send_form"):
+            sender_email = st.text_input("Your Email (Gmail)", placeholder="your.email@gmail.com")
+            sender_password = st.text_input("Your App Password", type="password", 
+                help="Use Gmail App Password, not your regular password. Get it from Google Account > Security > 2-Step Verification > App passwords")
+            recipient_email = st.text_input("Recipient Email", placeholder="ceo@company.com")
+            
+            send_button = st.form_submit_button("🚀 Queue Email", type="primary")
             
-            with st.form("email_send_form"):
-                sender_email = st.text_input("Your Email (Gmail)", placeholder="your.email@gmail.com")
-                sender_password = st.text_input("Your App Password", type="password", 
-                    help="Use Gmail App Password, not your regular password. Get it from Google Account > Security > 2-Step Verification > App passwords")
-                recipient_email = st.text_input("Recipient Email", placeholder="ceo@company.com")
-                
-                send_button = st.form_submit_button("🚀 Send Email Now", type="primary")
-                
-                if send_button:
-                    if not sender_email or not sender_password or not recipient_email:
-                        st.error("Please fill in all email fields!")
-                    elif not re.match(r'^[^@]+@[^@]+\.[^@]+$', recipient_email):
-                        st.error("Please enter a valid recipient email address!")
-                    else:
-                        with st.spinner("Sending email..."):
-                            try:
-                                msg = MIMEMultipart()
-                                msg['From'] = sender_email
-                                msg['To'] = recipient_email
-                                
-                                email_content = result.raw
-                                lines = email_content.split('\n')
-                                subject = "Cold Email Pitch"
-                                body = email_content
-                                
-                                for line in lines:
-                                    if line.lower().startswith('subject:'):
-                                        subject = line.replace('Subject:', '').replace('subject:', '').strip()
-                                        body = '\n'.join(lines[lines.index(line)+1:]).strip()
-                                        break
-                                
-                                msg['Subject'] = subject
-                                msg.attach(MIMEText(body, 'plain'))
-                                
-                                server = smtplib.SMTP('smtp.gmail.com', 587)
-                                server.starttls()
-                                server.login(sender_email, sender_password)
-                                server.send_message(msg)
-                                server.quit()
-                                
-                                st.success(f"✅ Email sent successfully to {recipient_email}!")
-                                st.balloons()
-                            except Exception as e:
-                                st.error(f"❌ Failed to send email: {str(e)}")
-                                st.info("💡 Tip: Make sure you're using a Gmail App Password, not your regular Gmail password.")
+            if send_button:
+                if not sender_email or not sender_password or not recipient_email:
+                    st.error("Please fill in all email fields!")
+                elif not re.match(r'^[^@]+@[^@]+\.[^@]+$', recipient_email):
+                    st.error("Please enter a valid recipient email address!")
+                else:
+                    subject, body = parse_email(email_text)
+                    outbox.register_sender(sender_email, sender_password)
+                    message_id = outbox.enqueue(build_message(sender_email, recipient_email, subject, body))
+                    st.success(f"📬 Email #{message_id} to {recipient_email} queued for delivery!")
+
+        st.markdown("#### 📬 Outbox")
+        counts = outbox.counts()
+        box_col1, box_col2, box_col3, box_col4 = st.columns(4)
+        box_col1.metric("Queued", counts["queued"] + counts["sending"])
+        box_col2.metric("Sent", counts["sent"])
+        box_col3.metric("Dead Letters", counts["dead"])
+        box_col4.metric("Sent / min", counts["sent_last_minute"])
+        refresh_col, retry_col, _ = st.columns([1, 1, 2])
+        with refresh_col:
+            if st.button("🔄 Refresh"):
+                st.rerun()
+        with retry_col:
+            if counts["dead"] and st.button("♻️ Retry Dead Letters"):
+                outbox.retry_dead()
+                st.rerun()
+        recent = outbox.recent()
+        if recent:
+            st.dataframe(recent, use_container_width=True, hide_index=True)
+            if any(row["status"] == "dead" for row in recent):
+                st.info("💡 Tip: Make sure you're using a Gmail App Password, not your regular Gmail password.")
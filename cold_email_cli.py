@@ -0,0 +1,421 @@
+"""Headless cold email generation, for cron jobs and worker boxes.
+
+Reads targets from a file or stdin and writes one JSON result per line to stdout
+or --output, as soon as each email is done. It runs the same agents, tasks and
+stage routing as app.py.
+
+Targets are JSONL objects, or CSV rows with the same columns as a campaign CSV:
+
+    {"url": "https://example.com", "recipient_name": "Ana", "recipient_email": "ana@example.com"}
+
+A JSONL target may also set "id", "email_tone", "language", "email_length" or
+"selected_template" for itself. With --output the file doubles as the
+checkpoint: targets already written there with status "ok" are skipped on the
+next run, so a crashed or interrupted run picks up where it stopped. Failed
+targets run again from the first stage that did not finish (see run_checkpoints.py).
+
+With --dedupe, a target whose company (normalized domain) came earlier in the
+input, or was pitched within --repitch-days, is dropped before any work is
+scheduled for it.
+
+Work is spread over --processes worker processes with --threads threads each.
+Each process paces its LLM calls at an equal share of the RATE_LIMITS budget, so
+together they stay within it. Only a bounded number of targets is read ahead of
+the workers, so memory does not grow with the input.
+
+    python cold_email_cli.py targets.jsonl --output results.jsonl
+    cat targets.csv | python cold_email_cli.py --format csv --processes 4 --threads 4 > results.jsonl
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+
+from campaign import URL_COLUMNS, NAME_COLUMNS, EMAIL_COLUMNS
+
+DEFAULT_MODEL = "groq/llama-3.3-70b-versatile"
+EMAIL_LENGTHS = ("Short", "Medium", "Long")
+# Per-target settings a JSONL line may override
+TARGET_OPTIONS = ("email_tone", "language", "email_length", "selected_template")
+
+_STOP = None
+
+
+def _pick(row, columns):
+    return next((str(row[c]).strip() for c in columns if row.get(c) not in (None, "")), "")
+
+
+def target_from_row(row):
+    row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    target = {
+        "url": _pick(row, URL_COLUMNS),
+        "recipient_name": _pick(row, NAME_COLUMNS),
+        "recipient_email": _pick(row, EMAIL_COLUMNS),
+    }
+    if row.get("id") not in (None, ""):
+        target["id"] = str(row["id"])
+    for option in TARGET_OPTIONS:
+        if row.get(option):
+            target[option] = row[option]
+    return target
+
+
+def iter_targets(lines, fmt="auto"):
+    """Yields targets one at a time from an iterable of lines; nothing is read ahead."""
+    lines = iter(lines)
+    if fmt == "auto":
+        first = next(lines, None)
+        if first is None:
+            return
+        fmt = "jsonl" if first.lstrip().startswith("{") else "csv"
+        lines = _chain(first, lines)
+    if fmt == "jsonl":
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"skipping line {number}: {e}", file=sys.stderr)
+                continue
+            target = target_from_row(row)
+            if target["url"]:
+                yield target
+        return
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [column.strip().lower() for column in header]
+    if not any(column in URL_COLUMNS for column in columns):
+        # No header row: URL, then optional name and recipient email, as in campaign.read_targets
+        reader = _chain(header, reader)
+        columns = ["url", "recipient_name", "recipient_email"]
+    for row in reader:
+        target = target_from_row(dict(zip(columns, row)))
+        if target["url"]:
+            yield target
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def target_id(target):
+    # The name is part of it so two contacts at one company without an email stay two targets
+    from scrape_cache import normalize_url
+    return target.get("id") or "|".join(
+        (normalize_url(target["url"]), target["recipient_email"].lower(), target["recipient_name"].strip().lower())
+    )
+
+
+def invalid_result(target, options, error):
+    """The error row of a target that never reached a worker."""
+    from email_schema import email_columns
+    options = {**options, **{option: target[option] for option in TARGET_OPTIONS if option in target}}
+    return {
+        "id": target.get("id") or "",
+        "url": target["url"],
+        "recipient_name": target["recipient_name"],
+        "recipient_email": target["recipient_email"],
+        **options,
+        **email_columns(),
+        "status": "error",
+        "error": str(error),
+        "seconds": 0.0,
+    }
+
+
+def completed_ids(path):
+    """Ids of the targets already written to an output file with status "ok"."""
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; that target simply runs again
+                continue
+            if result.get("status") == "ok" and result.get("id"):
+                done.add(result["id"])
+    return done
+
+
+class Generator:
+    """The stage LLMs, scrape tool and options for one worker process, shared by its threads."""
+
+    def __init__(self, settings):
+        from resources import shared_scrape_tool
+        from routing import DEFAULT_ROUTES, resolve_routes, routed_llms
+        from stage_cache import stage_cache
+
+        model = settings["model"]
+        if settings["fake_llm"]:
+            from fake_llm import FAKE_PROVIDER, register_fake_llm
+            # A fake model the caller registered already is kept, with its own speed settings
+            if not model.startswith(f"{FAKE_PROVIDER}/"):
+                model, _ = register_fake_llm(latency=settings["fake_latency"])
+        if settings["no_routing"]:
+            overrides = {stage: {"model": None} for stage in DEFAULT_ROUTES}
+        elif settings["fake_llm"]:
+            # The fake provider stands in for the small routed model as well
+            overrides = {stage: {"model": f"{model}-small"} for stage, route in DEFAULT_ROUTES.items() if route["model"]}
+        else:
+            overrides = None
+        routes = resolve_routes(model, overrides)
+        self.stage_llms = routed_llms(
+            "cli", routes, api_key=settings["api_key"], temperature=settings["temperature"], cache_sampled=False
+        )
+        self.scrape_tool = shared_scrape_tool(settings["token_budget"], settings["crawl_pages"])
+        self.cache = stage_cache if settings["stage_cache"] else None
+        self.options = settings["options"]
+
+    def run(self, target):
+        from email_crew import run_email_pipeline
+        from email_schema import email_columns
+        from run_checkpoints import run_checkpoints
+
+        started = time.perf_counter()
+        options = {**self.options, **{option: target[option] for option in TARGET_OPTIONS if option in target}}
+        result = {
+            "id": target["id"],
+            "url": target["url"],
+            "recipient_name": target["recipient_name"],
+            "recipient_email": target["recipient_email"],
+            **options,
+        }
+        # Checkpointed under the target's id, so a rerun resumes a failed target at the stage that failed
+        checkpoint = run_checkpoints.run(target["id"], self.cache)
+        try:
+            outputs = run_email_pipeline(
+                self.stage_llms["analyze"], target["url"],
+                recipient_name=target["recipient_name"],
+                scrape_tool=self.scrape_tool,
+                stage_llms=self.stage_llms,
+                cache=checkpoint,
+                **options
+            )
+            checkpoint.discard()
+            result.update(email_columns(outputs["finalize"]), status="ok", error="")
+            result["stages"] = {
+                stage: {key: record[key] for key in ("source", "seconds", "prompt_tokens", "completion_tokens")}
+                for stage, record in outputs["metrics"].items()
+            }
+        except Exception as e:
+            result.update(email_columns(), status="error", error=str(e))
+        result["seconds"] = round(time.perf_counter() - started, 2)
+        return result
+
+
+def work(settings, inbox, outbox, threads, processes=1):
+    """Body of a worker process (or of the main one with --processes 1): threads pull targets until _STOP."""
+    if processes > 1:
+        # Every process has its own governor; each keeps its share so the provider's limit holds overall
+        from rate_governor import rate_governor
+        rate_governor.split(processes)
+    generator = Generator(settings)
+
+    def loop():
+        while True:
+            target = inbox.get()
+            if target is _STOP:
+                return
+            outbox.put(generator.run(target))
+
+    pool = [threading.Thread(target=loop, name=f"cli-worker-{i}", daemon=True) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def run(targets, settings, processes=1, threads=4, done=()):
+    """Yields one result per target that is not in `done`, in the order they finish."""
+    workers = processes * threads
+    if processes > 1:
+        # spawn, not fork: the parent already runs threads of its own
+        context = multiprocessing.get_context("spawn")
+        inbox, outbox = context.Queue(maxsize=workers * 2), context.Queue()
+        pool = [context.Process(target=work, args=(settings, inbox, outbox, threads, processes), daemon=True)
+                for _ in range(processes)]
+    else:
+        inbox, outbox = queue.Queue(maxsize=workers * 2), queue.Queue()
+        pool = [threading.Thread(target=work, args=(settings, inbox, outbox, threads), daemon=True)]
+    for worker in pool:
+        worker.start()
+
+    counts = {"submitted": 0, "skipped": 0, "read": False, "error": None}
+
+    def feed():
+        # The bounded inbox is the backpressure: reading stops while every worker is busy
+        try:
+            for target in targets:
+                try:
+                    target["id"] = target_id(target)
+                except ValueError as e:
+                    # A URL too malformed to normalize fails on its own, like any other target
+                    outbox.put(invalid_result(target, settings["options"], e))
+                    counts["submitted"] += 1
+                    continue
+                if target["id"] in done:
+                    counts["skipped"] += 1
+                    continue
+                inbox.put(target)
+                counts["submitted"] += 1
+        except Exception as e:
+            counts["error"] = e
+        finally:
+            # Workers finish what was submitted either way, and the loop below stops waiting for more
+            for _ in range(workers):
+                inbox.put(_STOP)
+            counts["read"] = True
+
+    feeder = threading.Thread(target=feed, name="cli-feeder", daemon=True)
+    feeder.start()
+    received = 0
+    while not counts["read"] or received < counts["submitted"]:
+        try:
+            result = outbox.get(timeout=0.5)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in pool) and received < counts["submitted"]:
+                raise RuntimeError("All workers exited before finishing their targets")
+            continue
+        received += 1
+        yield result
+    for worker in pool:
+        worker.join()
+    if counts["skipped"]:
+        print(f"skipped {counts['skipped']} targets already in the output", file=sys.stderr)
+    if counts["error"] is not None:
+        raise RuntimeError(f"Stopped reading targets after {counts['submitted']}: {counts['error']}") from counts["error"]
+
+
+def add_generation_arguments(parser):
+    """The model and pipeline options shared by this CLI and job_api.py."""
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--api-key", default=None, help="Defaults to GROQ_API_KEY")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--no-routing", action="store_true", help="Run every stage on --model")
+    parser.add_argument("--tone", default="Professional")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--length", default="Medium", choices=EMAIL_LENGTHS)
+    parser.add_argument("--template", default="Professional")
+    parser.add_argument("--strategy-mode", choices=["local", "llm"], default="local")
+    parser.add_argument("--finalizer-mode", choices=["local", "llm"], default="local")
+    parser.add_argument("--token-budget", type=int, default=None, help="Page token budget (default EXTRACT_TOKEN_BUDGET)")
+    parser.add_argument("--crawl-pages", type=int, default=0,
+                        help="Also read up to this many about/pricing/services/careers pages per site")
+    parser.add_argument("--stage-cache", action="store_true", help="Reuse stage outputs from the stage cache")
+    parser.add_argument("--fake-llm", action="store_true", help="Use fake_llm's offline provider, for dry runs")
+    parser.add_argument("--fake-latency", type=float, default=0.2)
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Skip companies pitched within --repitch-days, and repeats of a domain (see domain_index.py)")
+    parser.add_argument("--repitch-days", type=float, default=None, help="Default REPITCH_AFTER_DAYS")
+
+
+def generation_settings(parser, args):
+    """The settings a Generator is built from; exits through the parser when no API key is set."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    if args.fake_llm:
+        # Keeps litellm, the tokenizer and crewai's telemetry off the network; worker processes inherit it
+        os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+        os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    from content_extractor import EXTRACT_TOKEN_BUDGET
+    from domain_index import REPITCH_AFTER_DAYS
+
+    api_key = args.api_key or os.getenv("GROQ_API_KEY")
+    if not api_key and not args.fake_llm:
+        parser.error("--api-key or GROQ_API_KEY is required")
+    return {
+        "model": args.model,
+        "api_key": api_key or "fake",
+        "temperature": args.temperature,
+        "no_routing": args.no_routing,
+        "token_budget": args.token_budget or EXTRACT_TOKEN_BUDGET,
+        "crawl_pages": args.crawl_pages,
+        "stage_cache": args.stage_cache,
+        "fake_llm": args.fake_llm,
+        "fake_latency": args.fake_latency,
+        # None leaves domain deduplication off
+        "repitch_after_days": (REPITCH_AFTER_DAYS if args.repitch_days is None else args.repitch_days) if args.dedupe else None,
+        "options": {
+            "email_tone": args.tone,
+            "language": args.language,
+            "email_length": args.length,
+            "selected_template": args.template,
+            "strategy_mode": args.strategy_mode,
+            "finalizer_mode": args.finalizer_mode,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", default="-", help="Targets file, or - for stdin (the default)")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv"], default="auto")
+    parser.add_argument("--output", help="Results file, appended to and used as the checkpoint (default stdout)")
+    parser.add_argument("--no-resume", action="store_true", help="Generate every target even if --output has it")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=4, help="Worker threads per process")
+    add_generation_arguments(parser)
+    args = parser.parse_args()
+    settings = generation_settings(parser, args)
+
+    done = set() if args.no_resume else completed_ids(args.output)
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8-sig", newline="")
+    if args.output:
+        out = open(args.output, "a", encoding="utf-8")
+        # A line cut short by a crash must not swallow the first new result
+        if out.tell() and not _ends_with_newline(args.output):
+            out.write("\n")
+    else:
+        out = sys.stdout
+
+    targets = iter_targets(source, args.format)
+    skipped = []
+    if settings["repitch_after_days"] is not None:
+        from domain_index import domain_index
+        targets = domain_index.dedupe(targets, settings["repitch_after_days"], skipped)
+
+    written = failed = 0
+    started = time.perf_counter()
+    try:
+        for result in run(targets, settings, args.processes, args.threads, done):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            written += 1
+            failed += result["status"] != "ok"
+            if settings["repitch_after_days"] is not None and result["status"] == "ok":
+                domain_index.record(result["url"])
+    except KeyboardInterrupt:
+        print("interrupted; rerun with the same --output to resume", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    if skipped:
+        print(f"skipped {len(skipped)} targets whose company was already pitched or listed", file=sys.stderr)
+    print(f"{written} results ({failed} failed) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import tiktoken
+from bs4 import BeautifulSoup, Comment
+
+EXTRACT_TOKEN_BUDGET = int(os.getenv("EXTRACT_TOKEN_BUDGET", "1200"))
+EXTRACT_TOKENIZER = os.getenv("EXTRACT_TOKENIZER", "cl100k_base")
+
+# Never readable text, so always dropped
+NON_TEXT_TAGS = ["script", "style", "noscript", "template", "svg", "iframe"]
+BOILERPLATE_TAGS = ["nav", "footer", "aside", "form", "button", "select"]
+BOILERPLATE_ROLES = {"navigation", "contentinfo", "dialog", "alertdialog", "banner", "search"}
+# Matched against whole class/id tokens: "sidebar" is boilerplate, a "with-sidebar" or "modal-open" wrapper is not.
+# A bare "menu" is left alone, since on a restaurant site that is the content.
+BOILERPLATE_HINTS = re.compile(
+    r"(?:cookies?|consent|gdpr|newsletter|nav|navbar|breadcrumbs?|sidebar|footer|skip)(?:[-_][\w-]*)?"
+    r"|site-footer|subscribe|popup|modal|social|social-links|social-icons|share|share-buttons"
+    r"|main-menu|mobile-menu|menu-toggle",
+    re.I
+)
+# An element holding more than this share of the page's text is the page, whatever it is called
+MAX_STRIPPED_SHARE = 0.5
+BLOCK_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "td", "th", "dt", "dd", "blockquote", "figcaption",
+              "pre", "address", "section", "article", "main", "header", "div"]
+HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+# Patterns matched against a block's heading plus the class/id names around it
+SECTION_HINTS = [
+    (re.compile(r"hero|jumbotron|masthead|intro|headline", re.I), 3),
+    (re.compile(r"pricing|price|plans?\b|tiers?\b", re.I), 3),
+    (re.compile(r"product|feature|service|solution|offer|platform|what-we-do|what we do", re.I), 2),
+    (re.compile(r"about|mission|who-we-are|who we are|story", re.I), 1),
+    (re.compile(r"testimonial|review|customer|client|case-stud", re.I), 1),
+    (re.compile(r"blog|news|press|career|job|legal|privacy|terms", re.I), -2),
+]
+PRICE_PATTERN = re.compile(r"[$€£]\s?\d|\d\s?(?:usd|eur|gbp)\b|per (?:month|user|year)|/\s?(?:mo|month|yr|year)\b", re.I)
+
+# A block that does not fit is only cut down if at least this much budget is left
+MIN_PARTIAL_TOKENS = 40
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding(EXTRACT_TOKENIZER)
+        except Exception:
+            # The vocabulary is downloaded on first use; offline we fall back to an estimate
+            _encoding = False
+    return _encoding or None
+
+
+def tokenizer_name():
+    return EXTRACT_TOKENIZER if _get_encoding() else "estimate (~4 chars/token)"
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text, max_tokens):
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def extract_text(html):
+    # The plain page text ScrapeWebsiteTool would hand the agent
+    parsed = BeautifulSoup(html, "html.parser")
+    text = parsed.get_text(" ")
+    text = re.sub("[ \t]+", " ", text)
+    return re.sub("\\s+\n\\s+", "\n", text)
+
+
+def _text_length(tag):
+    return sum(len(string.strip()) for string in tag.find_all(string=True))
+
+
+def _is_boilerplate(tag):
+    if tag.name in ("html", "body", "main"):
+        return False
+    if tag.name in BOILERPLATE_TAGS:
+        return True
+    if (tag.get("role") or "").lower() in BOILERPLATE_ROLES:
+        return True
+    if tag.get("aria-modal") == "true":
+        return True
+    names = [*(tag.get("class") or []), *(tag.get("id") or "").split()]
+    return any(BOILERPLATE_HINTS.fullmatch(name) for name in names)
+
+
+def _holds_content(tag, page_length):
+    # A layout wrapper (a page-wide <form>, an "app-shell" div) must not take the page down with it
+    return tag.find("main") is not None or _text_length(tag) > page_length * MAX_STRIPPED_SHARE
+
+
+def _strip_boilerplate(soup):
+    for comment in soup.find_all(string=lambda s: isinstance(s, Comment)):
+        comment.extract()
+    for tag in soup.find_all(NON_TEXT_TAGS):
+        tag.decompose()
+    page_length = _text_length(soup.body or soup)
+    for tag in [tag for tag in soup.find_all(True) if _is_boilerplate(tag)]:
+        if not tag.decomposed and not _holds_content(tag, page_length):
+            tag.decompose()
+
+
+def _hints(element):
+    names = []
+    for node in [element, *element.parents]:
+        if node.name in (None, "[document]", "html", "body"):
+            break
+        names.extend(node.get("class") or [])
+        if node.get("id"):
+            names.append(node["id"])
+    return " ".join(names)
+
+
+def _blocks(soup):
+    # Group text into lines by their nearest block element, then into blocks that start at each heading
+    lines = []
+    current, parts = None, []
+    for string in (soup.body or soup).find_all(string=True):
+        text = " ".join(string.split())
+        if not text:
+            continue
+        parent = string.find_parent(BLOCK_TAGS)
+        if parent is not current and parts:
+            lines.append((current, " ".join(parts)))
+            parts = []
+        current = parent
+        parts.append(text)
+    if parts:
+        lines.append((current, " ".join(parts)))
+
+    blocks, seen = [], set()
+    for element, text in lines:
+        # Repeated lines (logo text, repeated CTAs) are boilerplate too
+        if text.lower() in seen:
+            continue
+        seen.add(text.lower())
+        level = HEADINGS.get(element.name) if element is not None else None
+        if level or not blocks:
+            blocks.append({"heading": text if level else "", "level": level, "lines": [],
+                           "hints": _hints(element) if element is not None else ""})
+            if level:
+                continue
+        blocks[-1]["lines"].append(text)
+    return blocks
+
+
+def _score(block, index):
+    body = " ".join(block["lines"])
+    score = 0
+    if index == 0 or block["level"] == 1:
+        score += 3
+    labels = f"{block['heading']} {block['hints']}"
+    for pattern, weight in SECTION_HINTS:
+        if pattern.search(labels):
+            score += weight
+    if PRICE_PATTERN.search(body):
+        score += 2
+    words = len(body.split())
+    if words < 8:
+        score -= 1
+    elif words > 40:
+        score += 1
+    return score
+
+
+def _render(block):
+    heading = f"## {block['heading']}\n" if block["heading"] else ""
+    return heading + "\n".join(block["lines"])
+
+
+class ContentExtractor:
+    def __init__(self, token_budget=EXTRACT_TOKEN_BUDGET, max_reports=200):
+        self.token_budget = token_budget
+        self.max_reports = max_reports
+        self.stats = {"pages": 0, "tokens_before": 0, "tokens_after": 0}
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def extract(self, html, url=None, token_budget=None):
+        """Strips boilerplate, keeps the most useful blocks within the token budget
+        and returns the text together with how many tokens that saved."""
+        budget = token_budget or self.token_budget
+        tokens_before = count_tokens(extract_text(html))
+
+        soup = BeautifulSoup(html, "html.parser")
+        _strip_boilerplate(soup)
+        blocks = _blocks(soup)
+        rendered = [_render(block) for block in blocks]
+        ranked = sorted(range(len(blocks)), key=lambda i: (-_score(blocks[i], i), i))
+
+        kept, used = {}, 0
+        for i in ranked:
+            tokens = count_tokens(rendered[i])
+            if used + tokens <= budget:
+                kept[i] = rendered[i]
+                used += tokens
+            elif budget - used >= MIN_PARTIAL_TOKENS:
+                kept[i] = truncate_tokens(rendered[i], budget - used)
+                break
+            # Otherwise try the smaller, lower ranked blocks that may still fit
+
+        # Kept blocks go back in page order so the text still reads naturally
+        text = "\n\n".join(kept[i] for i in sorted(kept))
+        fallback = not text.strip()
+        if fallback:
+            # Nothing survived the stripping; the plain page text, cut to the budget, beats an empty page
+            text = truncate_tokens(extract_text(html).strip(), budget)
+        report = {
+            "url": url,
+            "tokens_before": tokens_before,
+            "tokens_after": count_tokens(text),
+            "blocks_total": len(blocks),
+            "blocks_kept": len(kept),
+            "budget": budget,
+            "tokenizer": tokenizer_name(),
+            "fallback": fallback,
+        }
+        report["tokens_saved"] = max(0, report["tokens_before"] - report["tokens_after"])
+        self.record(report)
+        return text, report
+
+    def record(self, report):
+        # Also called with reports of extractions cached by scrape_cache, so the totals count every page
+        with self._lock:
+            self.stats["pages"] += 1
+            self.stats["tokens_before"] += report["tokens_before"]
+            self.stats["tokens_after"] += report["tokens_after"]
+            if report["url"]:
+                self._reports.pop(report["url"], None)
+                self._reports[report["url"]] = report
+                while len(self._reports) > self.max_reports:
+                    self._reports.popitem(last=False)
+
+    def report(self, url):
+        with self._lock:
+            return self._reports.get(url)
+
+    def tokens_saved(self):
+        return max(0, self.stats["tokens_before"] - self.stats["tokens_after"])
+
+
+content_extractor = ContentExtractor()
@@ -0,0 +1,165 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+DOMAIN_INDEX_PATH = os.getenv("DOMAIN_INDEX_PATH", ".cache/domain_index.sqlite3")
+# A company pitched less than this many days ago is skipped; 0 pitches it again every time
+REPITCH_AFTER_DAYS = float(os.getenv("REPITCH_AFTER_DAYS", "90"))
+DOMAIN_BLOOM_CAPACITY = int(os.getenv("DOMAIN_BLOOM_CAPACITY", "100000"))
+DOMAIN_BLOOM_ERROR_RATE = float(os.getenv("DOMAIN_BLOOM_ERROR_RATE", "0.01"))
+
+DAY = 24 * 60 * 60
+
+
+def normalize_domain(url):
+    """The company a URL belongs to: "https://www.Acme.com/pricing?utm_source=x" -> "acme.com".
+
+    A URL too malformed to parse (e.g. "http://[bad") has no domain, "".
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    try:
+        host = (urlsplit(url).hostname or "").lower().rstrip(".")
+    except ValueError:
+        return ""
+    return host[4:] if host.startswith("www.") else host
+
+
+class BloomFilter:
+    """A fixed-size set that can answer "definitely not in it" without touching SQLite."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        # Double hashing: k positions from two 64-bit halves
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class DomainIndex:
+    """Every company domain that has been pitched, so lead lists never pay twice for the same company.
+
+    The table is the record; a Bloom filter over it answers the common case, a domain
+    never seen before, in memory. Only a possible match costs a primary key lookup.
+    """
+
+    def __init__(self, path=DOMAIN_INDEX_PATH, capacity=DOMAIN_BLOOM_CAPACITY, error_rate=DOMAIN_BLOOM_ERROR_RATE):
+        self.path = path
+        self.error_rate = error_rate
+        self.stats = {"checked": 0, "bloom_negative": 0, "lookups": 0, "skipped": 0}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS domains (
+                domain TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                pitches INTEGER NOT NULL DEFAULT 1,
+                first_pitched_at REAL NOT NULL,
+                last_pitched_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+        self._load(capacity)
+
+    def _load(self, capacity):
+        # Sized for at least twice what is stored, and rebuilt at that size once it fills up
+        count = self._db.execute("SELECT COUNT(*) FROM domains").fetchone()[0]
+        self._bloom = BloomFilter(max(capacity, count * 2), self.error_rate)
+        for (domain,) in self._db.execute("SELECT domain FROM domains"):
+            self._bloom.add(domain)
+
+    def last_pitched(self, url):
+        """When the URL's domain was last pitched, or None."""
+        domain = normalize_domain(url)
+        with self._lock:
+            self.stats["checked"] += 1
+            if not domain or domain not in self._bloom:
+                self.stats["bloom_negative"] += 1
+                return None
+            self.stats["lookups"] += 1
+            row = self._db.execute("SELECT last_pitched_at FROM domains WHERE domain = ?", (domain,)).fetchone()
+        return row[0] if row else None
+
+    def recently_pitched(self, url, repitch_after_days=REPITCH_AFTER_DAYS):
+        last = self.last_pitched(url)
+        return last is not None and time.time() - last < repitch_after_days * DAY
+
+    def record(self, url):
+        domain = normalize_domain(url)
+        if not domain:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO domains (domain, url, first_pitched_at, last_pitched_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (domain) DO UPDATE SET url = excluded.url, pitches = pitches + 1, "
+                "last_pitched_at = excluded.last_pitched_at",
+                (domain, url, now, now)
+            )
+            self._db.commit()
+            if domain not in self._bloom:
+                self._bloom.add(domain)
+                if self._bloom.count > self._bloom.capacity:
+                    self._load(self._bloom.capacity * 2)
+
+    def dedupe(self, targets, repitch_after_days=REPITCH_AFTER_DAYS, skipped=None):
+        """Yields the targets worth working on, lazily and in order.
+
+        Drops a target whose domain came earlier in the same list, or was pitched less
+        than repitch_after_days ago. Each dropped target is appended to `skipped`, when
+        given, with a "skip_reason".
+        """
+        claimed = set()
+        for target in targets:
+            domain = normalize_domain(target["url"])
+            if not domain:
+                # Nothing to match it against; the run reports the bad URL as that target's error
+                yield target
+                continue
+            if domain in claimed:
+                reason = "duplicate in list"
+            elif self.recently_pitched(target["url"], repitch_after_days):
+                reason = "pitched recently"
+            else:
+                claimed.add(domain)
+                yield target
+                continue
+            with self._lock:
+                self.stats["skipped"] += 1
+            if skipped is not None:
+                skipped.append({**target, "domain": domain, "skip_reason": reason})
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM domains").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM domains")
+            self._db.commit()
+            self._bloom = BloomFilter(self._bloom.capacity, self.error_rate)
+
+
+domain_index = DomainIndex()
@@ -0,0 +1,395 @@
+import os
+import threading
+import time
+
+from service_matcher import parse_services, match_service, format_strategy, DEFAULT_MIN_CONFIDENCE
+from resources import agent_pool
+from metrics import stage_metrics
+from email_templates import compose_email
+from email_schema import SUBJECT_MAX_CHARS, ColdEmail, EmailDraft, json_instructions, parse_reply
+from stage_cache import llm_inputs
+
+agency_services = """
+1. SEO Optimization Service: Best for companies with good products but low traffic. We increase organic reach.
+2. Custom Web Development: Best for companies with outdated, ugly, or slow websites. We build modern React/Python sites.
+3. AI Automation: Best for companies with manual, repetitive tasks. We build agents to save time.
+"""
+
+service_catalog = parse_services(agency_services)
+
+length_words = {"Short": "100", "Medium": "200", "Long": "350"}
+
+STRATEGY_MODES = {"local": "⚡ Local Matcher (LLM fallback)", "llm": "🧠 LLM Strategist"}
+FINALIZER_MODES = {"local": "⚡ Local Templates", "llm": "🧠 LLM Finalizer"}
+
+STAGES = ["analyze", "strategize", "write", "finalize"]
+
+# How many times a stage whose JSON reply does not validate is asked again before it fails
+STRUCTURED_OUTPUT_RETRIES = int(os.getenv("STRUCTURED_OUTPUT_RETRIES", "2"))
+
+# Streamed chunks arrive on the event bus thread, so they are routed by task id
+_token_sinks = {}
+_forwarder_lock = threading.Lock()
+_forwarder_registered = False
+
+
+def _forward_token(source, event):
+    sink = _token_sinks.get(event.task_id)
+    if sink:
+        sink(event.chunk)
+
+
+def register_token_forwarder():
+    # crewai is imported lazily, so the handler is attached the first time a stage runs
+    global _forwarder_registered
+    with _forwarder_lock:
+        if not _forwarder_registered:
+            from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+            crewai_event_bus.on(LLMStreamChunkEvent)(_forward_token)
+            _forwarder_registered = True
+
+
+def visible_answer(streamed):
+    # Hide the agent's "Thought: ..." preamble while it is being streamed
+    if "Final Answer:" in streamed:
+        return streamed.split("Final Answer:", 1)[1].lstrip()
+    stripped = streamed.lstrip()
+    if stripped.startswith("Thought") or "Thought:".startswith(stripped):
+        return ""
+    return streamed
+
+
+def build_researcher(llm, scrape_tool=None, with_tools=True):
+    from crewai import Agent
+    from scrape_cache import CachedScrapeWebsiteTool
+    return Agent(
+        role='Business Intelligence Analyst',
+        goal='Analyze the target company website and identify their core business and potential weaknesses.',
+        backstory="You are an expert at analyzing businesses just by looking at their landing page. You look for what they do and where they might be struggling.",
+        tools=[scrape_tool or CachedScrapeWebsiteTool()] if with_tools else [],
+        llm=llm,
+        verbose=False,
+        allow_delegation=True,
+        memory=False
+    )
+
+
+def build_strategist(llm):
+    from crewai import Agent
+    return Agent(
+        role='Agency Strategist',
+        goal='Match the target company needs with ONE of our agency services.',
+        backstory=f"""You work for a top-tier digital agency.
+Your goal is to read the analysis of a prospect and decide which of OUR services to pitch.
+
+OUR SERVICES KNOWLEDGE BASE:
+{agency_services}
+
+You must pick the SINGLE best service for this specific client and explain why.""",
+        llm=llm,
+        verbose=False,
+        memory=False,
+    )
+
+
+def build_writer(llm, email_tone, language):
+    from crewai import Agent
+    return Agent(
+        role='Senior Sales Copywriter',
+        goal=f'Write a {email_tone.lower()} cold email that sounds human and professional in {language}.',
+        backstory=f"""You write emails that get replies. You never sound robotic.
+        You mention specific details found by the Researcher to prove we actually looked at their site.
+        Use a {email_tone} tone and write in {language}.""",
+        llm=llm,
+        verbose=False
+    )
+
+
+def build_finalizer(llm):
+    from crewai import Agent
+    return Agent(
+        role='Email Campaign Manager',
+        goal='Finalize and prepare the email for delivery with proper formatting and send-off.',
+        backstory="""You are an expert email campaign manager. Your job is to take drafted emails and:
+        1. Add a professional subject line
+        2. Format the email properly with greeting and signature
+        3. Add a compelling call-to-action
+        4. Prepare the final version ready to be sent
+        You ensure every email is polished and ready for delivery.""",
+        llm=llm,
+        verbose=False
+    )
+
+
+def structured_output(model):
+    # The reply is validated here, once; a malformed one goes back to the same agent with the error
+    def guardrail(output):
+        try:
+            output.pydantic = parse_reply(model, output.raw)
+        except ValueError as e:
+            return False, f"{e}\n{json_instructions(model)}"
+        return True, output
+    return guardrail
+
+
+def run_stage(agent, description, expected_output, on_token=None, stage=None, output_model=None):
+    # Each stage is its own one-task crew so stages can be skipped or swapped.
+    # agent is (builder, *args): agents come pooled and only the task is built per request.
+    # With output_model the stage returns that pydantic model instead of text.
+    from crewai import Task, Crew, Process
+    register_token_forwarder()
+    builder, *args = agent
+    structured = {}
+    if output_model:
+        structured = {"guardrail": structured_output(output_model), "guardrail_max_retries": STRUCTURED_OUTPUT_RETRIES}
+    with agent_pool.checkout(builder, *args) as stage_agent:
+        task = Task(description=description, expected_output=expected_output, agent=stage_agent, **structured)
+        run = None
+        if stage:
+            run = stage_metrics.start(stage, str(task.id), getattr(stage_agent.llm, "model", None))
+            task.callback = run.on_task_done
+            # Crew only fills in step_callback when it is unset, and a pooled agent's executor
+            # keeps the one it was built with; the pool clears both on checkin
+            stage_agent.step_callback = run.on_step
+            if stage_agent.agent_executor is not None:
+                stage_agent.agent_executor.step_callback = run.on_step
+        if on_token:
+            _token_sinks[str(task.id)] = on_token
+        try:
+            Crew(agents=[stage_agent], tasks=[task], process=Process.sequential, verbose=False, memory=False).kickoff()
+        except Exception as e:
+            if run:
+                run.retries = stage_agent._times_executed + task.retry_count
+                stage_metrics.finish(run, error=e)
+            raise
+        finally:
+            _token_sinks.pop(str(task.id), None)
+        if run:
+            run.retries = stage_agent._times_executed + task.retry_count
+            stage_metrics.finish(run)
+    return task.output.pydantic if output_model else task.output.raw
+
+
+def warm_up(llm, scrape_tool=None, email_tone="Professional", language="English", stage_llms=None):
+    # Pre-builds every stage's agent into the pool and pays crewai's first-use costs
+    # (event handler, Task/Crew validation) before anyone clicks Generate
+    from crewai import Task, Crew, Process
+    register_token_forwarder()
+    stage_llms = stage_llms or {}
+    specs = [(build_researcher, stage_llms.get("analyze", llm), scrape_tool),
+             (build_strategist, stage_llms.get("strategize", llm)),
+             (build_writer, stage_llms.get("write", llm), email_tone, language),
+             (build_finalizer, stage_llms.get("finalize", llm))]
+    for builder, *args in specs:
+        with agent_pool.checkout(builder, *args) as agent:
+            task = Task(description="warm up", expected_output="nothing", agent=agent)
+            Crew(agents=[agent], tasks=[task], process=Process.sequential, verbose=False, memory=False)
+
+
+def analyze(llm, target_url, scrape_tool=None, page_text=None):
+    if page_text is None:
+        return run_stage(
+            (build_researcher, llm, scrape_tool),
+            f"Scrape the website {target_url}. Summarize what the company does and identify 1 key area where they could improve (e.g., design, traffic, automation).",
+            "A brief summary of the company and their potential pain points.",
+            stage="analyze"
+        )
+    # The page was fetched ahead of time, so the researcher does not need the scrape tool
+    return run_stage(
+        (build_researcher, llm, None, False),
+        f"""Read the content of the website {target_url} below. Summarize what the company does and identify 1 key area where they could improve (e.g., design, traffic, automation).
+
+Website content:
+{page_text}""",
+        "A brief summary of the company and their potential pain points.",
+        stage="analyze"
+    )
+
+
+def choose_strategy(llm, analysis, strategy_mode="llm", min_confidence=DEFAULT_MIN_CONFIDENCE):
+    started = time.perf_counter()
+    match = match_service(analysis, service_catalog) if strategy_mode == "local" else None
+    if match and match["confidence"] >= min_confidence:
+        stage_metrics.record("strategize", time.perf_counter() - started)
+        return format_strategy(match), match, "local"
+    return strategize(llm, analysis), match, "llm"
+
+
+def strategize(llm, analysis):
+    return run_stage(
+        (build_strategist, llm),
+        f"""Based on the analysis, pick ONE service from our Agency Knowledge Base that solves their problem. Explain the match.
+
+Company analysis:
+{analysis}""",
+        "The selected service and the reasoning for the match.",
+        stage="strategize"
+    )
+
+
+def write(llm, analysis, strategy, recipient_name="", email_tone="Professional", language="English",
+          email_length="Medium", selected_template="Professional", include_subject=False, on_token=None):
+    # With include_subject the writer also titles the email and returns an EmailDraft,
+    # so a local finalizer can take it from there
+    recipient = recipient_name if recipient_name.strip() else "the CEO"
+    if include_subject:
+        layout = f"""
+
+Leave out the greeting, call-to-action and signature; they are added afterwards.
+{json_instructions(EmailDraft)}"""
+        expected_output = f"A JSON object with the subject line, the {email_tone.lower()} cold email body in {language} and the pitched service."
+    else:
+        layout = ""
+        expected_output = f"A {email_tone.lower()} cold email body in {language}."
+    return run_stage(
+        (build_writer, llm, email_tone, language),
+        f"""Draft a {email_tone.lower()} cold email to {recipient} of the target company in {language}. Use the {selected_template} template style. Pitch the selected service. Keep it around {length_words[email_length]} words.{layout}
+
+Company analysis:
+{analysis}
+
+Selected service:
+{strategy}""",
+        expected_output,
+        on_token=on_token,
+        stage="write",
+        output_model=EmailDraft if include_subject else None
+    )
+
+
+def finalize(llm, draft, email_tone="Professional", language="English", on_token=None):
+    return run_stage(
+        (build_finalizer, llm),
+        f"""Take the drafted email and finalize it for sending in {language}:
+        1. Create a compelling subject line (max {SUBJECT_MAX_CHARS} characters)
+        2. Add a professional greeting
+        3. Include the email body ({email_tone} tone)
+        4. Add a clear call-to-action
+        5. Add a professional signature with contact info placeholder
+        6. Name the agency service the email pitches
+{json_instructions(ColdEmail)}
+
+Drafted email:
+{draft}""",
+        "A JSON object with the subject line, greeting, body, call-to-action, signature and pitched service.",
+        on_token=on_token,
+        stage="finalize",
+        output_model=ColdEmail
+    )
+
+
+def finalize_locally(draft, recipient_name="", email_tone="Professional", language="English"):
+    # Greeting, call-to-action and signature come from templates, so no LLM round trip
+    started = time.perf_counter()
+    email = compose_email(draft, recipient_name, language, email_tone)
+    stage_metrics.record("finalize", time.perf_counter() - started)
+    return email
+
+
+def _memoize(cache, stage, inputs, compute):
+    return cache.memoize(stage, inputs, compute) if cache is not None else compute()
+
+
+def research(llm, target_url, scrape_tool=None, strategy_mode="llm", min_confidence=DEFAULT_MIN_CONFIDENCE,
+             stage_llms=None, on_stage=None, page_text=None, cache=None):
+    # The analyze and strategize stages only depend on the company, not on how the email is
+    # written, so one pass can feed any number of drafts.
+    # With a stage_cache.StageCache as cache, a stage whose inputs are unchanged is not run again;
+    # a run_checkpoints.Checkpoint does the same within one run, so a retry resumes where it failed.
+    from scrape_cache import normalize_url
+    stage_llms = stage_llms or {}
+    analyze_llm = stage_llms.get("analyze", llm)
+    strategize_llm = stage_llms.get("strategize", llm)
+    outputs = {}
+
+    def done(stage, output):
+        outputs[stage] = output
+        if on_stage:
+            on_stage(stage, output)
+
+    done("analyze", _memoize(
+        cache, "analyze",
+        {"url": normalize_url(target_url), "llm": llm_inputs(analyze_llm),
+         "token_budget": getattr(scrape_tool, "token_budget", None),
+         "crawl_pages": getattr(scrape_tool, "crawl_pages", 0), "page_text": page_text},
+        lambda: analyze(analyze_llm, target_url, scrape_tool, page_text)
+    ))
+    strategy, outputs["match"], outputs["strategy_source"] = _memoize(
+        cache, "strategize",
+        {"analysis": outputs["analyze"], "llm": llm_inputs(strategize_llm), "strategy_mode": strategy_mode,
+         "min_confidence": min_confidence},
+        lambda: choose_strategy(strategize_llm, outputs["analyze"], strategy_mode, min_confidence)
+    )
+    done("strategize", strategy)
+    return outputs
+
+
+def compose(llm, upstream, recipient_name="", email_tone="Professional", language="English", email_length="Medium",
+            selected_template="Professional", finalizer_mode="llm", stage_llms=None, on_stage=None, on_token=None,
+            cache=None):
+    # The write and finalize stages on top of research()'s outputs; on_token gets the chunks of both, one after the other
+    stage_llms = stage_llms or {}
+    write_llm = stage_llms.get("write", llm)
+    finalize_llm = stage_llms.get("finalize", llm)
+    include_subject = finalizer_mode == "local"
+    outputs = {}
+
+    def done(stage, output):
+        outputs[stage] = output
+        if on_stage:
+            on_stage(stage, output)
+
+    done("write", _memoize(
+        cache, "write",
+        {"analysis": upstream["analyze"], "strategy": upstream["strategize"], "llm": llm_inputs(write_llm),
+         "recipient_name": recipient_name, "email_tone": email_tone, "language": language,
+         "email_length": email_length, "selected_template": selected_template, "include_subject": include_subject},
+        lambda: write(
+            write_llm, upstream["analyze"], upstream["strategize"],
+            recipient_name=recipient_name,
+            email_tone=email_tone,
+            language=language,
+            email_length=email_length,
+            selected_template=selected_template,
+            include_subject=include_subject,
+            on_token=on_token
+        )
+    ))
+    if finalizer_mode == "local":
+        # Templates take well under a millisecond, a cache lookup would only slow them down
+        done("finalize", finalize_locally(outputs["write"], recipient_name, email_tone, language))
+    else:
+        done("finalize", _memoize(
+            cache, "finalize",
+            {"draft": outputs["write"], "llm": llm_inputs(finalize_llm), "email_tone": email_tone, "language": language},
+            lambda: finalize(
+                finalize_llm, outputs["write"],
+                email_tone=email_tone,
+                language=language,
+                on_token=on_token
+            )
+        ))
+    return outputs
+
+
+def run_email_pipeline(llm, target_url, recipient_name="", email_tone="Professional", language="English",
+                       email_length="Medium", selected_template="Professional", scrape_tool=None,
+                       strategy_mode="llm", min_confidence=DEFAULT_MIN_CONFIDENCE, stage_llms=None,
+                       on_stage=None, on_token=None, page_text=None, on_metrics=None, finalizer_mode="llm",
+                       cache=None):
+    # stage_llms overrides the LLM for individual stages, e.g. a streaming one for "finalize".
+    # on_metrics gets each stage's timing and token record as soon as the stage ends.
+    outputs = {}
+    with stage_metrics.collect(on_metrics) as outputs["metrics"]:
+        outputs.update(research(
+            llm, target_url, scrape_tool, strategy_mode, min_confidence, stage_llms, on_stage, page_text, cache
+        ))
+        outputs.update(compose(
+            llm, outputs, recipient_name, email_tone, language, email_length, selected_template,
+            finalizer_mode, stage_llms, on_stage, on_token, cache
+        ))
+    return outputs
+
+
+def generate_cold_email(llm, target_url, **options):
+    return run_email_pipeline(llm, target_url, **options)["finalize"]
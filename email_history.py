@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+
+from email_schema import ColdEmail
+
+EMAIL_HISTORY_PATH = os.getenv("EMAIL_HISTORY_PATH", ".cache/email_history.sqlite3")
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+
+FIELDS = ("url", "recipient_name", "recipient_email", "tone", "language", "length", "template", "source", "email",
+          "email_json")
+
+
+def _match_query(text):
+    # Quote every word so user input never trips FTS5 syntax; the trailing * allows prefix matches
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+class EmailHistory:
+    def __init__(self, path=EMAIL_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS emails (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                url TEXT NOT NULL,
+                recipient_name TEXT NOT NULL DEFAULT '',
+                recipient_email TEXT NOT NULL DEFAULT '',
+                tone TEXT NOT NULL,
+                language TEXT NOT NULL,
+                length TEXT NOT NULL DEFAULT '',
+                template TEXT NOT NULL DEFAULT '',
+                source TEXT NOT NULL DEFAULT 'single',
+                email TEXT NOT NULL,
+                email_json TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS emails_created_at ON emails (created_at);
+            CREATE INDEX IF NOT EXISTS emails_url ON emails (url);
+            CREATE INDEX IF NOT EXISTS emails_tone ON emails (tone, created_at);
+            CREATE INDEX IF NOT EXISTS emails_language ON emails (language, created_at);
+
+            -- Full-text index over the email bodies, kept in sync by triggers
+            CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+                email, url, content='emails', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS emails_ai AFTER INSERT ON emails BEGIN
+                INSERT INTO emails_fts (rowid, email, url) VALUES (new.id, new.email, new.url);
+            END;
+            CREATE TRIGGER IF NOT EXISTS emails_ad AFTER DELETE ON emails BEGIN
+                INSERT INTO emails_fts (emails_fts, rowid, email, url) VALUES ('delete', old.id, old.email, old.url);
+            END;
+        """)
+        # Databases from before emails were structured get the column added
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(emails)")]
+        if "email_json" not in columns:
+            self._db.execute("ALTER TABLE emails ADD COLUMN email_json TEXT NOT NULL DEFAULT ''")
+        self._db.commit()
+
+    def add(self, url, tone, language, email, **fields):
+        # A ColdEmail is stored as-is next to its text, which the full-text index covers
+        row = {"url": url, "tone": tone, "language": language, "email": email, **fields}
+        if isinstance(email, ColdEmail):
+            row.update(email=email.text(), email_json=email.model_dump_json())
+        columns = [field for field in FIELDS if row.get(field) is not None]
+        with self._lock:
+            cursor = self._db.execute(
+                f"INSERT INTO emails (created_at, {', '.join(columns)}) VALUES (?, {', '.join('?' * len(columns))})",
+                (time.time(), *(row[field] for field in columns))
+            )
+            self._db.commit()
+        return cursor.lastrowid
+
+    def _where(self, query=None, tone=None, language=None):
+        clauses, params = [], []
+        if query and query.strip():
+            clauses.append("id IN (SELECT rowid FROM emails_fts WHERE emails_fts MATCH ?)")
+            params.append(_match_query(query))
+        if tone:
+            clauses.append("tone = ?")
+            params.append(tone)
+        if language:
+            clauses.append("language = ?")
+            params.append(language)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, query=None, tone=None, language=None):
+        where, params = self._where(query, tone, language)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM emails{where}", params).fetchone()[0]
+
+    def page(self, page=1, per_page=HISTORY_PAGE_SIZE, query=None, tone=None, language=None):
+        # Only one page of rows is ever loaded, newest first
+        where, params = self._where(query, tone, language)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, created_at, {', '.join(FIELDS)} FROM emails{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                (*params, per_page, (max(1, page) - 1) * per_page)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _to_dict(self, row):
+        item = dict(zip(("id", "created_at", *FIELDS), row))
+        item["timestamp"] = time.strftime("%Y-%m-%d %H:%M", time.localtime(item["created_at"]))
+        return item
+
+    def get(self, email_id):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT id, created_at, {', '.join(FIELDS)} FROM emails WHERE id = ?", (email_id,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def distinct(self, column):
+        if column not in ("tone", "language"):
+            raise ValueError(f"Cannot list values of {column}")
+        with self._lock:
+            return [row[0] for row in self._db.execute(f"SELECT DISTINCT {column} FROM emails ORDER BY {column}")]
+
+    def delete(self, email_id):
+        with self._lock:
+            self._db.execute("DELETE FROM emails WHERE id = ?", (email_id,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM emails")
+            self._db.commit()
+
+
+email_history = EmailHistory()
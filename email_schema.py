@@ -0,0 +1,102 @@
+import json
+import re
+
+from pydantic import BaseModel, ConfigDict, Field
+
+SUBJECT_MAX_CHARS = 80
+
+# A reply wrapped in ```json fences, or with a sentence around the object, is still usable
+JSON_FENCE = re.compile(r"^```[a-z]*\s*|\s*```$", re.I)
+JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "", "b": "", "f": ""}
+
+
+class EmailDraft(BaseModel):
+    """What the writer hands a local finalizer, which adds the greeting, call-to-action and signature."""
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    subject: str = Field(min_length=1, max_length=SUBJECT_MAX_CHARS, description=f"Subject line, at most {SUBJECT_MAX_CHARS} characters")
+    body: str = Field(min_length=1, description="The email body only: no greeting, call-to-action or signature")
+    service: str = Field(min_length=1, description="Name of the agency service the email pitches")
+
+    def text(self):
+        return f"Subject: {self.subject}\n\n{self.body}"
+
+
+class ColdEmail(BaseModel):
+    """A finished email. It is validated once when a stage produces it and then stored and sent as-is."""
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    subject: str = Field(min_length=1, max_length=SUBJECT_MAX_CHARS, description=f"Subject line, at most {SUBJECT_MAX_CHARS} characters")
+    greeting: str = Field(min_length=1, description="Greeting line, e.g. \"Hi Anna,\"")
+    body: str = Field(min_length=1, description="The email body, without greeting, call-to-action or signature")
+    cta: str = Field(min_length=1, description="One clear call-to-action sentence")
+    signature: str = Field(min_length=1, description="Sign-off and signature with contact info placeholders")
+    service: str = Field(min_length=1, description="Name of the agency service the email pitches")
+
+    def message(self):
+        # What goes in the body of the sent email
+        return "\n\n".join([self.greeting, self.body, self.cta, self.signature])
+
+    def text(self):
+        return f"Subject: {self.subject}\n\n{self.message()}"
+
+
+EMAIL_PARTS = list(ColdEmail.model_fields)
+
+
+def json_instructions(model):
+    # Spelled out in the task instead of crewai's output_pydantic, which converts a bad reply with another LLM call
+    keys = "\n".join(f'- "{name}": {field.description}' for name, field in model.model_fields.items())
+    return f"Reply with only a JSON object with these keys, all strings:\n{keys}"
+
+
+def parse_reply(model, text):
+    """Validates an agent's JSON reply; raises ValueError saying what is wrong."""
+    text = JSON_FENCE.sub("", text.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("The reply does not contain a JSON object")
+    try:
+        # strict=False lets raw newlines inside the strings through, as models often write them
+        data = json.loads(text[start:end + 1], strict=False)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"The reply is not valid JSON: {e}") from e
+    return model.model_validate(data)
+
+
+def streamed_body(text):
+    """The "body" of a JSON reply that is still streaming, as far as it has arrived.
+
+    A reply that is not JSON is already the email text and comes back as-is.
+    """
+    reply = JSON_FENCE.sub("", text.lstrip())
+    if not reply.startswith("{"):
+        return text
+    match = re.search(r'"body"\s*:\s*"', reply)
+    if not match:
+        return ""
+    body, i = [], match.end()
+    while i < len(reply) and reply[i] != '"':
+        if reply[i] != "\\":
+            body.append(reply[i])
+            i += 1
+            continue
+        escape = reply[i + 1:i + 2]
+        if not escape or (escape == "u" and len(reply) < i + 6):
+            # The rest of the escape has not arrived yet
+            break
+        if escape == "u":
+            code = reply[i + 2:i + 6]
+            body.append(chr(int(code, 16)) if all(c in "0123456789abcdefABCDEF" for c in code) else code)
+            i += 6
+            continue
+        body.append(JSON_ESCAPES.get(escape, escape))
+        i += 2
+    return "".join(body)
+
+
+def email_columns(email=None):
+    # The parts as separate columns for result rows and CSV exports, plus the rendered text
+    if email is None:
+        return {**dict.fromkeys(EMAIL_PARTS, ""), "email": ""}
+    return {**email.model_dump(), "email": email.text()}
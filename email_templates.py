@@ -0,0 +1,187 @@
+import json
+import os
+import re
+
+from email_schema import ColdEmail
+
+# JSON file with the same "greeting" / "cta" / "signature" layout as below; anything
+# it defines replaces the built-in text for that language and tone
+EMAIL_TEMPLATES_PATH = os.getenv("EMAIL_TEMPLATES_PATH", "")
+
+DEFAULT_LANGUAGE = "English"
+DEFAULT_TONE = "Professional"
+
+# (with a recipient name, without one)
+GREETINGS = {
+    "English": {
+        "Professional": ("Dear {name},", "Hello,"),
+        "Friendly": ("Hi {name},", "Hi there,"),
+        "Aggressive": ("{name},", "Hello,"),
+        "Short & Sweet": ("Hi {name},", "Hi,"),
+    },
+    "Spanish": {
+        "Professional": ("Estimado/a {name}:", "Buenos días:"),
+        "Friendly": ("¡Hola, {name}!", "¡Hola!"),
+        "Aggressive": ("{name}:", "Hola:"),
+        "Short & Sweet": ("Hola, {name}:", "Hola:"),
+    },
+    "French": {
+        "Professional": ("Bonjour {name},", "Madame, Monsieur,"),
+        "Friendly": ("Bonjour {name} !", "Bonjour !"),
+        "Aggressive": ("{name},", "Bonjour,"),
+        "Short & Sweet": ("Bonjour {name},", "Bonjour,"),
+    },
+    "German": {
+        "Professional": ("Guten Tag {name},", "Sehr geehrte Damen und Herren,"),
+        "Friendly": ("Hallo {name},", "Hallo,"),
+        "Aggressive": ("{name},", "Guten Tag,"),
+        "Short & Sweet": ("Hallo {name},", "Hallo,"),
+    },
+    "Portuguese": {
+        "Professional": ("Prezado(a) {name},", "Olá,"),
+        "Friendly": ("Olá, {name}!", "Olá!"),
+        "Aggressive": ("{name},", "Olá,"),
+        "Short & Sweet": ("Olá, {name},", "Olá,"),
+    },
+}
+
+# The tones every language has templates for
+TONES = tuple(GREETINGS[DEFAULT_LANGUAGE])
+
+CTAS = {
+    "English": {
+        "Professional": "Would you be open to a 15-minute call next week to explore whether this could work for you?",
+        "Friendly": "Fancy a quick chat next week? Just reply with a time that suits you.",
+        "Aggressive": "Let's get 15 minutes on the calendar this week. When works for you?",
+        "Short & Sweet": "Worth a quick call?",
+    },
+    "Spanish": {
+        "Professional": "¿Tendría 15 minutos la próxima semana para una breve llamada y ver si esto encaja con ustedes?",
+        "Friendly": "¿Te apetece una charla rápida la semana que viene? Respóndeme con el horario que mejor te venga.",
+        "Aggressive": "Agendemos 15 minutos esta semana. ¿Qué horario le viene bien?",
+        "Short & Sweet": "¿Hablamos 10 minutos?",
+    },
+    "French": {
+        "Professional": "Seriez-vous disponible pour un échange de 15 minutes la semaine prochaine ?",
+        "Friendly": "Un petit appel la semaine prochaine ? Répondez-moi simplement avec un créneau qui vous arrange.",
+        "Aggressive": "Bloquons 15 minutes cette semaine. Quel créneau vous convient ?",
+        "Short & Sweet": "On en parle 10 minutes ?",
+    },
+    "German": {
+        "Professional": "Hätten Sie nächste Woche 15 Minuten Zeit für ein kurzes Gespräch?",
+        "Friendly": "Lust auf ein kurzes Gespräch nächste Woche? Antworten Sie einfach mit einem passenden Termin.",
+        "Aggressive": "Lassen Sie uns diese Woche 15 Minuten einplanen. Wann passt es Ihnen?",
+        "Short & Sweet": "Kurz telefonieren?",
+    },
+    "Portuguese": {
+        "Professional": "Teria 15 minutos na próxima semana para uma conversa rápida sobre isso?",
+        "Friendly": "Que tal um papo rápido na semana que vem? É só responder com um horário que funcione para você.",
+        "Aggressive": "Vamos marcar 15 minutos esta semana. Qual horário funciona para você?",
+        "Short & Sweet": "Vale uma conversa rápida?",
+    },
+}
+
+SIGNATURES = {
+    "English": {
+        "Professional": "Best regards,\n[Your Name]\n[Your Title], [Your Company]\n[Phone] | [Email]",
+        "Friendly": "Cheers,\n[Your Name]\n[Your Company] | [Email]",
+        "Aggressive": "[Your Name]\n[Your Company] | [Phone]",
+        "Short & Sweet": "Thanks,\n[Your Name]",
+    },
+    "Spanish": {
+        "Professional": "Atentamente,\n[Tu Nombre]\n[Tu Cargo], [Tu Empresa]\n[Teléfono] | [Email]",
+        "Friendly": "¡Un saludo!\n[Tu Nombre]\n[Tu Empresa] | [Email]",
+        "Aggressive": "[Tu Nombre]\n[Tu Empresa] | [Teléfono]",
+        "Short & Sweet": "Gracias,\n[Tu Nombre]",
+    },
+    "French": {
+        "Professional": "Cordialement,\n[Votre Nom]\n[Votre Poste], [Votre Entreprise]\n[Téléphone] | [Email]",
+        "Friendly": "À bientôt,\n[Votre Nom]\n[Votre Entreprise] | [Email]",
+        "Aggressive": "[Votre Nom]\n[Votre Entreprise] | [Téléphone]",
+        "Short & Sweet": "Merci,\n[Votre Nom]",
+    },
+    "German": {
+        "Professional": "Mit freundlichen Grüßen\n[Ihr Name]\n[Ihre Position], [Ihr Unternehmen]\n[Telefon] | [E-Mail]",
+        "Friendly": "Viele Grüße\n[Ihr Name]\n[Ihr Unternehmen] | [E-Mail]",
+        "Aggressive": "[Ihr Name]\n[Ihr Unternehmen] | [Telefon]",
+        "Short & Sweet": "Danke,\n[Ihr Name]",
+    },
+    "Portuguese": {
+        "Professional": "Atenciosamente,\n[Seu Nome]\n[Seu Cargo], [Sua Empresa]\n[Telefone] | [Email]",
+        "Friendly": "Abraços,\n[Seu Nome]\n[Sua Empresa] | [Email]",
+        "Aggressive": "[Seu Nome]\n[Sua Empresa] | [Telefone]",
+        "Short & Sweet": "Obrigado,\n[Seu Nome]",
+    },
+}
+
+# The writer is told to leave these out, but a stray greeting or sign-off would be doubled
+GREETING_LINE = re.compile(
+    r"^(hi|hello|hey|dear|greetings|hola|estimad[oa]|buenos|bonjour|cher|chère|madame|hallo|guten|sehr geehrte|liebe|"
+    r"olá|ola|prezad[oa]|caro|cara)\b.{0,60}[,:!]\s*$",
+    re.I
+)
+SIGN_OFF_LINE = re.compile(
+    r"^(best|regards|kind regards|warm regards|cheers|thanks|thank you|sincerely|saludos|un saludo|atentamente|"
+    r"cordialement|bien à vous|à bientôt|mit freundlichen|viele grüße|beste grüße|atenciosamente|abraços|obrigad[oa])\b.{0,30}$",
+    re.I
+)
+
+
+def _load_overrides(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _merge(defaults, overrides):
+    merged = {language: dict(tones) for language, tones in defaults.items()}
+    for language, tones in (overrides or {}).items():
+        merged.setdefault(language, {}).update(tones)
+    return merged
+
+
+_overrides = _load_overrides(EMAIL_TEMPLATES_PATH)
+TEMPLATES = {
+    "greeting": _merge(GREETINGS, {
+        language: {tone: tuple(value) for tone, value in tones.items()}
+        for language, tones in _overrides.get("greeting", {}).items()
+    }),
+    "cta": _merge(CTAS, _overrides.get("cta")),
+    "signature": _merge(SIGNATURES, _overrides.get("signature")),
+}
+
+
+def _template(part, language, tone):
+    by_language = TEMPLATES[part].get(language) or TEMPLATES[part][DEFAULT_LANGUAGE]
+    return by_language.get(tone) or by_language.get(DEFAULT_TONE) or TEMPLATES[part][DEFAULT_LANGUAGE][DEFAULT_TONE]
+
+
+def greeting(recipient_name="", language=DEFAULT_LANGUAGE, tone=DEFAULT_TONE):
+    named, generic = _template("greeting", language, tone)
+    name = recipient_name.strip()
+    return named.format(name=name) if name else generic
+
+
+def clean_body(body):
+    lines = body.strip().split("\n")
+    if lines and GREETING_LINE.match(lines[0].strip()):
+        lines = lines[1:]
+    # Only the last few lines can be a sign-off; everything from it on goes
+    for i in range(max(0, len(lines) - 5), len(lines)):
+        if SIGN_OFF_LINE.match(lines[i].strip()):
+            lines = lines[:i]
+            break
+    return "\n".join(lines).strip()
+
+
+def compose_email(draft, recipient_name="", language=DEFAULT_LANGUAGE, tone=DEFAULT_TONE):
+    """Turns the writer's EmailDraft into the finished ColdEmail without an LLM call."""
+    return ColdEmail(
+        subject=draft.subject,
+        greeting=greeting(recipient_name, language, tone),
+        body=clean_body(draft.body),
+        cta=_template("cta", language, tone),
+        signature=_template("signature", language, tone),
+        service=draft.service,
+    )
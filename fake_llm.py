@@ -0,0 +1,184 @@
+"""A deterministic stand-in for the LLM provider, for benchmarks and load tests.
+
+It is served through litellm's custom provider hook, so crewai, the response
+cache and every stage run exactly as they do against Groq; only the network
+call is replaced by a reply that takes `latency` seconds to start and then
+arrives at `tokens_per_second`.
+
+    from fake_llm import register_fake_llm
+    model, fake = register_fake_llm(latency=0.3, tokens_per_second=250)
+    llm = make_llm("bench", model, api_key="fake")
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+
+import litellm
+from litellm import CustomLLM, ModelResponse
+
+from content_extractor import count_tokens
+
+FAKE_PROVIDER = "fakellm"
+
+TOOL_NAMES = re.compile(r"only one name of \[([^\]]+)\]")
+URL_PATTERN = re.compile(r"https?://[^\s\"'<>)]+")
+# How email_schema.json_instructions asks a stage for a JSON reply
+STRUCTURED = "Reply with only a JSON object"
+
+# Filler that none of our services' keywords match, so the pain point decides the match
+WORDS = (
+    "the team offers friendly support to customers across the region with a focus on quality "
+    "values partners community years experience local family plans people care trusted"
+).split()
+
+# One is picked per page so the local service matcher has something to match
+PAIN_POINTS = [
+    "Their website looks outdated and is slow on mobile.",
+    "They get very little organic traffic and rank poorly in search.",
+    "Their team handles bookings and invoices by hand, a lot of manual repetitive work.",
+]
+
+# Each agent is recognised by its role, which crewai puts in the system prompt
+STAGE_ROLES = {
+    "Business Intelligence Analyst": "analyze",
+    "Agency Strategist": "strategize",
+    "Senior Sales Copywriter": "write",
+    "Email Campaign Manager": "finalize",
+}
+
+
+def _text(messages):
+    return "\n".join(str(message.get("content") or "") for message in messages)
+
+
+def _stage(messages):
+    system = next((str(m.get("content") or "") for m in messages if m.get("role") == "system"), _text(messages))
+    return next((stage for role, stage in STAGE_ROLES.items() if role in system), None)
+
+
+class FakeLLM(CustomLLM):
+    def __init__(self, latency=0.2, tokens_per_second=200.0, completion_tokens=120, use_tools=True, profiles=None,
+                 rpm=None):
+        super().__init__()
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        # Other speeds for particular models, e.g. {"small": (0.05, 800)} for "fakellm/small"
+        self.profiles = profiles or {}
+        self.completion_tokens = completion_tokens
+        self.use_tools = use_tools
+        # Requests per minute before answering 429 like a real provider, with rate limit headers
+        self.rpm = rpm
+        self.stats = {"calls": 0, "tool_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "throttled": 0}
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def _answer(self, messages):
+        text = _text(messages)
+        # The researcher is asked to scrape first, exactly once, when it has the tool;
+        # crewai sends the tool request back with its observation as an assistant message
+        tools = TOOL_NAMES.search(text)
+        urls = URL_PATTERN.findall(text)
+        asked = any(message.get("role") == "assistant" for message in messages)
+        if self.use_tools and tools and urls and not asked:
+            tool = tools.group(1).split(",")[0].strip()
+            return f"Thought: I should read the website first.\nAction: {tool}\nAction Input: {json.dumps({'website_url': urls[0]})}", True
+
+        # Same prompt, same reply, so runs are comparable
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).hexdigest())
+        body = " ".join(rng.choice(WORDS) for _ in range(self.completion_tokens))
+        stage = _stage(messages)
+        if stage == "analyze":
+            body = f"{rng.choice(PAIN_POINTS)} {body}"
+        elif stage == "strategize":
+            body = f"Custom Web Development: {body}"
+        elif stage == "write" and STRUCTURED in text:
+            body = json.dumps({"subject": "A quick idea for your team", "body": body, "service": "Custom Web Development"})
+        elif stage == "finalize":
+            domain = re.sub(r"^https?://", "", urls[0]).split("/")[0] if urls else "your company"
+            body = json.dumps({
+                "subject": f"Quick idea for {domain}", "greeting": "Hi there,", "body": body,
+                "cta": "Worth a quick call next week?", "signature": "Best regards,\nThe Agency",
+                "service": "Custom Web Development",
+            }, indent=2)
+        return f"Thought: I now can give a great answer\nFinal Answer: {body}", False
+
+    def _usage(self, messages, answer, used_tool):
+        usage = {"prompt_tokens": count_tokens(_text(messages)), "completion_tokens": count_tokens(answer)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["tool_calls"] += used_tool
+            self.stats["prompt_tokens"] += usage["prompt_tokens"]
+            self.stats["completion_tokens"] += usage["completion_tokens"]
+        return usage
+
+    def _admit(self, model):
+        # Returns the rate limit headers, or raises RateLimitError when over rpm in the last minute
+        if not self.rpm:
+            return {}
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.rpm:
+                self.stats["throttled"] += 1
+                wait = 60 - (now - self._recent[0])
+                raise litellm.RateLimitError(
+                    f"Rate limit reached for {model}, try again in {wait:.2f}s", llm_provider=FAKE_PROVIDER, model=model,
+                    headers={"retry-after": f"{wait:.2f}"}
+                )
+            self._recent.append(now)
+            reset = 60 - (now - self._recent[0])
+            return {"x-ratelimit-remaining-requests": str(self.rpm - len(self._recent)),
+                    "x-ratelimit-reset-requests": f"{reset:.2f}s"}
+
+    def _speed(self, model):
+        return self.profiles.get(model, (self.latency, self.tokens_per_second))
+
+    def completion(self, model, messages, *args, **kwargs):
+        headers = self._admit(model)
+        answer, used_tool = self._answer(messages)
+        usage = self._usage(messages, answer, used_tool)
+        latency, tokens_per_second = self._speed(model)
+        time.sleep(latency + usage["completion_tokens"] / tokens_per_second)
+        response = ModelResponse(
+            model=model,
+            choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}],
+            usage=usage,
+        )
+        response._hidden_params["additional_headers"] = headers
+        return response
+
+    def streaming(self, model, messages, *args, **kwargs):
+        self._admit(model)
+        answer, used_tool = self._answer(messages)
+        usage = self._usage(messages, answer, used_tool)
+        latency, tokens_per_second = self._speed(model)
+        time.sleep(latency)
+        words = re.findall(r"\S+\s*", answer)
+        delay = usage["completion_tokens"] / tokens_per_second / max(1, len(words))
+        for i, word in enumerate(words):
+            time.sleep(delay)
+            last = i == len(words) - 1
+            yield {
+                "text": word,
+                "is_finished": last,
+                "finish_reason": "stop" if last else None,
+                "index": 0,
+                "tool_use": None,
+                "usage": usage if last else None,
+            }
+
+
+def register_fake_llm(latency=0.2, tokens_per_second=200.0, completion_tokens=120, use_tools=True, model="bench",
+                      profiles=None, rpm=None):
+    """Installs the fake provider and returns the model name to pass to make_llm and the handler."""
+    handler = FakeLLM(latency, tokens_per_second, completion_tokens, use_tools, profiles, rpm)
+    litellm.custom_provider_map = [
+        item for item in litellm.custom_provider_map if item["provider"] != FAKE_PROVIDER
+    ] + [{"provider": FAKE_PROVIDER, "custom_handler": handler}]
+    return f"{FAKE_PROVIDER}/{model}", handler
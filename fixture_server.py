@@ -0,0 +1,212 @@
+"""Serves recorded company homepages from localhost so scraping needs no network.
+
+Pages are read from a directory of `<name>.html` files (see --record below) and
+served at http://127.0.0.1:<port>/<name>/. When no directory is given, a set of
+built-in homepages with the usual navigation, cookie banners and footers is used,
+with about, services, pricing and careers pages at /<name>/about and so on.
+Any path ending in `/<n>/` serves fixture n modulo the number of pages, so an
+N-URL campaign gets N distinct URLs over the same few recorded pages.
+
+    python fixture_server.py --port 8900
+    python fixture_server.py --record urls.txt --dir fixtures/   # needs network, once
+"""
+import argparse
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPANIES = [
+    ("acme-analytics", "Acme Analytics", "Dashboards for retail teams", "analytics, reporting and forecasting"),
+    ("bluepine-dental", "Bluepine Dental", "Family dentistry in Portland", "checkups, cleaning and implants"),
+    ("northwind-logistics", "Northwind Logistics", "Same-day freight across the Midwest", "trucking, warehousing and tracking"),
+    ("kettle-coffee", "Kettle & Co. Coffee", "Small-batch roasters since 2009", "subscriptions, wholesale and cafes"),
+    ("orbit-hr", "Orbit HR", "Payroll and onboarding for startups", "payroll, benefits and compliance"),
+    ("summit-legal", "Summit Legal", "Business law for founders", "contracts, incorporation and IP"),
+    ("greenleaf-solar", "Greenleaf Solar", "Rooftop solar without the paperwork", "panels, batteries and financing"),
+    ("pixel-forge", "Pixel Forge Studios", "Indie games and interactive stories", "game design, porting and QA"),
+]
+
+
+def builtin_page(slug, name, tagline, services):
+    # Roughly the shape of a real small-business homepage, boilerplate included
+    nav = "".join(f'<li><a href="/{slug}/{item.lower()}">{item}</a></li>' for item in ("Home", "About", "Services", "Pricing", "Blog", "Careers", "Contact"))
+    posts = "".join(f"<li><a href='/{slug}/blog/{i}'>Update {i} from the {name} team</a></li>" for i in range(12))
+    return f"""<!doctype html>
+<html><head><title>{name} | {tagline}</title>
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}}</script>
+<style>body {{ font-family: sans-serif; }} .hero {{ padding: 4rem; }}</style></head>
+<body>
+<div class="cookie-banner" role="dialog">We use cookies to improve your experience. <button>Accept</button></div>
+<header class="navbar"><a class="logo" href="/{slug}/">{name}</a><nav><ul>{nav}</ul></nav></header>
+<main>
+<section class="hero"><h1>{tagline}</h1>
+<p>{name} helps customers with {services}. Trusted by hundreds of local businesses and growing every month.</p>
+<a class="cta" href="/{slug}/contact">Book a call</a></section>
+<section id="services"><h2>What we do</h2>
+<p>Our team covers {services}. Every engagement starts with a free consultation and a written proposal.</p>
+<ul><li>Fast turnaround</li><li>Dedicated account manager</li><li>Transparent reporting</li></ul></section>
+<section id="pricing"><h2>Pricing</h2>
+<p>Starter from $49/month, Growth from $199/month, Enterprise on request. All plans include support.</p></section>
+<section class="testimonials"><h2>What customers say</h2>
+<blockquote>"{name} saved us hours every week." - A happy customer</blockquote></section>
+<section id="about"><h2>About us</h2>
+<p>Founded by a small team who wanted {services} to be simpler. Our website was last redesigned in 2014.</p></section>
+<section class="blog"><h2>Latest news</h2><ul>{posts}</ul></section>
+</main>
+<aside class="sidebar">Subscribe to our newsletter for monthly tips.</aside>
+<footer class="footer"><p>&copy; 2024 {name}. All rights reserved.</p><a href="/{slug}/privacy">Privacy</a> <a href="/{slug}/terms">Terms</a></footer>
+</body></html>"""
+
+
+SUBPAGES = {
+    "about": ("Our story", "{name} was founded in 2011 by two friends who wanted {services} to be simpler. "
+              "We are a team of twelve and still update this website by hand whenever we find the time."),
+    "services": ("Services", "We offer {services}. Most new customers find us through word of mouth; "
+                 "we do not run any online advertising yet."),
+    "pricing": ("Plans and pricing", "Starter $49/month, Growth $199/month, Enterprise on request. "
+                "Quotes for custom work are sent by email within five business days."),
+    "careers": ("Join the team", "We are hiring a marketing coordinator to take over our social media, "
+                "newsletter and website, which nobody on the team currently owns."),
+}
+
+
+def builtin_subpage(slug, name, services, kind):
+    # An internal page with the same header, banner and footer as the homepage, for the crawler to find
+    heading, text = SUBPAGES[kind]
+    nav = "".join(f'<li><a href="/{slug}/{item.lower()}">{item}</a></li>' for item in ("Home", "About", "Services", "Pricing", "Blog", "Careers", "Contact"))
+    return f"""<!doctype html>
+<html><head><title>{heading} | {name}</title></head>
+<body>
+<div class="cookie-banner" role="dialog">We use cookies to improve your experience. <button>Accept</button></div>
+<header class="navbar"><a class="logo" href="/{slug}/">{name}</a><nav><ul>{nav}</ul></nav></header>
+<main>
+<section><h1>{heading}</h1><p>{text.format(name=name, services=services)}</p></section>
+<section class="cta-band"><h2>Ready to talk?</h2><p>Book a free consultation with the {name} team today.</p></section>
+</main>
+<footer class="footer"><p>&copy; 2024 {name}. All rights reserved.</p></footer>
+</body></html>"""
+
+
+def load_pages(directory=None):
+    if directory:
+        pages = {}
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".html"):
+                with open(os.path.join(directory, filename), encoding="utf-8", errors="replace") as f:
+                    pages[filename[:-5]] = f.read()
+        if not pages:
+            raise ValueError(f"No .html fixtures in {directory}")
+        return pages
+    return {slug: builtin_page(slug, name, tagline, services) for slug, name, tagline, services in COMPANIES}
+
+
+class FixtureServer:
+    """A ThreadingHTTPServer on a background thread; use as a context manager."""
+
+    def __init__(self, directory=None, host="127.0.0.1", port=0, latency=0.0):
+        self.pages = load_pages(directory)
+        # Built-in companies also have about, services, pricing and careers pages
+        self.subpages = {} if directory else {
+            slug: {kind: builtin_subpage(slug, name, services, kind) for kind in SUBPAGES}
+            for slug, name, _, services in COMPANIES
+        }
+        self.names = list(self.pages)
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                page = server.page_for(self.path)
+                if page is None:
+                    self.send_error(404)
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                body = page.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+        self._thread = None
+
+    def page_for(self, path):
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        if not parts:
+            return None
+        if parts[0] in self.pages:
+            return self.subpages.get(parts[0], {}).get(parts[-1], self.pages[parts[0]])
+        if parts[-1].isdigit():
+            return self.pages[self.names[int(parts[-1]) % len(self.names)]]
+        return None
+
+    def urls(self, count=None):
+        # Distinct URLs, cycling through the recorded pages
+        count = len(self.names) if count is None else count
+        return [f"http://{self.host}:{self.port}/{self.names[i % len(self.names)]}/{i}/" for i in range(count)]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def record(urls, directory):
+    # The one step that needs the network: saves each homepage as <domain>.html
+    from scrape_cache import scrape_cache
+    os.makedirs(directory, exist_ok=True)
+    for url in urls:
+        name = re.sub(r"[^a-z0-9.-]+", "-", re.sub(r"^https?://(www\.)?", "", url.lower()).split("/")[0])
+        html = scrape_cache.fetch(url, headers={"User-Agent": "Mozilla/5.0"})
+        with open(os.path.join(directory, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"recorded {url} -> {name}.html ({len(html):,} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="Directory of recorded <name>.html pages; built-in pages when omitted")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds each page takes to serve")
+    parser.add_argument("--record", metavar="URLS_FILE", help="Fetch the URLs listed in this file into --dir and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.dir:
+            parser.error("--record needs --dir")
+        with open(args.record, encoding="utf-8") as f:
+            record([line.strip() for line in f if line.strip()], args.dir)
+        return
+
+    with FixtureServer(args.dir, port=args.port, latency=args.latency) as server:
+        for url in server.urls():
+            print(url)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
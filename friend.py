@@ -1,12 +1,16 @@
 import streamlit as st
-from crewai import Agent, Task, Crew, LLM
 from dotenv import load_dotenv
+from preload import preloader
+from resources import shared_llm, agent_pool
 import os
 
 load_dotenv()
 
 st.set_page_config(page_title="Friend AI", page_icon="🤗", layout="centered")
 
+# crewai loads in the background while the page draws
+preloader.start()
+
 st.markdown("""
 <style>
     .stApp {
@@ -31,10 +35,24 @@ st.markdown("""
 st.title("🤗 Friend AI")
 st.markdown("*I'm your AI best friend! Tell me about yourself and I'll remember everything.*")
 
-llm = LLM(
-    model="gemini/gemini-2.5-flash",
-    api_key=os.getenv("GEMINI_API_KEY")
-)
+llm_options = {
+    "model": "gemini/gemini-2.5-flash",
+    "api_key": os.getenv("GEMINI_API_KEY")
+}
+preloader.warm(shared_llm, "friend", **llm_options)
+
+
+def build_friend(llm):
+    from crewai import Agent
+    return Agent(
+        role="Friend Agent",
+        goal="Remember everything the user tells you and be a caring, supportive friend",
+        backstory="""You are the user's best friend. You are warm, caring, and genuinely interested in their life. 
+        You remember details they share and bring them up naturally in conversation. 
+        You're supportive, encouraging, and always ready to chat about their interests.""",
+        llm=llm
+    )
+
 
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
@@ -58,6 +76,8 @@ if st.button("💬 Let's Chat!", type="primary", use_container_width=True):
     if not food and not car and not toy and not hobby:
         st.warning("Please tell me at least one thing about yourself! 😊")
     else:
+        from crewai import Task, Crew
+        llm = shared_llm("friend", **llm_options)
         with st.spinner("🤔 Thinking about what you told me..."):
             user_prefs = []
             if food:
@@ -73,37 +93,31 @@ if st.button("💬 Let's Chat!", type="primary", use_container_width=True):
                 user_prefs.append(f"Favourite hobby: {hobby}")
                 st.session_state.user_info['hobby'] = hobby
 
-            friend_agent = Agent(
-                role="Friend Agent",
-                goal="Remember everything the user tells you and be a caring, supportive friend",
-                backstory="""You are the user's best friend. You are warm, caring, and genuinely interested in their life. 
-                You remember details they share and bring them up naturally in conversation. 
-                You're supportive, encouraging, and always ready to chat about their interests.""",
-                llm=llm
-            )
-
             prefs_text = "\n".join(user_prefs)
-            friend_task = Task(
-                description=f"""
+            description = f"""
                 The user just shared these things about themselves:
                 {prefs_text}
 
                 Respond as their best friend! Be warm, enthusiastic, and show that you genuinely 
                 care about remembering these details. Maybe suggest doing something together 
                 based on their interests. Keep it friendly and conversational.
-                """,
-                expected_output="A warm, friendly response showing you remember and care about their preferences.",
-                agent=friend_agent
-            )
-
-            crew = Crew(
-                agents=[friend_agent],
-                tasks=[friend_task],
-                verbose=False,
-                memory=False
-            )
-
-            result = crew.kickoff()
+                """
+
+            with agent_pool.checkout(build_friend, llm) as friend_agent:
+                friend_task = Task(
+                    description=description,
+                    expected_output="A warm, friendly response showing you remember and care about their preferences.",
+                    agent=friend_agent
+                )
+
+                crew = Crew(
+                    agents=[friend_agent],
+                    tasks=[friend_task],
+                    verbose=False,
+                    memory=False
+                )
+
+                result = crew.kickoff()
             
             st.session_state.chat_history.append({"role": "user", "content": f"Shared: {', '.join(user_prefs)}"})
             st.session_state.chat_history.append({"role": "friend", "content": result.raw})
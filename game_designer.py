@@ -1,5 +1,6 @@
-from crewai import Agent, Task, Crew, LLM
+from crewai import Agent, Task, Crew
 from dotenv import load_dotenv
+from llm_cache import make_llm
 import os
 
 load_dotenv()
@@ -7,7 +8,8 @@ load_dotenv()
 
 user_input = input("Enter the type of game you want to create (e.g., horror, adventure, puzzle): ")
 
-llm = LLM(
+llm = make_llm(
+    "game_designer",
     model="groq/llama-3.1-8b-instant",
     api_key=os.getenv("GROQ_API_KEY")
 )
@@ -0,0 +1,291 @@
+"""Local HTTP API for generating cold emails from other tools.
+
+    POST /jobs        {"url": "https://example.com", "recipient_name": "Ana", "recipient_email": "ana@example.com",
+                       "email_tone": "Friendly", "language": "English", "email_length": "Short",
+                       "selected_template": "Professional", "model": "groq/llama-3.3-70b-versatile"}
+                      -> 202 {"id": "...", "status": "queued", ...}
+    GET  /jobs/<id>   -> the job; with ?wait=30 the request is held until the job finishes or 30s pass
+    GET  /health      -> queue depth, job counts and the rate governor's view of each model
+
+Only "url" is required; anything left out comes from the command line options.
+"model" may be --model or one of --models; anything else answers 400, as does
+an unknown "email_tone" or "email_length".
+A job that failed can be retried by POSTing it again with "run_id" set to the
+failed job's id: stages that finished the first time are not run again.
+With --dedupe, a POST for a company pitched within --repitch-days, or one that
+already has a job waiting or running, answers 409.
+Jobs run on a fixed pool of worker threads with the same agents, tasks and stage
+routing as app.py. The queue in front of them is bounded: when it is full, POST
+answers 503 with a Retry-After estimate instead of piling up work, so callers
+back off rather than time out. Finished jobs are kept in memory, up to
+JOB_API_KEEP_JOBS of them, oldest dropped first.
+
+    python job_api.py --port 8800 --workers 4
+    python load_test_job_api.py   # throughput against a fake LLM, offline
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cold_email_cli import EMAIL_LENGTHS, Generator, add_generation_arguments, generation_settings, target_from_row
+from email_templates import TONES
+
+JOB_API_WORKERS = int(os.getenv("JOB_API_WORKERS", "4"))
+JOB_API_QUEUE_SIZE = int(os.getenv("JOB_API_QUEUE_SIZE", "32"))
+JOB_API_KEEP_JOBS = int(os.getenv("JOB_API_KEEP_JOBS", "1000"))
+# Longest a GET may be held open waiting for its job
+JOB_API_MAX_WAIT = float(os.getenv("JOB_API_MAX_WAIT", "60"))
+JOB_API_MAX_BODY = 64 * 1024
+# Models a job may ask for besides --model, comma separated
+JOB_API_MODELS = [model.strip() for model in os.getenv("JOB_API_MODELS", "").split(",") if model.strip()]
+
+FINISHED = ("ok", "error")
+
+
+class AlreadyPitched(Exception):
+    """The target's company was pitched recently or already has a job; answered with 409."""
+
+
+class JobQueue:
+    """Jobs waiting in a bounded queue for a fixed pool of worker threads."""
+
+    def __init__(self, settings, workers=JOB_API_WORKERS, queue_size=JOB_API_QUEUE_SIZE, keep=JOB_API_KEEP_JOBS,
+                 models=JOB_API_MODELS):
+        self.settings = settings
+        # Each model gets a generator of its own, so only these are accepted
+        self.models = {settings["model"], *models}
+        self.workers = workers
+        self.keep = keep
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._jobs = OrderedDict()
+        self._generators = {}
+        # Domains with a job queued or running, when deduplication is on
+        self._pending = set()
+        self._changed = threading.Condition()
+        self._recent_seconds = []
+        self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _generator(self, model):
+        # One per model; the LLM clients behind them are shared through resources anyway
+        with self._changed:
+            generator = self._generators.get(model)
+        if generator is None:
+            generator = Generator({**self.settings, "model": model})
+            with self._changed:
+                generator = self._generators.setdefault(model, generator)
+        return generator
+
+    def submit(self, request):
+        """Queues a job and returns it; raises ValueError for a bad request and queue.Full when busy."""
+        target = target_from_row(request)
+        if not target["url"]:
+            raise ValueError('"url" is required')
+        model = request.get("model") or self.settings["model"]
+        if not isinstance(model, str) or model not in self.models:
+            raise ValueError(f'"model" must be one of {", ".join(sorted(self.models))}')
+        for option, allowed in (("email_tone", TONES), ("email_length", EMAIL_LENGTHS)):
+            if option in target and target[option] not in allowed:
+                raise ValueError(f'"{option}" must be one of {", ".join(allowed)}')
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "model": model,
+            "target": target,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+        }
+        # Stages are checkpointed under this id; a failed job's id passed as "run_id" resumes it
+        target["id"] = str(request.get("run_id") or job["id"])
+        repitch_after_days = self.settings.get("repitch_after_days")
+        if repitch_after_days is not None:
+            from domain_index import domain_index, normalize_domain
+            job["domain"] = normalize_domain(target["url"])
+            if domain_index.recently_pitched(target["url"], repitch_after_days):
+                raise AlreadyPitched(f"{job['domain']} was pitched in the last {repitch_after_days:g} days")
+        with self._changed:
+            if job.get("domain") in self._pending:
+                raise AlreadyPitched(f"{job['domain']} already has a job")
+            self._queue.put_nowait(job)
+            self._jobs[job["id"]] = job
+            if "domain" in job:
+                self._pending.add(job["domain"])
+        return job
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._changed:
+                job["status"] = "running"
+                job["started_at"] = time.time()
+            try:
+                result = self._generator(job["model"]).run(job["target"])
+            except Exception as e:
+                # Generator.run reports pipeline errors itself; this is for a model that cannot be set up
+                result = {"id": job["id"], "status": "error", "error": str(e)}
+            if "domain" in job and result["status"] == "ok":
+                from domain_index import domain_index
+                domain_index.record(job["target"]["url"])
+            with self._changed:
+                self._pending.discard(job.get("domain"))
+                job["result"] = result
+                job["status"] = result["status"]
+                job["finished_at"] = time.time()
+                self._recent_seconds = (self._recent_seconds + [job["finished_at"] - job["started_at"]])[-50:]
+                self._evict()
+                self._changed.notify_all()
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id, wait=0.0):
+        """The job, after waiting up to `wait` seconds for it to finish; None if unknown."""
+        deadline = time.monotonic() + wait
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in FINISHED or remaining <= 0:
+                    return dict(job) if job else None
+                self._changed.wait(remaining)
+
+    def retry_after(self):
+        # Seconds until a queue slot is likely to free up, from how long recent jobs took
+        with self._changed:
+            recent = list(self._recent_seconds)
+        average = sum(recent) / len(recent) if recent else 10.0
+        return max(1, math.ceil(average * self._queue.qsize() / self.workers))
+
+    def stats(self):
+        with self._changed:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "jobs": {status: statuses.count(status) for status in ("queued", "running", *FINISHED)},
+        }
+
+
+def _elapsed(start, end):
+    return round(end - start, 3) if start and end else None
+
+
+def public(job):
+    # What callers see; the target is echoed back through the result once there is one
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "model": job["model"],
+        "url": job["target"]["url"],
+        "queue_seconds": _elapsed(job["created_at"], job["started_at"]),
+        "run_seconds": _elapsed(job["started_at"], job["finished_at"]),
+        "result": job["result"],
+    }
+
+
+def make_server(jobs, host="127.0.0.1", port=8800):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if urlparse(self.path).path.rstrip("/") != "/jobs":
+                self._send(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > JOB_API_MAX_BODY:
+                self._send(413, {"error": "request body too large"})
+                return
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("the body must be a JSON object")
+                job = jobs.submit(request)
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+            except AlreadyPitched as e:
+                self._send(409, {"error": str(e)})
+            except queue.Full:
+                retry_after = jobs.retry_after()
+                self._send(503, {"error": "queue full", "retry_after": retry_after},
+                           {"Retry-After": str(retry_after)})
+            else:
+                self._send(202, public(job), {"Location": f"/jobs/{job['id']}"})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            if parts == ["health"]:
+                from rate_governor import rate_governor
+                self._send(200, {**jobs.stats(), "rate_limits": rate_governor.snapshot()})
+                return
+            if len(parts) != 2 or parts[0] != "jobs":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                wait = min(float(parse_qs(url.query).get("wait", ["0"])[0]), JOB_API_MAX_WAIT)
+            except ValueError:
+                self._send(400, {"error": "wait must be a number of seconds"})
+                return
+            job = jobs.get(parts[1], max(0.0, wait))
+            if job is None:
+                self._send(404, {"error": "unknown job"})
+            else:
+                self._send(200, public(job))
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--workers", type=int, default=JOB_API_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=JOB_API_QUEUE_SIZE, help="Jobs waiting before POST answers 503")
+    parser.add_argument("--models", nargs="*", default=JOB_API_MODELS,
+                        help="Other models a job may ask for (default JOB_API_MODELS); --model is always allowed")
+    add_generation_arguments(parser)
+    args = parser.parse_args()
+    settings = generation_settings(parser, args)
+
+    jobs = JobQueue(settings, args.workers, args.queue_size, models=args.models)
+    server = make_server(jobs, args.host, args.port)
+    print(f"serving on http://{server.server_address[0]}:{server.server_address[1]} "
+          f"with {args.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,45 @@
 import streamlit as st
-from crewai import Agent, Task, Crew, LLM
 from dotenv import load_dotenv
+from preload import preloader
+from resources import shared_llm, agent_pool
 import os
 
 load_dotenv()
 
 st.set_page_config(page_title="Joke Teller", page_icon="😂", layout="centered")
 
+# crewai loads in the background while the page draws
+preloader.start()
+
 st.title("😂 Joke Teller Agent")
 st.markdown("Welcome! I'm your AI comedian. Tell me what type of jokes you want to hear!")
 
-llm = LLM(
-    model="groq/llama-3.1-8b-instant",
-    api_key=os.getenv("GROQ_API_KEY")
-)
+llm_options = {
+    "model": "groq/llama-3.1-8b-instant",
+    "api_key": os.getenv("GROQ_API_KEY")
+}
+preloader.warm(shared_llm, "joke_teller", **llm_options)
 
-joke_teller = Agent(
-    role="joke teller",
-    goal="tell hilarious jokes based on the user's preferred type",
-    backstory="you are a professional comedian who loves to make people laugh with your creative and entertaining jokes",
-    llm=llm
-)
 
-joke_judge = Agent(
-    role="joke judge",
-    goal="evaluate and rate jokes on a scale of 1-10 with constructive feedback",
-    backstory="you are an experienced comedy critic who has judged comedy shows for decades",
-    llm=llm
-)
+def build_joke_teller(llm):
+    from crewai import Agent
+    return Agent(
+        role="joke teller",
+        goal="tell hilarious jokes based on the user's preferred type",
+        backstory="you are a professional comedian who loves to make people laugh with your creative and entertaining jokes",
+        llm=llm
+    )
+
+
+def build_joke_judge(llm):
+    from crewai import Agent
+    return Agent(
+        role="joke judge",
+        goal="evaluate and rate jokes on a scale of 1-10 with constructive feedback",
+        backstory="you are an experienced comedy critic who has judged comedy shows for decades",
+        llm=llm
+    )
+
 
 joke_type = st.text_input(
     "What type of jokes do you want to hear?",
@@ -38,7 +50,11 @@ if st.button("Tell me a joke!", type="primary"):
     if not joke_type.strip():
         st.warning("Please enter a joke type first!")
     else:
-        with st.spinner("🎭 Our comedian is crafting the perfect joke for you..."):
+        from crewai import Task, Crew
+        llm = shared_llm("joke_teller", **llm_options)
+        with st.spinner("🎭 Our comedian is crafting the perfect joke for you..."), \
+                agent_pool.checkout(build_joke_teller, llm) as joke_teller, \
+                agent_pool.checkout(build_joke_judge, llm) as joke_judge:
             joke_task = Task(
                 description=f"Create a hilarious {joke_type} joke. Make it creative, original, and actually funny!",
                 expected_output="A funny joke of the requested type",
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from rate_governor import rate_governor, RATE_COMPLETION_ESTIMATE
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+# Sampled (temperature > 0) responses are only cached when explicitly asked for
+LLM_CACHE_SAMPLED = os.getenv("LLM_CACHE_SAMPLED", "0") == "1"
+
+
+def cache_key(model, messages, temperature, max_tokens):
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                app TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._db.commit()
+
+    def _count(self, app, outcome):
+        with self._lock:
+            counters = self.stats.setdefault(app, {"hits": 0, "misses": 0, "bypassed": 0})
+            counters[outcome] += 1
+
+    def get(self, key, app):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] >= self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                row = None
+            if row:
+                self._db.execute("UPDATE responses SET hits = hits + 1, accessed_at = ? WHERE key = ?", (now, key))
+                self._db.commit()
+        self._count(app, "hits" if row else "misses")
+        return row[0] if row else None
+
+    def put(self, key, app, model, response):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, app, model, response, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, app, model, response, now, now)
+            )
+            # Least recently used entries go first once the cap is reached
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def bypass(self, app):
+        self._count(app, "bypassed")
+
+    def summary(self):
+        with self._lock:
+            rows = self._db.execute("SELECT app, COUNT(*), SUM(hits) FROM responses GROUP BY app").fetchall()
+        return {app: {"entries": entries, "lifetime_hits": hits or 0} for app, entries, hits in rows}
+
+    def clear(self, app=None):
+        with self._lock:
+            if app:
+                self._db.execute("DELETE FROM responses WHERE app = ?", (app,))
+            else:
+                self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+
+response_cache = ResponseCache() if LLM_CACHE_ENABLED else None
+
+
+@lru_cache(maxsize=None)
+def _cached_llm_class():
+    # crewai takes seconds to import, so the subclass is only defined on first use
+    from crewai import LLM
+
+    class CachedLLM(LLM):
+        cache_app: str = "default"
+        cache_sampled: bool = LLM_CACHE_SAMPLED
+
+        def _cacheable(self, tools, available_functions, kwargs):
+            if response_cache is None or tools or available_functions or kwargs.get("response_model"):
+                return False
+            # No temperature means the provider default, which samples
+            sampled = self.temperature is None or self.temperature > 0
+            return self.cache_sampled or not sampled
+
+        def _governed_call(self, messages, **kwargs):
+            # Paced and retried on 429 by the process-wide rate governor, so a throttled call
+            # waits instead of failing the crew
+            from content_extractor import count_tokens
+            prompt = messages if isinstance(messages, str) else "\n".join(str(m.get("content") or "") for m in messages)
+            tokens = count_tokens(prompt) + (self.max_tokens or RATE_COMPLETION_ESTIMATE)
+            return rate_governor.call(self.model, lambda: super(CachedLLM, self).call(messages, **kwargs), tokens)
+
+        def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+            if not self._cacheable(tools, available_functions, kwargs):
+                if response_cache is not None:
+                    response_cache.bypass(self.cache_app)
+                return self._governed_call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs)
+
+            key = cache_key(self.model, messages, self.temperature, self.max_tokens)
+            cached = response_cache.get(key, self.cache_app)
+            if cached is not None:
+                return cached
+
+            result = self._governed_call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs)
+            if isinstance(result, str) and result:
+                response_cache.put(key, self.cache_app, self.model, result)
+            return result
+
+    return CachedLLM
+
+
+def __getattr__(name):
+    if name == "CachedLLM":
+        return _cached_llm_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def make_llm(app, model, **kwargs):
+    # Every app builds its LLM here so they all share one response cache.
+    # is_litellm keeps every provider on the litellm path this class hooks into.
+    return _cached_llm_class()(model=model, cache_app=app, is_litellm=True, **kwargs)
@@ -0,0 +1,193 @@
+"""Offline load test for job_api.py.
+
+Starts the job API in this process on fake_llm's provider, with websites served
+from localhost by fixture_server, and fires --jobs POSTs from --clients client
+threads. Each client submits a job, backs off for Retry-After while the queue is
+full, then long-polls the job until it finishes. Reports:
+
+  * throughput (jobs per minute) and end-to-end latency as the client sees it
+  * time spent queued vs running on the server, per job
+  * how many POSTs were turned away with 503 while the queue was full
+
+Caches start empty in a temporary directory, as in bench_pipeline.py. --url
+points the clients at a job API that is already running instead; it must be
+able to reach this machine's fixture server.
+
+    python load_test_job_api.py
+    python load_test_job_api.py --jobs 200 --clients 32 --workers 8 --queue-size 16 --latency 0.5
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from bench_pipeline import distribution, isolate, peak_rss_mb
+
+
+def request(method, url, payload=None, timeout=120):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, json.loads(response.read()), response.headers
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}"), e.headers
+
+
+class Client:
+    """Submits and waits for jobs from a shared list of targets, one at a time."""
+
+    def __init__(self, base_url, targets, wait):
+        self.base_url = base_url
+        self.targets = targets
+        self.wait = wait
+        self.results = []
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            return self.targets.pop() if self.targets else None
+
+    def run_one(self, target):
+        started = time.perf_counter()
+        while True:
+            status, job, headers = request("POST", f"{self.base_url}/jobs", target)
+            if status != 503:
+                break
+            with self._lock:
+                self.rejected += 1
+            time.sleep(float(headers.get("Retry-After") or 1))
+        if status != 202:
+            return {"status": "error", "error": job.get("error", f"HTTP {status}"), "latency": None}
+        while job["status"] not in ("ok", "error"):
+            _, job, _ = request("GET", f"{self.base_url}/jobs/{job['id']}?wait={self.wait}", timeout=self.wait + 30)
+        job["latency"] = time.perf_counter() - started
+        return job
+
+    def loop(self):
+        while True:
+            target = self._next()
+            if target is None:
+                return
+            result = self.run_one(target)
+            with self._lock:
+                self.results.append(result)
+
+
+def run(args):
+    isolate(warm_cache=False, llm_cache=False)
+    from fixture_server import FixtureServer
+
+    with FixtureServer(latency=args.page_latency) as fixtures:
+        targets = [
+            {"url": url, "recipient_name": f"Recipient {i}", "recipient_email": f"r{i}@example.com",
+             "email_tone": args.tone}
+            for i, url in enumerate(fixtures.urls(args.jobs))
+        ]
+        server = None
+        base_url = args.url
+        if not base_url:
+            from fake_llm import register_fake_llm
+            from job_api import JobQueue, make_server
+
+            # Registered up front so the stats below count every call the workers make
+            model, fake = register_fake_llm(args.latency, args.tokens_per_second, args.completion_tokens)
+            settings = {
+                "model": model, "api_key": "fake", "temperature": 0.7, "no_routing": False,
+                "token_budget": args.token_budget, "crawl_pages": 0, "stage_cache": False,
+                "fake_llm": True, "fake_latency": args.latency, "repitch_after_days": None,
+                "options": {
+                    "email_tone": "Professional", "language": "English", "email_length": "Medium",
+                    "selected_template": "Professional",
+                    "strategy_mode": args.strategy_mode, "finalizer_mode": args.finalizer_mode,
+                },
+            }
+            server = make_server(JobQueue(settings, args.workers, args.queue_size), port=0)
+            threading.Thread(target=server.serve_forever, name="job-api", daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        client = Client(base_url, list(reversed(targets)), args.wait)
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client.loop, name=f"client-{i}") for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        _, health, _ = request("GET", f"{base_url}/health")
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    done = [job for job in client.results if job["status"] == "ok"]
+    failed = [job for job in client.results if job["status"] != "ok"]
+    for job in failed[:5]:
+        print(f"failed: {job.get('error') or (job.get('result') or {}).get('error')}", file=sys.stderr)
+    report = {
+        "config": {key: getattr(args, key) for key in ("jobs", "clients", "workers", "queue_size", "latency",
+                                                       "tokens_per_second", "strategy_mode", "finalizer_mode")},
+        "jobs": len(done),
+        "failures": len(failed),
+        "rejected": client.rejected,
+        "wall_seconds": round(seconds, 3),
+        "jobs_per_minute": round(len(done) / seconds * 60, 2) if seconds else None,
+        "latency": distribution([job["latency"] for job in done]),
+        "queue_seconds": distribution([job["queue_seconds"] for job in done]),
+        "run_seconds": distribution([job["run_seconds"] for job in done]),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "server": health,
+    }
+    if server:
+        report["fake_llm"] = dict(fake.stats)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running job API (default: start one in this process)")
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--workers", type=int, default=4, help="Job API workers (in-process server only)")
+    parser.add_argument("--queue-size", type=int, default=8, help="Job API queue size (in-process server only)")
+    parser.add_argument("--wait", type=float, default=30, help="Seconds each long-poll asks the server to hold")
+    parser.add_argument("--tone", default="Professional")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake LLM generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Words in each fake answer")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="Seconds the fixture server takes per page")
+    parser.add_argument("--strategy-mode", choices=["local", "llm"], default="local")
+    parser.add_argument("--finalizer-mode", choices=["local", "llm"], default="local")
+    parser.add_argument("--token-budget", type=int, default=None, help="Page token budget (default EXTRACT_TOKEN_BUDGET)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    if args.token_budget is None:
+        from content_extractor import EXTRACT_TOKEN_BUDGET
+        args.token_budget = EXTRACT_TOKEN_BUDGET
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    config = report["config"]
+    print(f"{config['clients']} clients, {config['workers']} workers, queue of {config['queue_size']}; "
+          f"fake LLM {config['latency']}s to first token, {config['tokens_per_second']} tokens/s")
+    print(f"{report['jobs']} jobs in {report['wall_seconds']:.2f}s ({report['jobs_per_minute']} jobs/min, "
+          f"{report['failures']} failed, {report['rejected']} POSTs turned away while the queue was full)")
+    for name in ("latency", "queue_seconds", "run_seconds"):
+        stats = report[name]
+        if stats:
+            print(f"  {name:<13}  p50 {stats['p50']:.3f}s  p95 {stats['p95']:.3f}s  max {stats['max']:.3f}s")
+    print(f"  peak RSS {report['peak_rss_mb']} MB")
+    if "fake_llm" in report:
+        stats = report["fake_llm"]
+        print(f"fake LLM served {stats['calls']} calls, "
+              f"{stats['prompt_tokens']:,} prompt / {stats['completion_tokens']:,} completion tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+METRICS_PATH = os.getenv("METRICS_PATH", ".cache/metrics.jsonl")
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", ".cache/metrics.prom")
+METRICS_MAX_BYTES = int(os.getenv("METRICS_MAX_BYTES", str(5 * 1024 * 1024)))
+METRICS_BACKUPS = int(os.getenv("METRICS_BACKUPS", "3"))
+# How many recent runs of each stage the p50/p95 are computed over
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "200"))
+
+METRIC_PREFIX = "cold_email_stage"
+
+# Records of the pipeline run currently executing on this thread, if anyone is collecting them
+_collector = ContextVar("stage_metrics_collector", default=None)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StageRun:
+    """Counters for one stage while its crew runs.
+
+    The agent's step callback counts tool calls, the task callback marks when the
+    answer was ready and LLM events from crewai's event bus add up the tokens.
+    """
+
+    def __init__(self, stage, task_id=None, model=None, source="llm"):
+        self.stage = stage
+        self.task_id = task_id
+        self.model = model
+        self.source = source
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self.llm_errors = 0
+        self.tool_calls = 0
+        self.retries = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def on_step(self, step):
+        # AgentAction carries the tool it ran; the final AgentFinish does not
+        if getattr(step, "tool", None):
+            self.tool_calls += 1
+
+    def on_task_done(self, output):
+        self.finished = time.perf_counter()
+
+    def on_llm_call(self, usage):
+        self.llm_calls += 1
+        usage = usage or {}
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += usage.get("completion_tokens") or 0
+
+    def record(self, error=None):
+        finished = self.finished or time.perf_counter()
+        return {
+            "ts": round(time.time(), 3),
+            "stage": self.stage,
+            "source": self.source,
+            "model": self.model,
+            "seconds": round(finished - self.started, 4),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "llm_calls": self.llm_calls,
+            "llm_errors": self.llm_errors,
+            "tool_calls": self.tool_calls,
+            "retries": self.retries,
+            "error": error,
+        }
+
+
+class StageMetrics:
+    """Per-stage timings and token counts for the email crew.
+
+    Every finished stage is appended to a rotating JSONL file and the totals are
+    rewritten as a Prometheus text file (for node_exporter's textfile collector).
+    Totals are per process, so a worker process (cold_email_cli.py --processes)
+    writes its own metrics-<pid>.prom with a pid label instead of the shared file.
+    """
+
+    def __init__(self, path=METRICS_PATH, prom_path=METRICS_PROM_PATH, max_bytes=METRICS_MAX_BYTES,
+                 backups=METRICS_BACKUPS, window=METRICS_WINDOW):
+        self.path = path
+        self.prom_path = prom_path
+        self.window = window
+        self.totals = {}
+        self._recent = {}
+        self._by_model = {}
+        self._runs = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._registered = False
+
+        for file_path in (path, prom_path):
+            if file_path and os.path.dirname(file_path):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self._log = logging.getLogger(f"{__name__}.{id(self)}")
+        self._log.setLevel(logging.INFO)
+        self._log.propagate = False
+        if path:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log.addHandler(handler)
+
+    def _register(self):
+        # crewai is imported lazily, so the LLM event handlers are attached on first use
+        with self._lock:
+            if self._registered:
+                return
+            from crewai.events import crewai_event_bus, LLMCallCompletedEvent, LLMCallFailedEvent
+
+            @crewai_event_bus.on(LLMCallCompletedEvent)
+            def _on_completed(source, event):
+                run = self._runs.get(event.task_id)
+                if run:
+                    run.on_llm_call(event.usage)
+
+            @crewai_event_bus.on(LLMCallFailedEvent)
+            def _on_failed(source, event):
+                run = self._runs.get(event.task_id)
+                if run:
+                    run.llm_errors += 1
+
+            self._registered = True
+
+    def start(self, stage, task_id, model=None):
+        self._register()
+        run = StageRun(stage, task_id, model)
+        self._runs[task_id] = run
+        return run
+
+    def finish(self, run, error=None):
+        self._runs.pop(run.task_id, None)
+        return self._add(run.record(error=str(error) if error else None))
+
+    def record(self, stage, seconds, source="local", **fields):
+        # Stages that never reach an LLM, such as the local service matcher
+        run = StageRun(stage, source=source)
+        record = run.record()
+        record.update(seconds=round(seconds, 4), **fields)
+        return self._add(record)
+
+    def _add(self, record):
+        stage = record["stage"]
+        with self._lock:
+            totals = self.totals.setdefault(stage, {
+                "runs": 0, "failures": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+                "llm_calls": 0, "tool_calls": 0, "retries": 0, "cache_hits": 0, "seconds_saved": 0.0,
+            })
+            totals["runs"] += 1
+            totals["failures"] += bool(record["error"])
+            for key in ("seconds", "prompt_tokens", "completion_tokens", "llm_calls", "tool_calls", "retries"):
+                totals[key] += record[key]
+            totals["cache_hits"] += record["source"] == "cache"
+            totals["seconds_saved"] += record.get("seconds_saved", 0.0)
+            # A stage restored from the cache or a run checkpoint says nothing about how long it takes to run
+            if not record["error"] and record["source"] not in ("cache", "checkpoint"):
+                self._recent.setdefault(stage, deque(maxlen=self.window)).append(record["seconds"])
+                # Stages that ran without an LLM are filed under "local"
+                self._by_model.setdefault((stage, record["model"] or "local"), deque(maxlen=self.window)).append(
+                    (record["seconds"], record["prompt_tokens"], record["completion_tokens"])
+                )
+            self._log.info(json.dumps(record, ensure_ascii=False))
+            self._write_prometheus()
+
+        collector = _collector.get()
+        if collector is not None:
+            collector(record)
+        for listener in list(self._listeners):
+            listener(record)
+        return record
+
+    def add_listener(self, listener):
+        # Sees every record in the process, whichever thread the stage ran on
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    @contextmanager
+    def collect(self, on_record=None):
+        """Gathers the records of every stage run inside the block, keyed by stage."""
+        records = {}
+
+        def add(record):
+            records[record["stage"]] = record
+            if on_record:
+                on_record(record)
+
+        token = _collector.set(add)
+        try:
+            yield records
+        finally:
+            _collector.reset(token)
+
+    def percentiles(self):
+        with self._lock:
+            recent = {stage: list(values) for stage, values in self._recent.items()}
+        return {
+            stage: {"runs": len(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+            for stage, values in recent.items()
+        }
+
+    def by_model(self):
+        """Recent p50 latency and mean tokens of each stage, split by the model that ran it."""
+        with self._lock:
+            recent = {key: list(values) for key, values in self._by_model.items()}
+        summary = {}
+        for (stage, model), values in recent.items():
+            summary.setdefault(stage, {})[model] = {
+                "runs": len(values),
+                "p50": percentile([seconds for seconds, _, _ in values], 0.5),
+                "prompt_tokens": sum(prompt for _, prompt, _ in values) / len(values),
+                "completion_tokens": sum(completion for _, _, completion in values) / len(values),
+            }
+        return summary
+
+    def prometheus_text(self):
+        with self._lock:
+            return self._prometheus_text()
+
+    def _worker_pid(self):
+        # None in the process that was started directly
+        return os.getpid() if multiprocessing.parent_process() is not None else None
+
+    def _prometheus_file(self):
+        pid = self._worker_pid()
+        if pid is None:
+            return self.prom_path
+        base, ext = os.path.splitext(self.prom_path)
+        return f"{base}-{pid}{ext}"
+
+    def _prometheus_text(self):
+        pid = self._worker_pid()
+        process = f',pid="{pid}"' if pid is not None else ""
+        lines = [
+            f"# HELP {METRIC_PREFIX}_seconds Wall time of each email crew stage, quantiles over the last {self.window} runs",
+            f"# TYPE {METRIC_PREFIX}_seconds summary",
+        ]
+        for stage, totals in sorted(self.totals.items()):
+            values = list(self._recent.get(stage, ()))
+            for q in (0.5, 0.95):
+                value = percentile(values, q)
+                if value is not None:
+                    lines.append(f'{METRIC_PREFIX}_seconds{{stage="{stage}"{process},quantile="{q}"}} {value}')
+            lines.append(f'{METRIC_PREFIX}_seconds_sum{{stage="{stage}"{process}}} {round(totals["seconds"], 4)}')
+            lines.append(f'{METRIC_PREFIX}_seconds_count{{stage="{stage}"{process}}} {totals["runs"]}')
+
+        counters = [
+            ("tokens_total", "Tokens used by each stage", lambda t: [('kind="prompt"', t["prompt_tokens"]),
+                                                                     ('kind="completion"', t["completion_tokens"])]),
+            ("llm_calls_total", "LLM calls made by each stage", lambda t: [(None, t["llm_calls"])]),
+            ("tool_calls_total", "Tool calls made by each stage", lambda t: [(None, t["tool_calls"])]),
+            ("retries_total", "Task retries after an agent error", lambda t: [(None, t["retries"])]),
+            ("failures_total", "Stage runs that raised", lambda t: [(None, t["failures"])]),
+            ("cache_hits_total", "Stage outputs served from the stage cache", lambda t: [(None, t["cache_hits"])]),
+            ("cache_seconds_saved_total", "Seconds the cached stages took when they ran",
+             lambda t: [(None, round(t["seconds_saved"], 4))]),
+        ]
+        for name, help_text, values in counters:
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+            for stage, totals in sorted(self.totals.items()):
+                for label, value in values(totals):
+                    labels = f'stage="{stage}"{process}' + (f",{label}" if label else "")
+                    lines.append(f"{METRIC_PREFIX}_{name}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _write_prometheus(self):
+        if not self.prom_path:
+            return
+        # Written to a temporary file and renamed so a scraper never reads half a file. Each
+        # writer gets its own temporary file, as CLI worker processes share the same path
+        prom_file = self._prometheus_file()
+        partial = None
+        try:
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(prom_file) or ".",
+                                             prefix=f"{os.path.basename(prom_file)}.", suffix=".tmp",
+                                             delete=False) as f:
+                partial = f.name
+                f.write(self._prometheus_text())
+            os.replace(partial, prom_file)
+        except OSError:
+            # Metrics are best effort; a stage that finished must not fail over them
+            if partial and os.path.exists(partial):
+                os.remove(partial)
+
+
+stage_metrics = StageMetrics()
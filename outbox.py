@@ -0,0 +1,180 @@
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from email import message_from_string
+
+from smtp_pool import smtp_pool, SMTP_MAX_PER_MINUTE
+
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", ".cache/outbox.sqlite3")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_BASE_DELAY = float(os.getenv("OUTBOX_BASE_DELAY", "30"))
+OUTBOX_MAX_DELAY = float(os.getenv("OUTBOX_MAX_DELAY", "3600"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+
+STATUSES = ("queued", "sending", "sent", "dead")
+
+
+class Outbox:
+    def __init__(self, path=OUTBOX_PATH, max_attempts=OUTBOX_MAX_ATTEMPTS, base_delay=OUTBOX_BASE_DELAY,
+                 max_delay=OUTBOX_MAX_DELAY, per_minute=SMTP_MAX_PER_MINUTE, pool=smtp_pool):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.per_minute = per_minute
+        self.pool = pool
+        # Passwords are kept in memory only; queued mail for an unknown sender
+        # waits until someone registers that sender again
+        self._credentials = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                message TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                sent_at REAL,
+                email_json TEXT
+            )
+        """)
+        if "email_json" not in [row[1] for row in self._db.execute("PRAGMA table_info(outbox)")]:
+            self._db.execute("ALTER TABLE outbox ADD COLUMN email_json TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        # Anything left mid-send by a previous process goes back in the queue
+        self._db.execute("UPDATE outbox SET status = 'queued' WHERE status = 'sending'")
+        self._db.commit()
+
+    def register_sender(self, sender_email, password):
+        with self._lock:
+            self._credentials[sender_email.lower()] = password
+        self.start()
+        self._wakeup.set()
+
+    def enqueue(self, msg, email=None):
+        # email is the ColdEmail the message was built from, kept alongside it as-is
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (sender, recipient, subject, message, next_attempt_at, created_at, email_json) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (msg['From'], msg['To'], msg['Subject'] or "", msg.as_string(), now, now,
+                 email.model_dump_json() if email else None)
+            )
+            self._db.commit()
+        self.start()
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def _claim(self):
+        with self._lock:
+            senders = list(self._credentials)
+            if not senders:
+                return None
+            row = self._db.execute(
+                f"SELECT id, sender, message, attempts FROM outbox WHERE status = 'queued' AND next_attempt_at <= ? "
+                f"AND lower(sender) IN ({','.join('?' * len(senders))}) ORDER BY next_attempt_at LIMIT 1",
+                (time.time(), *senders)
+            ).fetchone()
+            if row:
+                self._db.execute("UPDATE outbox SET status = 'sending' WHERE id = ?", (row[0],))
+                self._db.commit()
+            return row
+
+    def _finish(self, message_id, attempts, error=None, permanent=False):
+        now = time.time()
+        with self._lock:
+            if error is None:
+                self._db.execute("UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ?, last_error = NULL WHERE id = ?",
+                                 (attempts, now, message_id))
+            elif permanent or attempts >= self.max_attempts:
+                self._db.execute("UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                                 (attempts, error, message_id))
+            else:
+                # Exponential backoff with jitter so retries do not arrive in lockstep
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+                self._db.execute("UPDATE outbox SET status = 'queued', attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                                 (attempts, error, now + delay, message_id))
+            self._db.commit()
+
+    def _run(self):
+        interval = 60.0 / self.per_minute if self.per_minute else 0.0
+        while True:
+            self._wakeup.clear()
+            row = self._claim()
+            if row is None:
+                self._wakeup.wait(OUTBOX_POLL_INTERVAL)
+                continue
+
+            message_id, sender, message, attempts = row
+            started = time.monotonic()
+            try:
+                self.pool.send(sender, self._credentials[sender.lower()], message_from_string(message))
+                self._finish(message_id, attempts + 1)
+            except smtplib.SMTPRecipientsRefused as e:
+                self._finish(message_id, attempts + 1, str(e), permanent=True)
+            except smtplib.SMTPResponseException as e:
+                # 5xx replies are permanent failures, retrying will not help
+                self._finish(message_id, attempts + 1, str(e), permanent=e.smtp_code >= 500)
+            except Exception as e:
+                self._finish(message_id, attempts + 1, str(e))
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def start(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+                self._worker.start()
+
+    def counts(self):
+        with self._lock:
+            rows = dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            sent_last_minute = self._db.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = 'sent' AND sent_at >= ?", (time.time() - 60,)
+            ).fetchone()[0]
+        counts = {status: rows.get(status, 0) for status in STATUSES}
+        counts["sent_last_minute"] = sent_last_minute
+        return counts
+
+    def recent(self, limit=20):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, recipient, subject, status, attempts, last_error, created_at FROM outbox ORDER BY id DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {
+                "id": row[0],
+                "recipient": row[1],
+                "subject": row[2],
+                "status": row[3],
+                "attempts": row[4],
+                "last_error": row[5] or "",
+                "queued": time.strftime("%Y-%m-%d %H:%M", time.localtime(row[6])),
+            }
+            for row in rows
+        ]
+
+    def retry_dead(self):
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = 'queued', attempts = 0, next_attempt_at = ? WHERE status = 'dead'", (time.time(),)
+            )
+            self._db.commit()
+        self._wakeup.set()
+
+
+outbox = Outbox()
@@ -0,0 +1,331 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from content_extractor import EXTRACT_TOKEN_BUDGET
+from email_crew import analyze, choose_strategy, write, finalize, finalize_locally
+from email_schema import email_columns
+from metrics import stage_metrics
+from resources import shared_scrape_tool
+from run_checkpoints import run_checkpoints, target_run_id
+from scrape_cache import fetch_content, normalize_url
+from service_matcher import DEFAULT_MIN_CONFIDENCE
+from stage_cache import llm_inputs
+
+PIPELINE_STAGES = ["fetch", "analyze", "strategize", "write", "finalize"]
+DEFAULT_STAGE_LIMITS = {"fetch": 8, "analyze": 4, "strategize": 4, "write": 4, "finalize": 4}
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+
+class CampaignPipeline:
+    """Runs campaign targets through fetch -> analyze -> strategize -> write -> finalize.
+
+    Every stage has its own queue and worker limit, so pages for upcoming URLs are
+    fetched while earlier URLs are still in the LLM stages.
+    """
+
+    def __init__(self, llm, limits=None, stage_llms=None, email_tone="Professional", language="English",
+                 email_length="Medium", selected_template="Professional", strategy_mode="llm",
+                 min_confidence=DEFAULT_MIN_CONFIDENCE, token_budget=None, finalizer_mode="llm", crawl_pages=0,
+                 cache=None):
+        self.llm = llm
+        self.limits = {**DEFAULT_STAGE_LIMITS, **(limits or {})}
+        self.stage_llms = stage_llms or {}
+        self.options = {
+            "email_tone": email_tone,
+            "language": language,
+            "email_length": email_length,
+            "selected_template": selected_template,
+        }
+        self.strategy_mode = strategy_mode
+        self.min_confidence = min_confidence
+        self.token_budget = token_budget
+        self.crawl_pages = crawl_pages
+        self.finalizer_mode = finalizer_mode
+        # The stage cache behind each target's checkpoint, so unchanged stages are reused across runs
+        self.cache = cache
+        self.stats = {stage: StageStats(self.limits[stage]) for stage in PIPELINE_STAGES}
+        self._queues = {}
+        self._closed = set()
+        self._started = None
+        self._scrape_headers = None
+
+    # Stage bodies run in worker threads; each takes and returns the item dict
+
+    def _fetch(self, item):
+        # Worked out here rather than in the feeder, so a URL too malformed to normalize fails its own row
+        item["checkpoint"] = run_checkpoints.run(target_run_id(item), self.cache)
+        # A failed prefetch is not fatal, the researcher falls back to scraping itself
+        if self._scrape_headers is None:
+            from scrape_cache import CachedScrapeWebsiteTool
+            self._scrape_headers = CachedScrapeWebsiteTool().headers
+        try:
+            text, report = fetch_content(item["url"], headers=self._scrape_headers, token_budget=self.token_budget,
+                                         crawl_pages=self.crawl_pages)
+            item["page_text"] = text.strip() or None
+            item["tokens_saved"] = report["tokens_saved"]
+        except Exception as e:
+            item["page_text"] = None
+            item["fetch_error"] = str(e)
+        return item
+
+    def _analyze(self, item):
+        # Each LLM stage is checkpointed under the target's run id, so rerunning a failed target resumes it
+        llm = self.stage_llms.get("analyze", self.llm)
+        item["outputs"]["analyze"] = item["checkpoint"].memoize(
+            "analyze",
+            {"url": normalize_url(item["url"]), "llm": llm_inputs(llm), "page_text": item.get("page_text")},
+            # Without a prefetched page the researcher scrapes with the same budget and crawl the prefetch used
+            lambda: analyze(llm, item["url"], page_text=item.get("page_text"),
+                            scrape_tool=shared_scrape_tool(self.token_budget or EXTRACT_TOKEN_BUDGET, self.crawl_pages))
+        )
+        return item
+
+    def _strategize(self, item):
+        outputs = item["outputs"]
+        llm = self.stage_llms.get("strategize", self.llm)
+        outputs["strategize"], outputs["match"], outputs["strategy_source"] = item["checkpoint"].memoize(
+            "strategize",
+            {"analysis": outputs["analyze"], "llm": llm_inputs(llm), "strategy_mode": self.strategy_mode,
+             "min_confidence": self.min_confidence},
+            lambda: choose_strategy(llm, outputs["analyze"], self.strategy_mode, self.min_confidence)
+        )
+        return item
+
+    def _write(self, item):
+        outputs = item["outputs"]
+        llm = self.stage_llms.get("write", self.llm)
+        include_subject = self.finalizer_mode == "local"
+        outputs["write"] = item["checkpoint"].memoize(
+            "write",
+            {"analysis": outputs["analyze"], "strategy": outputs["strategize"], "llm": llm_inputs(llm),
+             "recipient_name": item["recipient_name"], "include_subject": include_subject, **self.options},
+            lambda: write(
+                llm, outputs["analyze"], outputs["strategize"],
+                recipient_name=item["recipient_name"], include_subject=include_subject, **self.options
+            )
+        )
+        return item
+
+    def _finalize(self, item):
+        if self.finalizer_mode == "local":
+            item["outputs"]["finalize"] = finalize_locally(
+                item["outputs"]["write"], item["recipient_name"], self.options["email_tone"], self.options["language"]
+            )
+            return item
+        llm = self.stage_llms.get("finalize", self.llm)
+        item["outputs"]["finalize"] = item["checkpoint"].memoize(
+            "finalize",
+            {"draft": item["outputs"]["write"], "llm": llm_inputs(llm), "email_tone": self.options["email_tone"],
+             "language": self.options["language"]},
+            lambda: finalize(llm, item["outputs"]["write"], email_tone=self.options["email_tone"],
+                             language=self.options["language"])
+        )
+        return item
+
+    def occupancy(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        snapshot = []
+        for stage in PIPELINE_STAGES:
+            stats = self.stats[stage]
+            stage_queue = self._queues.get(stage)
+            queued = stage_queue.qsize() if stage_queue else 0
+            if stage in self._closed:
+                # Do not count the shutdown marker still sitting in a closed queue
+                queued = max(0, queued - 1)
+            # Utilization is busy worker time over available worker time; the
+            # stage closest to 100% is the bottleneck
+            capacity = elapsed * stats.limit
+            snapshot.append({
+                "stage": stage,
+                "limit": stats.limit,
+                "in_flight": stats.in_flight,
+                "queued": queued,
+                "completed": stats.completed,
+                "failed": stats.failed,
+                "utilization": round(stats.busy_seconds / capacity, 2) if capacity else 0.0,
+            })
+        return snapshot
+
+    def bottleneck(self):
+        busiest = max(self.occupancy(), key=lambda row: (row["utilization"], row["queued"]))
+        return busiest["stage"] if busiest["utilization"] else None
+
+    def _measured(self, handler, item):
+        # Same per-stage records run_email_pipeline returns, gathered stage by stage
+        with stage_metrics.collect() as records:
+            try:
+                return handler(item)
+            finally:
+                item["outputs"].setdefault("metrics", {}).update(records)
+
+    async def _worker(self, stage, handler, inbox, outbox, results):
+        stats = self.stats[stage]
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                await inbox.put(_DONE)
+                return
+            stats.in_flight += 1
+            started = time.perf_counter()
+            try:
+                item = await asyncio.to_thread(self._measured, handler, item)
+                stats.completed += 1
+                await outbox.put(item)
+            except Exception as e:
+                stats.failed += 1
+                item["error"] = f"{stage}: {e}"
+                await results.put(item)
+            finally:
+                stats.in_flight -= 1
+                stats.busy_seconds += time.perf_counter() - started
+
+    async def _run(self, targets, emit):
+        handlers = {
+            "fetch": self._fetch,
+            "analyze": self._analyze,
+            "strategize": self._strategize,
+            "write": self._write,
+            "finalize": self._finalize,
+        }
+        # Bounded queues give backpressure: the fetcher only runs a few pages ahead of analysis
+        self._closed = set()
+        self._queues = {stage: asyncio.Queue(maxsize=self.limits[stage] * 2) for stage in PIPELINE_STAGES}
+        results = asyncio.Queue()
+
+        workers = []
+        for i, stage in enumerate(PIPELINE_STAGES):
+            inbox = self._queues[stage]
+            outbox = self._queues[PIPELINE_STAGES[i + 1]] if i + 1 < len(PIPELINE_STAGES) else results
+            workers.append([
+                asyncio.create_task(self._worker(stage, handlers[stage], inbox, outbox, results))
+                for _ in range(self.limits[stage])
+            ])
+
+        async def feed():
+            try:
+                for target in targets:
+                    await self._queues["fetch"].put({
+                        "url": target["url"],
+                        "recipient_name": target.get("recipient_name", ""),
+                        "recipient_email": target.get("recipient_email", ""),
+                        "run_id": target.get("run_id"),
+                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                        "started": time.perf_counter(),
+                        "outputs": {},
+                    })
+            finally:
+                # Without the marker the stages never shut down and run() would wait forever
+                await self._queues["fetch"].put(_DONE)
+                self._closed.add("fetch")
+
+        async def drain():
+            # Each stage shuts down once its upstream stage has finished
+            for i, stage in enumerate(PIPELINE_STAGES):
+                await asyncio.gather(*workers[i])
+                if i + 1 < len(PIPELINE_STAGES):
+                    await self._queues[PIPELINE_STAGES[i + 1]].put(_DONE)
+                    self._closed.add(PIPELINE_STAGES[i + 1])
+            await results.put(_DONE)
+
+        feeder = asyncio.create_task(feed())
+        drainer = asyncio.create_task(drain())
+        tasks = [feeder, drainer, *(task for stage_workers in workers for task in stage_workers)]
+        try:
+            while True:
+                item = await results.get()
+                if item is _DONE:
+                    break
+                if not item.get("error"):
+                    item["checkpoint"].discard()
+                emit(_to_row(item))
+            await asyncio.gather(feeder, drainer)
+        finally:
+            # Only still running when the run was cancelled; no stage picks up another target
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self, targets, poll_interval=None):
+        """Yields one result row per target as it leaves the pipeline.
+
+        With poll_interval set, None is yielded whenever that many seconds pass
+        without a result so callers can refresh occupancy in the meantime.
+        """
+        rows = queue.Queue()
+        self._started = time.perf_counter()
+        loop = asyncio.new_event_loop()
+        # Every stage worker may be inside a blocking call at the same time
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=sum(self.limits.values())))
+        main = loop.create_task(self._run(targets, rows.put))
+
+        def run_loop():
+            try:
+                loop.run_until_complete(main)
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                rows.put(e)
+            finally:
+                loop.run_until_complete(loop.shutdown_default_executor())
+                loop.close()
+                rows.put(_DONE)
+
+        thread = threading.Thread(target=run_loop, name="campaign-pipeline", daemon=True)
+        thread.start()
+        try:
+            while True:
+                try:
+                    row = rows.get(timeout=poll_interval)
+                except queue.Empty:
+                    yield None
+                    continue
+                if row is _DONE:
+                    break
+                if isinstance(row, Exception):
+                    raise row
+                yield row
+        except BaseException:
+            # Abandoned (GeneratorExit when a Streamlit rerun drops the generator): cancel the stages
+            # instead of researching and writing the rest of the campaign for nobody. Stage calls
+            # already in flight finish, so the join is short
+            try:
+                loop.call_soon_threadsafe(main.cancel)
+            except RuntimeError:
+                # The loop has already finished and closed
+                pass
+            thread.join()
+            raise
+        thread.join()
+
+
+def _to_row(item):
+    outputs = item["outputs"]
+    error = item.get("error", "")
+    email = None if error else outputs.get("finalize")
+    return {
+        "timestamp": item["timestamp"],
+        "url": item["url"],
+        "recipient_name": item["recipient_name"],
+        "recipient_email": item["recipient_email"],
+        "status": "error" if error else "ok",
+        "seconds": round(time.perf_counter() - item["started"], 1),
+        **email_columns(email),
+        "cold_email": email,
+        "error": error,
+        "tokens_saved": item.get("tokens_saved", 0),
+        "outputs": outputs,
+    }
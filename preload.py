@@ -0,0 +1,67 @@
+import importlib
+import queue
+import threading
+import time
+
+# Imported in this order; crewai_tools pulls in crewai, which pulls in litellm
+HEAVY_MODULES = ("litellm", "crewai", "crewai_tools")
+
+
+class Preloader:
+    """Imports the heavy AI libraries on a background thread so the UI can draw first.
+
+    Warm-up jobs queued with warm() run on the same thread once the imports are done.
+    Anything the main thread imports in the meantime simply waits on Python's import lock.
+    """
+
+    def __init__(self, modules=HEAVY_MODULES):
+        self.modules = modules
+        self.timings = {}
+        self.errors = {}
+        self._jobs = queue.Queue()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._started_at = None
+
+    def _run(self):
+        for name in self.modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                self.errors[name] = str(e)
+            self.timings[name] = round(time.perf_counter() - started, 3)
+        self.timings["ready"] = round(time.perf_counter() - self._started_at, 3)
+        self._ready.set()
+
+        while True:
+            fn, args, kwargs = self._jobs.get()
+            started = time.perf_counter()
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                # A failed warm-up is not fatal: the same call runs again when the user clicks
+                self.errors[getattr(fn, "__name__", repr(fn))] = str(e)
+            self.timings[f"warm:{getattr(fn, '__name__', repr(fn))}"] = round(time.perf_counter() - started, 3)
+
+    def start(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._started_at = time.perf_counter()
+                self._worker = threading.Thread(target=self._run, name="preloader", daemon=True)
+                self._worker.start()
+
+    def warm(self, fn, *args, **kwargs):
+        self.start()
+        self._jobs.put((fn, args, kwargs))
+
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        self.start()
+        return self._ready.wait(timeout)
+
+
+preloader = Preloader()
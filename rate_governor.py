@@ -0,0 +1,275 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+
+# Requests and tokens per minute for each provider, or "provider/model" for a single model.
+# Unknown providers are not paced, but still get the 429 retries and adaptive concurrency.
+DEFAULT_RATE_LIMITS = {
+    "groq": {"rpm": 30, "tpm": 6000},
+    "gemini": {"rpm": 10, "tpm": 250000},
+}
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.getenv("RATE_LIMITS", "{}"))}
+RATE_MAX_CONCURRENCY = int(os.getenv("RATE_MAX_CONCURRENCY", "16"))
+RATE_MAX_RETRIES = int(os.getenv("RATE_MAX_RETRIES", "6"))
+RATE_BASE_DELAY = float(os.getenv("RATE_BASE_DELAY", "1.0"))
+RATE_MAX_DELAY = float(os.getenv("RATE_MAX_DELAY", "60"))
+# Completion tokens reserved up front when the call sets no max_tokens
+RATE_COMPLETION_ESTIMATE = int(os.getenv("RATE_COMPLETION_ESTIMATE", "512"))
+
+# litellm passes the provider's headers through both bare and prefixed
+HEADER_PREFIXES = ("", "llm_provider-")
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def split_model(model):
+    provider, _, name = model.partition("/")
+    return (provider, name) if name else ("", model)
+
+
+def parse_duration(value):
+    """Seconds in a rate limit header: "12", "6s", "1m30.5s" or "200ms"."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def _header(headers, name):
+    for prefix in HEADER_PREFIXES:
+        value = headers.get(f"{prefix}{name}")
+        if value is not None:
+            return value
+    return None
+
+
+def is_rate_limited(error):
+    # crewai wraps streaming errors in a plain Exception, so the cause chain is checked too
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError":
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def retry_after(error):
+    while error is not None:
+        response = getattr(error, "response", None)
+        headers = getattr(error, "headers", None) or getattr(response, "headers", None) or {}
+        seconds = parse_duration(_header(headers, "retry-after"))
+        if seconds is not None:
+            return seconds
+        error = error.__cause__ or error.__context__
+    return None
+
+
+class TokenBucket:
+    """Refills continuously up to `per_minute`; take() blocks until there is enough."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.available = min(self.per_minute, self.available + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    def take(self, amount=1):
+        # More than a minute's worth at once would never fit, so it waits for a full bucket instead
+        amount = min(amount, self.per_minute)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.available >= amount:
+                    self.available -= amount
+                    return waited
+                delay = (amount - self.available) * 60.0 / self.per_minute
+            time.sleep(delay)
+            waited += delay
+
+    def sync(self, remaining, reset=None):
+        # The provider's own count wins when it is lower than ours
+        with self._lock:
+            self._refill(time.monotonic())
+            if remaining < self.available:
+                self.available = float(remaining)
+            if remaining <= 0 and reset:
+                # Empty until the provider's window resets
+                self.available = -reset * self.per_minute / 60.0
+
+
+class ModelGovernor:
+    """Pacing and adaptive concurrency for one provider/model.
+
+    Concurrency is AIMD: every success raises the limit by 1/limit (about one per
+    round of calls), every 429 halves it.
+    """
+
+    def __init__(self, key, rpm=None, tpm=None, max_concurrency=RATE_MAX_CONCURRENCY):
+        self.key = key
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.stats = {"calls": 0, "throttled": 0, "retries": 0, "failed": 0, "waited": 0.0}
+        self._slots = threading.Condition()
+
+    def acquire(self, tokens):
+        started = time.monotonic()
+        with self._slots:
+            while self.in_flight >= int(self.limit):
+                self._slots.wait()
+            self.in_flight += 1
+        try:
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(tokens)
+        except BaseException:
+            self.release()
+            raise
+        self.stats["waited"] += time.monotonic() - started
+
+    def release(self):
+        with self._slots:
+            self.in_flight -= 1
+            self._slots.notify()
+
+    def on_success(self):
+        with self._slots:
+            self.stats["calls"] += 1
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._slots.notify_all()
+
+    def on_throttled(self):
+        with self._slots:
+            self.stats["throttled"] += 1
+            self.limit = max(1.0, self.limit / 2)
+
+    def on_headers(self, headers):
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            remaining = _header(headers, f"x-ratelimit-remaining-{kind}")
+            if bucket is None or remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            bucket.sync(remaining, parse_duration(_header(headers, f"x-ratelimit-reset-{kind}")))
+
+
+class RateGovernor:
+    """One ModelGovernor per provider/model, shared by every session and thread in the process.
+
+    Every LLM call made through llm_cache.make_llm goes through call(), which waits for
+    a concurrency slot and the request/token budget, and retries 429s with jittered
+    exponential backoff instead of failing the crew.
+    """
+
+    def __init__(self, limits=RATE_LIMITS, max_retries=RATE_MAX_RETRIES, base_delay=RATE_BASE_DELAY,
+                 max_delay=RATE_MAX_DELAY):
+        self.limits = limits
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._models = {}
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def split(self, parts):
+        """Keeps 1/parts of every rpm and tpm budget, for one of `parts` processes sharing the quota."""
+        with self._lock:
+            self.limits = {
+                key: {name: value / parts for name, value in limits.items()} for key, limits in self.limits.items()
+            }
+            # Governors made before the split still pace at the full budget
+            self._models = {}
+
+    def governor(self, model):
+        provider, name = split_model(model)
+        key = f"{provider}/{name}" if provider else name
+        with self._lock:
+            governor = self._models.get(key)
+            if governor is None:
+                limits = self.limits.get(key) or self.limits.get(provider) or {}
+                governor = self._models[key] = ModelGovernor(key, limits.get("rpm"), limits.get("tpm"))
+            return governor
+
+    def _register(self):
+        # litellm is imported lazily, so the header callback is attached on first use
+        with self._lock:
+            if self._registered:
+                return
+            import litellm
+            litellm.success_callback.append(self._on_success)
+            self._registered = True
+
+    def _on_success(self, kwargs, response, start_time, end_time):
+        headers = (getattr(response, "_hidden_params", None) or {}).get("additional_headers") or {}
+        if not headers:
+            return
+        model = kwargs.get("model") or ""
+        provider = kwargs.get("custom_llm_provider") or (kwargs.get("litellm_params") or {}).get("custom_llm_provider")
+        if provider and not model.startswith(f"{provider}/"):
+            model = f"{provider}/{model}"
+        self.governor(model).on_headers(headers)
+
+    def call(self, model, send, tokens=0):
+        """Runs send() for `model` within its limits; tokens is the expected prompt + completion size."""
+        self._register()
+        governor = self.governor(model)
+        attempt = 0
+        while True:
+            governor.acquire(tokens)
+            try:
+                result = send()
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                governor.on_throttled()
+                if attempt >= self.max_retries:
+                    governor.stats["failed"] += 1
+                    raise
+                # Full jitter, so sessions that were throttled together do not retry together
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                delay = max(delay, retry_after(e) or 0.0)
+                attempt += 1
+                governor.stats["retries"] += 1
+            else:
+                governor.on_success()
+                return result
+            finally:
+                governor.release()
+            time.sleep(delay)
+
+    def snapshot(self):
+        with self._lock:
+            governors = list(self._models.values())
+        return [
+            {
+                "model": governor.key,
+                "concurrency": round(governor.limit, 1),
+                "in_flight": governor.in_flight,
+                **{key: round(value, 1) if isinstance(value, float) else value for key, value in governor.stats.items()},
+            }
+            for governor in governors
+        ]
+
+
+rate_governor = RateGovernor()
@@ -1,14 +1,14 @@
-import time
-from crewai import Agent , Task , Crew , LLM
+from crewai import Agent , Task , Crew
 from crewai_tools import SerperDevTool
 from dotenv import load_dotenv 
+from llm_cache import make_llm
 import os
 
 load_dotenv()
 search_tool = SerperDevTool()
-time.sleep(16)
 
-llm = LLM(
+llm = make_llm(
+    "resercher_agent",
     model = "gemini/gemini-2.5-flash",
     api_key = os.getenv("GEMINI_API_KEY")
 )
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+
+from content_extractor import EXTRACT_TOKEN_BUDGET
+from llm_cache import make_llm
+
+# Module state outlives Streamlit reruns and is shared by every session in the process
+RESOURCE_MAX_LLMS = int(os.getenv("RESOURCE_MAX_LLMS", "32"))
+RESOURCE_MAX_AGENT_KINDS = int(os.getenv("RESOURCE_MAX_AGENT_KINDS", "64"))
+RESOURCE_MAX_IDLE_AGENTS = int(os.getenv("RESOURCE_MAX_IDLE_AGENTS", "8"))
+
+
+def api_key_hash(api_key):
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+
+
+def _freeze(value):
+    # Plain values key by value; objects such as LLMs and tools key by identity
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    return ("id", id(value))
+
+
+class LLMRegistry:
+    def __init__(self, max_entries=RESOURCE_MAX_LLMS):
+        self.max_entries = max_entries
+        self.stats = {"built": 0, "reused": 0}
+        self._llms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, app, model, api_key=None, **kwargs):
+        key = (app, model, api_key_hash(api_key), tuple(sorted((k, _freeze(v)) for k, v in kwargs.items())))
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is not None:
+                self._llms.move_to_end(key)
+                self.stats["reused"] += 1
+                return llm
+        llm = make_llm(app, model, api_key=api_key, **kwargs)
+        with self._lock:
+            llm = self._llms.setdefault(key, llm)
+            self.stats["built"] += 1
+            while len(self._llms) > self.max_entries:
+                self._llms.popitem(last=False)
+        return llm
+
+
+class AgentPool:
+    """Idle agents keyed by the builder that made them and its arguments.
+
+    An agent is mutated while its crew runs, so each checkout gets exclusive use
+    and concurrent runs simply build more agents of the same kind.
+    """
+
+    def __init__(self, max_kinds=RESOURCE_MAX_AGENT_KINDS, max_idle=RESOURCE_MAX_IDLE_AGENTS):
+        self.max_kinds = max_kinds
+        self.max_idle = max_idle
+        self.stats = {"built": 0, "reused": 0}
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, builder, args, kwargs):
+        # The builder's code is part of the key so editing a script does not hand out stale agents
+        code = builder.__code__
+        return (
+            builder.__module__, builder.__qualname__, code.co_code, code.co_consts,
+            tuple(_freeze(arg) for arg in args),
+            tuple(sorted((k, _freeze(v)) for k, v in kwargs.items())),
+        )
+
+    @contextmanager
+    def checkout(self, builder, *args, **kwargs):
+        key = self._key(builder, args, kwargs)
+        with self._lock:
+            idle = self._idle.get(key)
+            agent = idle.pop() if idle else None
+            if agent is not None:
+                self.stats["reused"] += 1
+        if agent is None:
+            agent = builder(*args, **kwargs)
+            with self._lock:
+                self.stats["built"] += 1
+
+        # An agent whose run failed may be half way through something, so it is dropped
+        yield agent
+
+        agent._times_executed = 0
+        agent.tools_results = []
+        # Crew only sets step_callback when it is unset, so a per-run callback must not linger
+        agent.step_callback = None
+        if getattr(agent, "agent_executor", None) is not None:
+            agent.agent_executor.step_callback = None
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(idle) < self.max_idle:
+                idle.append(agent)
+            while len(self._idle) > self.max_kinds:
+                self._idle.popitem(last=False)
+
+
+llm_registry = LLMRegistry()
+agent_pool = AgentPool()
+
+
+def shared_llm(app, model, api_key=None, **kwargs):
+    # Same arguments, same client: reruns and other sessions get the one already built
+    return llm_registry.get(app, model, api_key=api_key, **kwargs)
+
+
+@lru_cache(maxsize=16)
+def shared_scrape_tool(token_budget=EXTRACT_TOKEN_BUDGET, crawl_pages=0):
+    # The tool keeps no per-call state, so one instance per budget and crawl size serves every agent
+    from scrape_cache import CachedScrapeWebsiteTool
+    return CachedScrapeWebsiteTool(token_budget=token_budget, crawl_pages=crawl_pages)
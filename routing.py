@@ -0,0 +1,74 @@
+import os
+
+from email_crew import STAGES
+from metrics import stage_metrics
+from resources import shared_llm
+
+ROUTING_SMALL_MODEL = os.getenv("ROUTING_SMALL_MODEL", "groq/llama-3.1-8b-instant")
+
+# Research and copywriting get the model picked in the sidebar (model None); picking a
+# service and formatting the final email are easy enough for the small, fast model
+DEFAULT_ROUTES = {
+    "analyze": {"model": None, "max_tokens": 1024},
+    "strategize": {"model": ROUTING_SMALL_MODEL, "max_tokens": 512},
+    "write": {"model": None, "max_tokens": 1024},
+    "finalize": {"model": ROUTING_SMALL_MODEL, "max_tokens": 1024},
+}
+
+
+def resolve_routes(main_model, overrides=None):
+    """The model and max_tokens every stage runs with.
+
+    overrides maps a stage to the keys it changes; a model of None means the main model.
+    """
+    overrides = overrides or {}
+    routes = {}
+    for stage in STAGES:
+        route = {**DEFAULT_ROUTES[stage], **overrides.get(stage, {})}
+        routes[stage] = {"model": route["model"] or main_model, "max_tokens": route["max_tokens"]}
+    return routes
+
+
+def routed_llms(app, routes, stream_stages=(), **llm_options):
+    # llm_options is everything else the LLM needs (api_key, temperature, ...);
+    # shared_llm hands back the same client to every stage with the same route
+    return {
+        stage: shared_llm(
+            app,
+            model=route["model"],
+            max_tokens=route["max_tokens"],
+            **({"stream": True} if stage in stream_stages else {}),
+            **llm_options
+        )
+        for stage, route in routes.items()
+    }
+
+
+def routing_savings(routes, baseline_model):
+    """How much faster and cheaper each rerouted stage is than on the baseline model.
+
+    Compares the recent runs of the stage on both models, so a stage only shows up
+    once it has run on each of them at least once.
+    """
+    observed = stage_metrics.by_model()
+    savings = {}
+    for stage, route in routes.items():
+        if route["model"] == baseline_model:
+            continue
+        routed = observed.get(stage, {}).get(route["model"])
+        baseline = observed.get(stage, {}).get(baseline_model)
+        if not routed or not baseline:
+            continue
+        routed_tokens = routed["prompt_tokens"] + routed["completion_tokens"]
+        baseline_tokens = baseline["prompt_tokens"] + baseline["completion_tokens"]
+        savings[stage] = {
+            "model": route["model"],
+            "baseline_model": baseline_model,
+            "p50": routed["p50"],
+            "baseline_p50": baseline["p50"],
+            "seconds_saved": baseline["p50"] - routed["p50"],
+            "tokens": round(routed_tokens),
+            "baseline_tokens": round(baseline_tokens),
+            "tokens_saved": round(baseline_tokens - routed_tokens),
+        }
+    return savings
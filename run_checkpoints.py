@@ -0,0 +1,124 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import stage_metrics
+from stage_cache import decode_output, encode_output, stage_key
+
+RUN_CHECKPOINTS_PATH = os.getenv("RUN_CHECKPOINTS_PATH", ".cache/run_checkpoints.sqlite3")
+# A failed run can be resumed for about as long as its scraped page stays fresh
+RUN_CHECKPOINT_TTL = int(os.getenv("RUN_CHECKPOINT_TTL", str(24 * 60 * 60)))
+
+
+def target_run_id(target):
+    """The run id of a campaign target, stable across reruns of the same list."""
+    from scrape_cache import normalize_url
+    return target.get("run_id") or "|".join((
+        normalize_url(target["url"]),
+        (target.get("recipient_email") or "").lower(),
+        (target.get("recipient_name") or "").strip().lower(),
+    ))
+
+
+class Checkpoint:
+    """The checkpoints of one run, usable wherever email_crew takes a cache.
+
+    A stage whose output was saved under this run with the same inputs is restored
+    instead of run again, so a retry resumes from the first stage that did not
+    finish. Everything else goes through `cache` (a StageCache) when one is given.
+    """
+
+    def __init__(self, store, run_id, cache=None):
+        self.store = store
+        self.run_id = run_id
+        self.cache = cache
+
+    def memoize(self, stage, inputs, compute):
+        key = stage_key(stage, inputs)
+        started = time.perf_counter()
+        saved = self.store.load(self.run_id, stage, key)
+        if saved is not None:
+            output, seconds = saved
+            stage_metrics.record(stage, time.perf_counter() - started, source="checkpoint", seconds_saved=round(seconds, 4))
+            return output
+
+        started = time.perf_counter()
+        output = self.cache.memoize(stage, inputs, compute) if self.cache is not None else compute()
+        self.store.save(self.run_id, stage, key, output, time.perf_counter() - started)
+        return output
+
+    def completed(self):
+        return self.store.completed(self.run_id)
+
+    def discard(self):
+        self.store.discard(self.run_id)
+
+
+class RunCheckpoints:
+    """Stage outputs saved under a run id as each stage finishes."""
+
+    def __init__(self, path=RUN_CHECKPOINTS_PATH, ttl=RUN_CHECKPOINT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                key TEXT NOT NULL,
+                output TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (run_id, stage)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS checkpoints_created_at ON checkpoints (created_at)")
+        self._db.commit()
+
+    def run(self, run_id, cache=None):
+        return Checkpoint(self, run_id, cache)
+
+    def load(self, run_id, stage, key):
+        """Returns (output, seconds the stage took) if the stage finished with these inputs, else None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT output, seconds FROM checkpoints WHERE run_id = ? AND stage = ? AND key = ? AND created_at > ?",
+                (run_id, stage, key, time.time() - self.ttl)
+            ).fetchone()
+        return (decode_output(json.loads(row[0])), row[1]) if row else None
+
+    def save(self, run_id, stage, key, output, seconds):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, stage, key, json.dumps(encode_output(output), ensure_ascii=False), seconds, now)
+            )
+            self._db.execute("DELETE FROM checkpoints WHERE created_at <= ?", (now - self.ttl,))
+            self._db.commit()
+
+    def completed(self, run_id):
+        """The stages saved for a run, in the order they finished."""
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT stage FROM checkpoints WHERE run_id = ? AND created_at > ? ORDER BY created_at",
+                (run_id, time.time() - self.ttl)
+            )]
+
+    def discard(self, run_id):
+        # A run that finished needs no checkpoints; the next run for the same target starts fresh
+        with self._lock:
+            self._db.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+            self._db.commit()
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(DISTINCT run_id) FROM checkpoints").fetchone()[0]
+
+
+run_checkpoints = RunCheckpoints()
@@ -1,6 +1,7 @@
-from crewai import Agent, Task, Crew, LLM
+from crewai import Agent, Task, Crew
 from crewai_tools import SerperDevTool
 from dotenv import load_dotenv
+from llm_cache import make_llm
 import os
 
 load_dotenv()
@@ -13,7 +14,8 @@ user_topic = input("Enter the topic you want to study (math, science, history):
 
 search_tool = SerperDevTool()
 
-llm = LLM(
+llm = make_llm(
+    "school_teacher",
     model="gemini/gemini-2.5-flash",
     api_key=os.getenv("GEMINI_API_KEY")
 )
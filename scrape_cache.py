@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from functools import lru_cache
+
+import requests
+
+from content_extractor import content_extractor, EXTRACT_TOKEN_BUDGET
+
+CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", ".cache/scrape_cache.sqlite3")
+CACHE_TTL = int(os.getenv("SCRAPE_CACHE_TTL", str(24 * 60 * 60)))
+CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "ref", "_hsenc", "_hsmi"}
+
+
+def normalize_url(url):
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class ScrapeCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evictions": 0, "extract_hits": 0}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Older caches stored extracted text, which cannot be re-extracted, so start them over
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(pages)").fetchall()]
+        if "text" in columns:
+            self._db.execute("DROP TABLE pages")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                html TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+        # Extracted text per token budget, so a cache hit does not parse the HTML again
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS extracts (
+                url TEXT NOT NULL,
+                budget INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                text TEXT NOT NULL,
+                report TEXT NOT NULL,
+                PRIMARY KEY (url, budget)
+            )
+        """)
+        self._db.commit()
+
+    def _load(self, key):
+        with self._lock:
+            return self._db.execute(
+                "SELECT html, etag, last_modified, fetched_at FROM pages WHERE url = ?", (key,)
+            ).fetchone()
+
+    def _touch(self, key, fetched=False):
+        now = time.time()
+        with self._lock:
+            if fetched:
+                self._db.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, key))
+            else:
+                self._db.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (now, key))
+            self._db.commit()
+
+    def _store(self, key, html, etag, last_modified):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, html, etag, last_modified, len(html.encode("utf-8")), now, now)
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # Drop least recently used pages until the cache fits in max_bytes
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT url, size FROM pages ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM pages WHERE url = ?", (key,))
+            self._db.execute("DELETE FROM extracts WHERE url = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def get(self, url):
+        row = self._load(normalize_url(url))
+        if row and time.time() - row[3] < self.ttl:
+            return row[0]
+        return None
+
+    def fetch(self, url, headers=None, cookies=None, timeout=15, session=None):
+        # Returns the page HTML; extraction happens afterwards so budgets can change without refetching.
+        # session is a requests.Session to reuse its pooled keep-alive connections.
+        key = normalize_url(url)
+        row = self._load(key)
+        if row and time.time() - row[3] < self.ttl:
+            self.stats["hits"] += 1
+            self._touch(key)
+            return row[0]
+
+        request_headers = dict(headers or {})
+        if row and row[1]:
+            request_headers["If-None-Match"] = row[1]
+        if row and row[2]:
+            request_headers["If-Modified-Since"] = row[2]
+
+        page = (session or requests).get(url, timeout=timeout, headers=request_headers, cookies=cookies or {})
+        if row and page.status_code == 304:
+            self.stats["revalidated"] += 1
+            self._touch(key, fetched=True)
+            return row[0]
+
+        self.stats["misses"] += 1
+        page.encoding = page.apparent_encoding
+        # Error pages are handed to the agent as-is but never cached
+        if page.ok:
+            self._store(key, page.text, page.headers.get("ETag"), page.headers.get("Last-Modified"))
+        return page.text
+
+    def extract(self, url, html, token_budget=None):
+        """content_extractor.extract, remembered per (url, budget) for as long as the page's HTML is unchanged."""
+        key = normalize_url(url)
+        budget = token_budget or content_extractor.token_budget
+        digest = hashlib.blake2b(html.encode("utf-8"), digest_size=16).hexdigest()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT text, report FROM extracts WHERE url = ? AND budget = ? AND digest = ?", (key, budget, digest)
+            ).fetchone()
+        if row:
+            self.stats["extract_hits"] += 1
+            report = json.loads(row[1])
+            content_extractor.record(report)
+            return row[0], report
+
+        text, report = content_extractor.extract(html, url=key, token_budget=budget)
+        with self._lock:
+            # Only for pages the cache holds, so eviction takes their extracts along; error pages are not kept
+            self._db.execute(
+                "INSERT OR REPLACE INTO extracts SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM pages WHERE url = ?)",
+                (key, budget, digest, text, json.dumps(report, ensure_ascii=False), key)
+            )
+            self._db.commit()
+        return text, report
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM pages")
+            self._db.execute("DELETE FROM extracts")
+            self._db.commit()
+
+
+scrape_cache = ScrapeCache()
+
+
+def fetch_content(url, headers=None, cookies=None, token_budget=None, crawl_pages=0):
+    # Cached fetch followed by boilerplate stripping and token budgeting.
+    # With crawl_pages, up to that many internal pages (about, pricing, ...) are read as well.
+    if crawl_pages:
+        from site_crawler import site_crawler
+        return site_crawler.crawl(url, headers=headers, cookies=cookies, token_budget=token_budget, max_pages=crawl_pages)
+    html = scrape_cache.fetch(url, headers=headers, cookies=cookies)
+    return scrape_cache.extract(url, html, token_budget=token_budget)
+
+
+@lru_cache(maxsize=None)
+def _scrape_tool_class():
+    # crewai_tools is slow to import, so the tool class is only defined on first use
+    from crewai_tools import ScrapeWebsiteTool
+
+    class CachedScrapeWebsiteTool(ScrapeWebsiteTool):
+        token_budget: int = EXTRACT_TOKEN_BUDGET
+        crawl_pages: int = 0
+
+        def _run(self, **kwargs):
+            website_url = kwargs.get("website_url", self.website_url)
+            if website_url is None:
+                raise ValueError("Website URL must be provided.")
+
+            text, _ = fetch_content(website_url, headers=self.headers, cookies=self.cookies, token_budget=self.token_budget,
+                                    crawl_pages=self.crawl_pages)
+            return "The following text is scraped website content:\n\n" + text
+
+    return CachedScrapeWebsiteTool
+
+
+def __getattr__(name):
+    if name == "CachedScrapeWebsiteTool":
+        return _scrape_tool_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
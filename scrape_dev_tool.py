@@ -1,6 +1,7 @@
-from crewai import Agent , Task , Crew , LLM
+from crewai import Agent , Task , Crew
 from crewai_tools import ScraperDevTool
 from dotenv import load_dotenv 
+from llm_cache import make_llm
 import os
 
 chatbot = input("enter the topic you want to study about:")
@@ -10,7 +11,8 @@ search_tool = ScraperDevTool()
 ScraperDevTool
 
 
-llm = LLM(
+llm = make_llm(
+    "scrape_dev_tool",
     model = "gemini/gemini-2.5-flash",
     api_key = os.getenv("GEMINI_API_KEY")
 )
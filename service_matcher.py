@@ -0,0 +1,103 @@
+import math
+import re
+from collections import Counter
+
+# Extra signal words for the services in agency_services, matched by name
+SERVICE_KEYWORDS = {
+    "seo": ["traffic", "visitors", "visibility", "search", "google", "ranking", "organic", "seo",
+            "awareness", "reach", "discover", "audience", "content", "blog", "keywords", "unknown", "niche"],
+    "web development": ["outdated", "old", "ugly", "slow", "design", "redesign", "layout", "mobile", "responsive",
+                        "navigation", "ux", "user experience", "loading", "cluttered", "broken", "website",
+                        "modern", "look", "dated", "speed"],
+    "automation": ["manual", "repetitive", "automation", "automate", "workflow", "process", "processes",
+                   "spreadsheet", "paperwork", "data entry", "scheduling", "booking", "support", "tickets",
+                   "operations", "efficiency", "time-consuming", "scale", "agents", "ai", "chatbot"],
+}
+
+STOPWORDS = set("""a an and are as at be best but by for from has have in is it its of on or our that the
+their them they this to was we where which who will with your you can companies company""".split())
+
+DEFAULT_MIN_CONFIDENCE = 0.35
+# How far ahead of the runner-up a service is means little on its own: one generic word such as
+# "website" puts a service far ahead of the rest. Below either of these a match is never trusted.
+MIN_MATCHED_KEYWORDS = 2
+MIN_MATCH_SCORE = 0.25
+
+
+def _stem(token):
+    for suffix in ("ingly", "ing", "edly", "ed", "ly", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[:-len(suffix)]
+    return token
+
+
+def _tokens(text):
+    return [_stem(t) for t in re.findall(r"[a-z][a-z\-]+", text.lower()) if t not in STOPWORDS]
+
+
+def _vector(text):
+    # Bag of words plus bigrams: a cheap local embedding, no model download
+    tokens = _tokens(text)
+    return Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+
+
+def _cosine(a, b):
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    if not dot:
+        return 0.0
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def parse_services(agency_services):
+    catalog = []
+    for line in agency_services.strip().splitlines():
+        match = re.match(r"\s*\d+\.\s*(.+?):\s*(.+)", line)
+        if not match:
+            continue
+        name, description = match.group(1).strip(), match.group(2).strip()
+        keywords = set(re.findall(r"[a-z][a-z\-]+", (name + " " + description).lower())) - STOPWORDS
+        for key, extra in SERVICE_KEYWORDS.items():
+            if key in name.lower():
+                keywords.update(extra)
+        catalog.append({
+            "name": name,
+            "description": description,
+            "keywords": sorted(keywords),
+            "vector": _vector(name + " " + description + " " + " ".join(keywords)),
+        })
+    return catalog
+
+
+def match_service(analysis, catalog):
+    text = " " + " ".join(_tokens(analysis)) + " "
+    analysis_vector = _vector(analysis)
+
+    scored = []
+    for service in catalog:
+        matched = [kw for kw in service["keywords"] if f" {' '.join(_tokens(kw))} " in text]
+        keyword_score = min(1.0, len(matched) / 4)
+        score = 0.6 * keyword_score + 0.4 * _cosine(analysis_vector, service["vector"])
+        scored.append((score, matched, service))
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    score, matched, best = scored[0]
+    runner_up = scored[1][0] if len(scored) > 1 else 0.0
+    confidence = (score - runner_up) / score if score else 0.0
+    if len(matched) < MIN_MATCHED_KEYWORDS or score < MIN_MATCH_SCORE:
+        confidence = 0.0
+    if matched:
+        rationale = f"The analysis mentions {', '.join(matched[:4])}. {best['description']}"
+    else:
+        rationale = best["description"]
+
+    return {
+        "service": best["name"],
+        "score": round(score, 3),
+        "confidence": round(confidence, 3),
+        "matched_keywords": matched,
+        "rationale": rationale,
+    }
+
+
+def format_strategy(match):
+    return f"Selected service: {match['service']}\nReasoning: {match['rationale']}"
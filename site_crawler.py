@@ -0,0 +1,230 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+from bs4 import BeautifulSoup
+
+from content_extractor import count_tokens, truncate_tokens
+from domain_index import normalize_domain
+from scrape_cache import normalize_url, scrape_cache
+
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "4"))
+# Concurrent requests to any one host, so a crawl never hammers a small business's server
+CRAWL_PER_HOST = int(os.getenv("CRAWL_PER_HOST", "2"))
+CRAWL_PAGE_TOKEN_BUDGET = int(os.getenv("CRAWL_PAGE_TOKEN_BUDGET", "300"))
+CRAWL_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT", "10"))
+CRAWL_ROBOTS_AGENT = os.getenv("CRAWL_ROBOTS_AGENT", "ColdEmailResearcher")
+CRAWL_ROBOTS_TTL = int(os.getenv("CRAWL_ROBOTS_TTL", str(60 * 60)))
+CRAWL_SITEMAP_MAX_BYTES = 512 * 1024
+
+# The internal pages worth reading, in the order they are picked; matched against the path and link text
+PAGE_KINDS = [
+    ("about", re.compile(r"\babout|\bcompany\b|\bteam\b|who-we-are|our-story", re.I)),
+    ("pricing", re.compile(r"pricing|\bplans?\b|\bprices?\b", re.I)),
+    ("services", re.compile(r"services|solutions|what-we-do|\bproducts?\b", re.I)),
+    ("careers", re.compile(r"careers|\bjobs\b|hiring|join-us|join the team", re.I)),
+]
+SITEMAP_LOC = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.I)
+SKIPPED_EXTENSIONS = re.compile(r"\.(?:pdf|jpe?g|png|gif|svg|webp|zip|xml|mp4|docx?)$", re.I)
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _lines(text):
+    return [line for line in text.splitlines() if line.strip()]
+
+
+def _line_key(line):
+    return " ".join(line.lower().split())
+
+
+class SiteCrawler:
+    """Reads a handful of high-value internal pages next to a homepage.
+
+    Candidates come from the homepage's links and the sitemap. Pages are fetched
+    concurrently over one pooled keep-alive session, at most CRAWL_PER_HOST at a time
+    per host, and only where robots.txt allows. Lines the homepage or an earlier page
+    already had (headers, footers, CTAs) are dropped, so each extra page only adds what
+    is new on it.
+    """
+
+    def __init__(self, per_host=CRAWL_PER_HOST, timeout=CRAWL_TIMEOUT, max_reports=200):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_reports = max_reports
+        self.stats = {"sites": 0, "pages": 0, "robots_blocked": 0, "lines_deduped": 0}
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=max(per_host, 4) * 4)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts = {}
+        self._robots = OrderedDict()
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def _get(self, url, headers=None):
+        with self._host_slot(url):
+            return self.session.get(url, headers=headers, timeout=self.timeout)
+
+    def robots(self, url, headers=None):
+        """The site's parsed robots.txt, cached per origin for CRAWL_ROBOTS_TTL."""
+        origin = _origin(url)
+        with self._lock:
+            cached = self._robots.get(origin)
+            if cached and time.time() - cached[1] < CRAWL_ROBOTS_TTL:
+                return cached[0]
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = self._get(f"{origin}/robots.txt", headers)
+            # Same reading of status codes as RobotFileParser.read()
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except requests.RequestException:
+            parser.allow_all = True
+        with self._lock:
+            self._robots[origin] = (parser, time.time())
+            while len(self._robots) > 256:
+                self._robots.popitem(last=False)
+        return parser
+
+    def _sitemap_urls(self, url, robots, headers=None):
+        sitemaps = robots.site_maps() or [f"{_origin(url)}/sitemap.xml"]
+        try:
+            response = self._get(sitemaps[0], headers)
+            if not response.ok:
+                return []
+            text = response.text[:CRAWL_SITEMAP_MAX_BYTES]
+            if "<sitemapindex" in text:
+                # One level down: the first sitemap of the index is usually the pages one
+                child = SITEMAP_LOC.search(text)
+                response = self._get(child.group(1), headers) if child else None
+                text = response.text[:CRAWL_SITEMAP_MAX_BYTES] if response is not None and response.ok else ""
+            return SITEMAP_LOC.findall(text)
+        except requests.RequestException:
+            return []
+
+    def candidates(self, url, html, robots, headers=None):
+        """Up to one internal page per kind in PAGE_KINDS, as (kind, url) pairs."""
+        site = normalize_domain(url)
+        home = normalize_url(url)
+        links = [(anchor["href"], anchor.get_text(" ", strip=True))
+                 for anchor in BeautifulSoup(html, "html.parser").find_all("a", href=True)]
+        links += [(loc, "") for loc in self._sitemap_urls(url, robots, headers)]
+
+        best = {}
+        for link, text in links:
+            try:
+                link = urljoin(url, link)
+                parts = urlsplit(link)
+                if parts.scheme not in ("http", "https") or normalize_domain(link) != site:
+                    continue
+                if SKIPPED_EXTENSIONS.search(parts.path) or normalize_url(link) == home:
+                    continue
+            except ValueError:
+                # A malformed href such as "http://[x/about" is one bad link, not a failed crawl
+                continue
+            for kind, pattern in PAGE_KINDS:
+                in_path = bool(pattern.search(parts.path))
+                if not in_path and not pattern.search(text):
+                    continue
+                # A match in the path beats one in the link text; then the shallowest page wins
+                rank = (not in_path, parts.path.count("/"), len(parts.path))
+                if kind not in best or rank < best[kind][0]:
+                    best[kind] = (rank, link.split("#")[0])
+                break
+        return [(kind, best[kind][1]) for kind, _ in PAGE_KINDS if kind in best]
+
+    def _fetch_page(self, kind, url, headers, cookies, robots, budget):
+        if not robots.can_fetch(CRAWL_ROBOTS_AGENT, url):
+            return {"kind": kind, "url": url, "status": "robots", "text": ""}
+        try:
+            with self._host_slot(url):
+                html = scrape_cache.fetch(url, headers=headers, cookies=cookies, timeout=self.timeout, session=self.session)
+        except requests.RequestException as e:
+            return {"kind": kind, "url": url, "status": "error", "error": str(e), "text": ""}
+        # Extracted with room to spare, since shared lines are removed before the page budget applies
+        text, _ = scrape_cache.extract(url, html, token_budget=budget * 3)
+        return {"kind": kind, "url": url, "status": "ok", "text": text}
+
+    def crawl(self, url, headers=None, cookies=None, token_budget=None, max_pages=CRAWL_MAX_PAGES,
+              page_token_budget=CRAWL_PAGE_TOKEN_BUDGET):
+        """The homepage text plus up to max_pages internal pages, and a report like content_extractor's."""
+        html = scrape_cache.fetch(url, headers=headers, cookies=cookies, session=self.session)
+        text, report = scrape_cache.extract(url, html, token_budget=token_budget)
+        robots = self.robots(url, headers)
+        pages = self.candidates(url, html, robots, headers)[:max_pages]
+
+        fetched = []
+        if pages:
+            with ThreadPoolExecutor(max_workers=len(pages), thread_name_prefix="crawl") as pool:
+                fetched = list(pool.map(
+                    lambda page: self._fetch_page(*page, headers, cookies, robots, page_token_budget), pages
+                ))
+
+        seen = {_line_key(line) for line in _lines(text)}
+        sections, deduped = [text], 0
+        for page in fetched:
+            if page["status"] != "ok":
+                continue
+            kept = []
+            for line in _lines(page["text"]):
+                if _line_key(line) in seen:
+                    deduped += 1
+                    continue
+                seen.add(_line_key(line))
+                kept.append(line)
+            # A heading left with nothing under it is not worth its tokens
+            kept = [line for i, line in enumerate(kept)
+                    if not line.startswith("#") or (i + 1 < len(kept) and not kept[i + 1].startswith("#"))]
+            page_text = truncate_tokens("\n".join(kept), page_token_budget)
+            page["tokens"] = count_tokens(page_text)
+            if page_text.strip():
+                sections.append(f"# {page['kind'].title()} page ({page['url']})\n{page_text}")
+
+        combined = "\n\n".join(sections)
+        crawl_report = {
+            **report,
+            "tokens_total": count_tokens(combined),
+            "pages": [{key: page.get(key) for key in ("kind", "url", "status", "tokens")} for page in fetched],
+            "lines_deduped": deduped,
+        }
+        self._record(normalize_url(url), crawl_report, fetched, deduped)
+        return combined, crawl_report
+
+    def _record(self, url, report, fetched, deduped):
+        with self._lock:
+            self.stats["sites"] += 1
+            self.stats["pages"] += sum(page["status"] == "ok" for page in fetched)
+            self.stats["robots_blocked"] += sum(page["status"] == "robots" for page in fetched)
+            self.stats["lines_deduped"] += deduped
+            self._reports.pop(url, None)
+            self._reports[url] = report
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+
+    def report(self, url):
+        with self._lock:
+            return self._reports.get(url)
+
+
+site_crawler = SiteCrawler()
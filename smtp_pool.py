@@ -0,0 +1,138 @@
+import hashlib
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+# Point these at a local stand-in (e.g. `python -m aiosmtpd -n -l localhost:8025`
+# with SMTP_STARTTLS=0) to test sending without touching Gmail
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_MAX_PER_MINUTE = int(os.getenv("SMTP_MAX_PER_MINUTE", "20"))
+SMTP_IDLE_TIMEOUT = int(os.getenv("SMTP_IDLE_TIMEOUT", "240"))
+
+
+def parse_email(email_text):
+    lines = email_text.split('\n')
+    subject = "Cold Email Pitch"
+    body = email_text
+
+    for i, line in enumerate(lines):
+        if line.lower().startswith('subject:'):
+            subject = line[len('subject:'):].strip()
+            body = '\n'.join(lines[i + 1:]).strip()
+            break
+    return subject, body
+
+
+def build_message(sender_email, recipient_email, subject, body):
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = recipient_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+def build_email_message(sender_email, recipient_email, email):
+    # From a structured ColdEmail, so nothing has to be parsed back out of the text
+    return build_message(sender_email, recipient_email, email.subject, email.message())
+
+
+class SMTPPool:
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, starttls=SMTP_STARTTLS, idle_timeout=SMTP_IDLE_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.idle_timeout = idle_timeout
+        self.stats = {"connections": 0, "reused": 0, "sent": 0, "failed": 0}
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _key(self, sender_email, password):
+        return sender_email.lower(), hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+    def _connect(self, sender_email, password):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        server.ehlo()
+        if self.starttls:
+            server.starttls()
+            server.ehlo()
+        # Local stand-ins usually do not offer AUTH
+        if server.has_extn("auth"):
+            server.login(sender_email, password)
+        self.stats["connections"] += 1
+        return server
+
+    def _checkout(self, key, sender_email, password):
+        # Only taking a session off the idle list holds the lock; the NOOP and QUIT round trips
+        # happen outside it, so one dead connection never stalls the other senders
+        while True:
+            with self._lock:
+                sessions = self._idle.get(key)
+                if not sessions:
+                    break
+                server, last_used = sessions.pop()
+            if time.monotonic() - last_used < self.idle_timeout:
+                try:
+                    if server.noop()[0] == 250:
+                        with self._lock:
+                            self.stats["reused"] += 1
+                        return server
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self._quit(server)
+        return self._connect(sender_email, password)
+
+    def _checkin(self, key, server):
+        with self._lock:
+            self._idle.setdefault(key, []).append((server, time.monotonic()))
+
+    def _quit(self, server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    @contextmanager
+    def session(self, sender_email, password):
+        key = self._key(sender_email, password)
+        server = self._checkout(key, sender_email, password)
+        try:
+            yield server
+        except (smtplib.SMTPServerDisconnected, OSError):
+            server.close()
+            raise
+        except Exception:
+            self._checkin(key, server)
+            raise
+        else:
+            self._checkin(key, server)
+
+    def send(self, sender_email, password, msg):
+        try:
+            try:
+                with self.session(sender_email, password) as server:
+                    server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # The pooled session died between NOOP and send, retry once on a fresh one
+                with self.session(sender_email, password) as server:
+                    server.send_message(msg)
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        self.stats["sent"] += 1
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for sessions in idle.values():
+            for server, _ in sessions:
+                self._quit(server)
+
+
+smtp_pool = SMTPPool()
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from pydantic import BaseModel
+
+from email_schema import ColdEmail, EmailDraft
+from metrics import stage_metrics
+
+STAGE_CACHE_PATH = os.getenv("STAGE_CACHE_PATH", ".cache/stage_cache.sqlite3")
+# Research goes stale with the website, so entries live about as long as a scraped page
+STAGE_CACHE_TTL = int(os.getenv("STAGE_CACHE_TTL", str(24 * 60 * 60)))
+STAGE_CACHE_MAX_ENTRIES = int(os.getenv("STAGE_CACHE_MAX_ENTRIES", "2000"))
+STAGE_CACHE_ENABLED = os.getenv("STAGE_CACHE", "1") != "0"
+
+MODELS = {model.__name__: model for model in (EmailDraft, ColdEmail)}
+
+
+def stage_key(stage, inputs):
+    # inputs holds everything the stage's output depends on, upstream outputs included
+    payload = json.dumps({"stage": stage, "inputs": inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def llm_inputs(llm):
+    # The parts of an LLM that change what it writes
+    return {
+        "model": getattr(llm, "model", None),
+        "temperature": getattr(llm, "temperature", None),
+        "max_tokens": getattr(llm, "max_tokens", None),
+    }
+
+
+def encode_output(value):
+    if isinstance(value, BaseModel):
+        return {"model": type(value).__name__, "data": value.model_dump()}
+    if isinstance(value, tuple):
+        return {"tuple": [encode_output(item) for item in value]}
+    return {"value": value}
+
+
+def decode_output(encoded):
+    if "model" in encoded:
+        # Validated when the stage first produced it, so it is not validated again
+        return MODELS[encoded["model"]].model_construct(**encoded["data"])
+    if "tuple" in encoded:
+        return tuple(decode_output(item) for item in encoded["tuple"])
+    return encoded["value"]
+
+
+class StageCache:
+    """Stage outputs keyed by the stage's inputs, so a rerun only executes the stages whose inputs changed.
+
+    A hit is recorded in stage_metrics with source "cache" and the seconds the stage took
+    when it actually ran as seconds_saved.
+    """
+
+    def __init__(self, path=STAGE_CACHE_PATH, ttl=STAGE_CACHE_TTL, max_entries=STAGE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS stage_outputs (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                output TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS stage_outputs_accessed_at ON stage_outputs (accessed_at)")
+        self._db.commit()
+
+    def _count(self, stage, outcome, seconds_saved=0.0):
+        with self._lock:
+            counters = self.stats.setdefault(stage, {"hits": 0, "misses": 0, "seconds_saved": 0.0})
+            counters[outcome] += 1
+            counters["seconds_saved"] += seconds_saved
+
+    def get(self, key):
+        """Returns (output, seconds the stage took) or None."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT output, seconds, created_at FROM stage_outputs WHERE key = ?", (key,)).fetchone()
+            if row and now - row[2] >= self.ttl:
+                self._db.execute("DELETE FROM stage_outputs WHERE key = ?", (key,))
+                self._db.commit()
+                row = None
+            if row:
+                self._db.execute("UPDATE stage_outputs SET hits = hits + 1, accessed_at = ? WHERE key = ?", (now, key))
+                self._db.commit()
+        return (decode_output(json.loads(row[0])), row[1]) if row else None
+
+    def put(self, key, stage, output, seconds):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO stage_outputs (key, stage, output, seconds, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, json.dumps(encode_output(output), ensure_ascii=False), seconds, now, now)
+            )
+            # Least recently used entries go first once the cap is reached
+            self._db.execute(
+                "DELETE FROM stage_outputs WHERE key IN (SELECT key FROM stage_outputs ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def memoize(self, stage, inputs, compute):
+        key = stage_key(stage, inputs)
+        started = time.perf_counter()
+        cached = self.get(key)
+        if cached is not None:
+            output, seconds = cached
+            self._count(stage, "hits", seconds)
+            stage_metrics.record(stage, time.perf_counter() - started, source="cache", seconds_saved=round(seconds, 4))
+            return output
+
+        self._count(stage, "misses")
+        started = time.perf_counter()
+        output = compute()
+        self.put(key, stage, output, time.perf_counter() - started)
+        return output
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM stage_outputs")
+            self._db.commit()
+
+
+stage_cache = StageCache() if STAGE_CACHE_ENABLED else None
@@ -1,10 +1,12 @@
-from crewai import Agent , Task , Crew , LLM
+from crewai import Agent , Task , Crew
 from dotenv import load_dotenv
+from llm_cache import make_llm
 import os
 
 load_dotenv()
 
-llm = LLM(
+llm = make_llm(
+    "story_teller",
     model = "groq/llama-3.1-8b-instant",
     api_key = os.getenv("GROQ_API_KEY")
 )
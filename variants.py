@@ -0,0 +1,57 @@
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from email_crew import compose
+from email_schema import EMAIL_PARTS, email_columns
+from metrics import stage_metrics
+
+VARIANT_WORKERS = int(os.getenv("VARIANT_WORKERS", "4"))
+
+VARIANT_COLUMNS = ["url", "email_tone", "language", "email_length", "status", "seconds", *EMAIL_PARTS, "email", "error"]
+
+
+def variant_combinations(tones, languages, lengths):
+    return [
+        {"email_tone": tone, "language": language, "email_length": length}
+        for tone, language, length in itertools.product(tones, languages, lengths)
+    ]
+
+
+def _run_one(llm, upstream, index, variant, options):
+    started = time.perf_counter()
+    result = {"index": index, **variant}
+    with stage_metrics.collect() as result["metrics"]:
+        try:
+            outputs = compose(llm, upstream, **variant, **options)
+            result["cold_email"] = outputs["finalize"]
+            result.update(email_columns(outputs["finalize"]))
+            result["status"] = "ok"
+            result["error"] = ""
+        except Exception as e:
+            result["cold_email"] = None
+            result.update(email_columns())
+            result["status"] = "error"
+            result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 1)
+    return result
+
+
+def run_variants(llm, upstream, variants, max_workers=VARIANT_WORKERS, **options):
+    """Writes and finalizes one email per variant on top of a single research() pass.
+
+    Yields each variant's result as soon as it is done; "index" is its position in variants.
+    options are passed on to email_crew.compose (recipient_name, finalizer_mode, stage_llms, ...).
+    """
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [pool.submit(_run_one, llm, upstream, index, variant, options) for index, variant in enumerate(variants)]
+        for future in as_completed(futures):
+            yield future.result()
+    except BaseException:
+        # Abandoned (GeneratorExit when a Streamlit rerun drops the generator): cancel the variants
+        # not started yet instead of blocking until every one has been written
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()